@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import shutil
+from collections import deque, namedtuple
+from tree_walker import FolderPruner
+from name_index import NameIndex
+
+# The parts of a stat result recorded in a plan: enough to tell whether a file changed since it was planned
+PlannedStat = namedtuple('PlannedStat', ['st_dev', 'st_ino', 'st_size', 'st_mtime_ns'])
+
+"""
+An ordered list of file operations decided by the organizer.
+
+Every action is a delete, a move (same name, new folder) or a rename (new folder and name), with the reason it
+was decided and the stat of the file when it was decided. Plans only hold plain data and can be saved to and
+loaded from JSON, so a plan made as a dry run can be reviewed and applied later.
+
+When an `applier` is given, each action is applied as soon as it is added and nothing is kept, which is how the
+organizer runs in its default, single-phase mode. Without one, actions are only recorded, along with the entry
+counts of the folders the walk read, so folders emptied by the plan can be removed when it is applied.
+
+Args:
+    directory (str): The directory the plan organizes.
+    applier (PlanApplier, optional): Applies each action as it is added.
+"""
+class ActionPlan:
+    def __init__(self, directory, applier=None):
+        self.directory = directory
+        self.applier = applier
+        self.actions = []
+        self.folders = {}  # target folders in order of first use, for precreating them
+        self.pruner = applier.pruner if applier else FolderPruner(directory, active=False)
+        # Planned target names count as taken even though the files aren't there yet
+        self.names = applier.names if applier else NameIndex()
+
+    def delete(self, file_path, stat_result, reason):
+        # Returns True if the file was deleted now, False if the deletion was only planned or failed
+        action = {'action': 'delete', 'path': file_path, 'reason': reason, 'stat': list(planned_stat(stat_result))}
+        if self.applier:
+            return self.applier.apply(action, stat_result) is not None
+        self.actions.append(action)
+        return False
+
+    def move(self, file_path, stat_result, target, reason):
+        # Returns the stat of the file at its target if it was moved now, None if the move was only planned or failed
+        kind = 'move' if os.path.basename(file_path) == os.path.basename(target) else 'rename'
+        action = {'action': kind, 'path': file_path, 'target': target, 'reason': reason, 'stat': list(planned_stat(stat_result))}
+        if self.applier:
+            return self.applier.apply(action, stat_result)
+        self.actions.append(action)
+        self.folders.setdefault(os.path.dirname(target))
+        return None
+
+    def summary(self):
+        counts = {}
+        for action in self.actions:
+            counts[action['action']] = counts.get(action['action'], 0) + 1
+        return ', '.join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "nothing to do"
+
+    def to_dict(self):
+        return {'directory': self.directory, 'folders': list(self.folders), 'actions': self.actions,
+                'folder_entries': self.pruner.remaining}
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        plan = cls(data['directory'])
+        plan.pruner = FolderPruner(plan.directory, data.get('folder_entries', {}), active=False)
+        plan.actions = data['actions']
+        plan.folders = dict.fromkeys(data['folders'])
+        return plan
+
+"""
+Returns the recorded part of a stat result.
+
+Args:
+    stat_result (os.stat_result): The stat result of a file.
+
+Returns:
+    PlannedStat: Its device, inode, size and modification time.
+"""
+def planned_stat(stat_result):
+    return PlannedStat(stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+"""
+Carries out the actions of a plan and keeps the file index in step.
+
+Folders are created once, the first time an action needs them; the topmost folder that didn't exist yet is
+added to `created`, which the organizer hands to the tree walk as its set of excluded folders. Moves within a
+device are a single atomic `os.rename`. Moves to another device are copies, which `apply_all` runs on the
+worker pool's I/O threads while index updates stay in the calling thread. Every file leaving a folder and
+every entry arriving in one is reported to the `pruner`, which removes folders as soon as they are empty.
+A `search` index is kept in step with every deletion and move.
+
+Args:
+    directory (str): The directory being organized.
+    index (FileIndex): The persistent file index.
+    pool (WorkerPool, optional): The worker pool used for cross-device copies.
+    pruner (FolderPruner, optional): The folder entry counts, e.g. those of a saved plan.
+    search (SearchIndex, optional): The search index.
+    progress (ScanProgress, optional): Is told about every action taken, and cancels `apply_all` between actions.
+"""
+class PlanApplier:
+    def __init__(self, directory, index, pool=None, pruner=None, search=None, progress=None):
+        self.directory = directory
+        self.index = index
+        self.pool = pool
+        self.search = search
+        self.progress = progress
+        self.pruner = pruner or FolderPruner(directory)
+        self.pruner.active = True
+        self.names = NameIndex()
+        self.folder_devices = {}  # folder -> device, for folders known to exist
+        self.created = set()
+        self.stats = {'deleted': 0, 'moved': 0, 'renamed': 0, 'copied': 0, 'bytes': 0, 'skipped': 0, 'seconds': 0.0}
+
+    def ensure_folder(self, folder):
+        if folder in self.folder_devices:
+            return self.folder_devices[folder]
+
+        topmost_missing = None
+        path = folder
+        while os.path.normpath(path) != os.path.normpath(self.directory) and path != os.path.dirname(path) and not os.path.isdir(path):
+            topmost_missing = path
+            path = os.path.dirname(path)
+        if topmost_missing:
+            # Recorded before it exists, so the tree walk can never enter it
+            self.created.add(topmost_missing)
+            self.pruner.arrived(os.path.dirname(topmost_missing))
+
+        os.makedirs(folder, exist_ok=True)
+        self.folder_devices[folder] = os.stat(folder).st_dev
+        return self.folder_devices[folder]
+
+    def apply(self, action, stat_result=None):
+        # Applies one action right away; without a stat result the file is first checked against the plan
+        try:
+            if stat_result is None:
+                stat_result = self.check_source(action)
+                if stat_result is None:
+                    return None
+
+            if action['action'] == 'delete':
+                os.remove(action['path'])
+                self.index.forget(stat_result)
+                if self.search:
+                    self.search.forget(action['path'])
+                self.stats['deleted'] += 1
+                if self.progress:
+                    self.progress.acted()
+                print(f"{action['reason']}: {action['path']}")
+                self.pruner.left(os.path.dirname(action['path']))
+                self.names.release(action['path'])
+                return stat_result
+
+            target = action['target']
+            device = self.ensure_folder(os.path.dirname(target))
+            if os.path.exists(target):
+                print(f"Skipped {action['path']}: {target} already exists")
+                self.stats['skipped'] += 1
+                return None
+            # Counted in the target folder before it leaves its own, so a rename in place can't empty the folder
+            self.pruner.arrived(os.path.dirname(target))
+            if device == stat_result.st_dev:
+                os.rename(action['path'], target)
+                new_stat = stat_result  # A rename keeps the inode, size and modification time
+            else:
+                shutil.move(action['path'], target)
+                new_stat = os.stat(target)
+                self.stats['copied'] += 1
+            return self.moved(action, new_stat)
+
+        except OSError as e:
+            print(f"Error applying {action['action']} of {action['path']}: {str(e)}")
+            self.stats['skipped'] += 1
+            return None
+
+    def check_source(self, action):
+        stat_result = os.stat(action['path'])
+        if planned_stat(stat_result) != PlannedStat(*action['stat']):
+            print(f"Skipped {action['path']}: changed since the plan was made")
+            self.stats['skipped'] += 1
+            return None
+        return stat_result
+
+    def moved(self, action, new_stat):
+        self.pruner.left(os.path.dirname(action['path']))
+        self.names.release(action['path'])
+        self.index.update(new_stat, action['target'], decision='organized')
+        if self.search:
+            self.search.move(action['path'], action['target'])
+        self.stats['moved' if action['action'] == 'move' else 'renamed'] += 1
+        self.stats['bytes'] += new_stat.st_size
+        if self.progress:
+            self.progress.acted()
+        print(f"{action['reason']}: {os.path.basename(action['path'])} -> {action['target']}")
+        return new_stat
+
+    def copy_across(self, action):
+        # Runs on an I/O thread: only touches the file system
+        shutil.move(action['path'], action['target'])
+        return os.stat(action['target'])
+
+    def apply_all(self, plan):
+        # Applies a whole plan in bulk: folders first, renames in order, cross-device copies in parallel
+        started = time.monotonic()
+        for folder in plan.folders:
+            try:
+                self.ensure_folder(folder)
+            except OSError as e:
+                print(f"Error creating folder {folder}: {str(e)}")
+
+        copies = deque()
+        for action in plan.actions:
+            # Cancelled: copies already running are still finished and recorded below
+            if self.progress and self.progress.cancelled.is_set():
+                break
+            try:
+                stat_result = self.check_source(action)
+            except OSError as e:
+                print(f"Error applying {action['action']} of {action['path']}: {str(e)}")
+                self.stats['skipped'] += 1
+                continue
+            if stat_result is None:
+                continue
+
+            if action['action'] != 'delete' and self.folder_devices.get(os.path.dirname(action['target'])) not in (None, stat_result.st_dev) and not os.path.exists(action['target']):
+                self.pruner.arrived(os.path.dirname(action['target']))
+                copies.append((action, self.pool.submit_io(self.copy_across, action) if self.pool else None))
+                while len(copies) > (self.pool.lookahead if self.pool else 0):
+                    self.finish_copy(*copies.popleft())
+            else:
+                self.apply(action, stat_result)
+        while copies:
+            self.finish_copy(*copies.popleft())
+        # Folders that were empty already when the plan was made
+        self.pruner.prune_all()
+
+        self.stats['seconds'] += time.monotonic() - started
+        if self.progress:
+            self.progress.check()
+        return self.stats
+
+    def finish_copy(self, action, future):
+        try:
+            new_stat = future.result() if future else self.copy_across(action)
+        except OSError as e:
+            print(f"Error applying {action['action']} of {action['path']}: {str(e)}")
+            self.stats['skipped'] += 1
+            return
+        self.stats['copied'] += 1
+        self.moved(action, new_stat)
+
+    def report(self):
+        stats = self.stats
+        files = stats['deleted'] + stats['moved'] + stats['renamed']
+        seconds = max(stats['seconds'], 1e-9)
+        return (f"{stats['deleted']} deleted, {stats['moved']} moved, {stats['renamed']} renamed "
+                f"({stats['copied']} across devices), {stats['skipped']} skipped in {stats['seconds']:.2f}s: "
+                f"{files / seconds:.1f} files/s, {stats['bytes'] / seconds / (1024 * 1024):.1f} MB/s")
@@ -1,19 +1,59 @@
 import os
-import shutil
 import mimetypes
 import hashlib
-from openai import OpenAI
+import json
+import threading
+import config
+from llm_client import LLMClient
+from llm_cache import ResponseCache
+from content_cache import ContentCache
 from datetime import datetime
-from PIL import Image
-import pytesseract
-from pypdf import PdfReader
+from ocr import ocr_image, latencies as ocr_latencies
+from pdf_text import extract_pdf_text
 from dotenv import load_dotenv
+from duplicate_finder import DuplicateFinder, hash_file, partial_hash_file
+from file_index import FileIndex
+from worker_pool import WorkerPool, DeferredResult
+from tree_walker import walk_files, prune_empty_folders
+from drives import group_roots
+from action_plan import ActionPlan, PlanApplier
+from categorizer import CategoryMatcher
+from local_classifier import LocalClassifier
+from near_duplicates import NearDuplicateIndex, is_image
+from search_index import SearchIndex
+from watcher import DirectoryWatcher
+from scan_progress import ScanCancelled
+from policy import PolicyEngine, Rule, COST_NAME, COST_STAT, COST_FULL_READ, COST_LLM
+from collections import deque
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the OpenAI client with the API key from .env
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize the shared LLM client with the API key (and optional base URL) from .env
+llm = LLMClient(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    cache=ResponseCache() if config.LLM_CACHE_ENABLED else None
+)
+
+# Text extracted from files, shared by every consumer of a file's content
+content_cache = ContentCache()
+
+# Decides confident files from past model verdicts, before they reach the model
+classifier = LocalClassifier() if config.LOCAL_CLASSIFIER_ENABLED else None
+
+# Names and extracted text of kept files, for Find Files
+search_index = SearchIndex() if config.SEARCH_INDEX_ENABLED else None
+
+CODE_EXTENSIONS = ['.c', '.java', '.py', '.cpp', '.h', '.js', '.cs']
+
+# Fields of the combined file analysis: expected type and the value used when the reply is missing or malformed
+ANALYSIS_FIELDS = {
+    'useless': (bool, False),
+    'category': (str, None),
+    'suggested_name': (str, None),
+    'summary': (str, None),
+}
 
 """
 Generates a file categorization scheme based on a user's description.
@@ -34,37 +74,30 @@ Raises:
 """
 def get_ai_categorization_scheme(user_description):
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an assistant that helps users organize their files. Based on the user's description, create a categorization scheme that maps file types to category names and subcategories. Use precise category names, for example, code files should be named 'Code' or 'Programming' instead of 'Text'. Respond with a Python dictionary where keys are file extensions or MIME types, and values are lists containing the main category and subcategories."},
-                {"role": "user", "content": f"Create a file categorization scheme based on this description: {user_description}"}
-            ]
-        )
-        categorization_scheme = eval(response.choices[0].message.content.strip())
+        response = llm.chat([
+            {"role": "system", "content": "You are an assistant that helps users organize their files. Based on the user's description, create a categorization scheme that maps file types to category names and subcategories. Use precise category names, for example, code files should be named 'Code' or 'Programming' instead of 'Text'. Respond with a Python dictionary where keys are file extensions or MIME types, and values are lists containing the main category and subcategories."},
+            {"role": "user", "content": f"Create a file categorization scheme based on this description: {user_description}"}
+        ])
+        categorization_scheme = eval(response.strip())
         return categorization_scheme
     except Exception as e:
         print(f"Error generating categorization scheme: {str(e)}")
         return {}
 
 """
-Generates an MD5 hash for a given file.
+Generates a hash for a given file.
 
-This function calculates the MD5 hash of a file.
-It reads the file in binary mode, processes its contents, and returns the hash as a hexadecimal string.
+This function hashes a file in fixed-size chunks, so memory use stays bounded even for multi-GB files.
 
 Args:
     file_path (str): The path to the file for which the hash is to be computed.
+    algorithm (str, optional): Any algorithm name accepted by `hashlib.new`. Defaults to `config.HASH_ALGORITHM`.
 
 Returns:
-    str: The MD5 hash of the file as a hexadecimal string.
+    str: The hash of the file as a hexadecimal string.
 """
-def get_file_hash(file_path):
-    hasher = hashlib.md5()
-    with open(file_path, 'rb') as file:
-        buf = file.read()
-        hasher.update(buf)
-    return hasher.hexdigest()
+def get_file_hash(file_path, algorithm=None):
+    return hash_file(file_path, algorithm)
 
 """
 Categorizes a file based on user-defined categories or MIME types.
@@ -72,6 +105,10 @@ Categorizes a file based on user-defined categories or MIME types.
 This function assigns a file to a category based on the file's extension or MIME type. 
 If the user has provided a custom categorization scheme, the function will use that; 
 otherwise, it defaults to general categories like "documents", "images", or "others".
+Files with an unknown or generic extension are recognized by their first bytes.
+
+The categorization tables are compiled on every call; to categorize many files, build one `CategoryMatcher`
+and reuse it, as `organize_directory` does.
 
 Args:
     file_path (str): The path to the file to be categorized.
@@ -83,54 +120,34 @@ Returns:
         If the file type is not recognized, it returns a default category like 'Others'.
 """
 def get_file_category(file_path, user_categories):
-    if not user_categories:
-        # Default categorization if no user categories are defined
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if mime_type:
-            category = mime_type.split('/')[0]
-            return [category if category != 'application' else 'documents']
-        return ['others']
-
-    # Check file extension
-    _, ext = os.path.splitext(file_path)
-    if ext.lower() in user_categories:
-        return user_categories[ext.lower()]
-
-    # Check mime type
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if mime_type in user_categories:
-        return user_categories[mime_type]
-
-    # Check general mime type category
-    if mime_type:
-        general_type = mime_type.split('/')[0]
-        if general_type in user_categories:
-            return user_categories[general_type]
-
-    # Consider drawings as images
-    if mime_type and mime_type.startswith('application/drawing'):
-        return ['Images']
-
-    return ['Others']
+    return CategoryMatcher(user_categories).categorize(file_path)
 
 """
 This function uses the Tesseract OCR engine to extract text from an image.
-The extracted text is returned as a string, with a limit of the first 1000 characters.
+Images without any sign of text are skipped, others are downscaled and read strip by strip until `max_chars`
+characters are collected or `config.OCR_TIMEOUT` expires (see `ocr.ocr_image`). The time taken is logged and
+kept in `ocr.latencies`.
 
 Args:
     image_path (str): The path to the image file from which text needs to be extracted.
+    max_chars (int, optional): The maximum number of characters to extract. Defaults to 1000.
+    pool (WorkerPool, optional): If given, OCR runs on its process pool.
 
 Returns:
-    str: A string containing the first 1000 characters of the extracted text. If an error occurs during extraction, an empty string is returned.
+    str: A string containing the first `max_chars` characters of the extracted text. If an error occurs during extraction, an empty string is returned.
 
 Raises:
     Exception: Catches and logs any errors that occur during the image reading or text extraction process.
 """
-def extract_text_from_image(image_path):
+def extract_text_from_image(image_path, max_chars=1000, pool=None):
     try:
-        with Image.open(image_path) as img:
-            text = pytesseract.image_to_string(img)
-        return text[:1000] 
+        if pool:
+            text, seconds = pool.run_cpu(ocr_image, image_path, max_chars)
+        else:
+            text, seconds = ocr_image(image_path, max_chars)
+        ocr_latencies.append(seconds)
+        print(f"OCR took {seconds * 1000:.0f} ms for {image_path}")
+        return text
     except Exception as e:
         print(f"Error extracting text from image {image_path}: {str(e)}")
         return ""
@@ -138,9 +155,11 @@ def extract_text_from_image(image_path):
 """
 Extracts text from a PDF file.
 
-This function uses a PDF reader to extract text from a PDF document. It processes the pages sequentially, 
-accumulating text until the specified character limit (`max_chars`) is reached or the end of the PDF is reached. If an error occurs during 
-the extraction process, an empty string is returned.
+This function streams text out of a PDF document page by page (see `pdf_text.extract_pdf_text`). Only the pages
+needed to reach the specified character limit (`max_chars`) are parsed, pages without fonts are skipped, image-only
+documents are abandoned after a few pages, and extraction stops within `config.PDF_TIMEOUT` seconds and
+`config.PDF_MEMORY_BUDGET` bytes of memory growth. If an error occurs during the extraction process, an empty
+string is returned.
 
 Args:
     file_path (str): The path to the PDF file from which text needs to be extracted.
@@ -155,19 +174,7 @@ Raises:
 """
 def extract_text_from_pdf(file_path, max_chars=1000):
     try:
-        # Open the PDF using PdfReader
-        reader = PdfReader(file_path)
-        extracted_text = ""
-
-        # Loop through pages and extract text
-        for page in reader.pages:
-            extracted_text += page.extract_text()
-
-            # Stop if max_chars is reached
-            if len(extracted_text) >= max_chars:
-                extracted_text = extracted_text[:max_chars]
-                break
-
+        extracted_text, _ = extract_pdf_text(file_path, max_chars)
         return extracted_text
     except Exception as e:
         print(f"Error extracting text from PDF {file_path}: {str(e)}")
@@ -176,13 +183,16 @@ def extract_text_from_pdf(file_path, max_chars=1000):
 """
 Extracts content from a file based on its type.
 
-This function retrieves the content of a file depending on its type. 
-For image files, it uses OCR to extract text. For PDFs, it uses a dedicated PDF extraction method. 
+This function retrieves the content of a file depending on its type, memoized through `content_cache`: each
+file's content is extracted at most once per run, and unchanged files reuse the text extracted on earlier runs.
+For image files, it uses OCR to extract text. For PDFs, it uses a dedicated PDF extraction method.
 For all other files, it reads and decodes the raw content.
 
 Args:
     file_path (str): The path to the file from which content needs to be extracted.
     max_chars (int, optional): The maximum number of characters to extract from the file. Defaults to 1000.
+    pool (WorkerPool, optional): If given, OCR and PDF parsing run on its process pool.
+    stat_result (os.stat_result, optional): An already available stat of the file, to avoid another stat call.
 
 Returns:
     str: The extracted content as a string. If the file is an image or a PDF, the extracted text is returned. 
@@ -192,14 +202,41 @@ Returns:
 Raises:
     Exception: Catches and logs any errors that occur during file reading or content extraction.
 """
-def get_file_content(file_path, max_chars=1000):
+def get_file_content(file_path, max_chars=1000, pool=None, stat_result=None):
+    try:
+        key = content_cache.make_key(stat_result or os.stat(file_path), max_chars)
+    except OSError as e:
+        print(f"Error reading file {file_path}: {str(e)}")
+        return ""
+
+    content = content_cache.get(key)
+    if content is None:
+        content = extract_file_content(file_path, max_chars, pool)
+        # Empty text may come from a transient error, so only non-empty text is kept across runs
+        content_cache.put(key, content, persist=bool(content))
+    return content
+
+"""
+Extracts content from a file based on its type, without caching.
+
+Args:
+    file_path (str): The path to the file from which content needs to be extracted.
+    max_chars (int, optional): The maximum number of characters to extract from the file. Defaults to 1000.
+    pool (WorkerPool, optional): If given, OCR and PDF parsing run on its process pool.
+
+Returns:
+    str: The extracted content as a string, or an empty string if an error occurs.
+"""
+def extract_file_content(file_path, max_chars=1000, pool=None):
     try:
         mime_type, _ = mimetypes.guess_type(file_path)
 
         if mime_type and mime_type.startswith('image'):
-            return extract_text_from_image(file_path)
+            return extract_text_from_image(file_path, max_chars, pool)
 
         if mime_type and mime_type == 'application/pdf':
+            if pool:
+                return pool.run_cpu(extract_text_from_pdf, file_path, max_chars)
             return extract_text_from_pdf(file_path, max_chars)
 
         with open(file_path, 'rb') as file:
@@ -228,22 +265,31 @@ Raises:
 """
 def suggest_filename(file_path):
     content = get_file_content(file_path)
-    if not content:
+    if not content or config.OFFLINE:
         return None
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that suggests concise and descriptive filenames based on file content. Suggest only the filename without any explanation or file extension. Max 20 characters"},
-                {"role": "user", "content": f"Suggest a concise and descriptive filename for a file with the following content:\n\n{content}"}
-            ]
-        )
-        suggested_name = response.choices[0].message.content.strip()
+        response = llm.chat([
+            {"role": "system", "content": "You are a helpful assistant that suggests concise and descriptive filenames based on file content. Suggest only the filename without any explanation or file extension. Max 20 characters"},
+            {"role": "user", "content": f"Suggest a concise and descriptive filename for a file with the following content:\n\n{content}"}
+        ])
+        suggested_name = response.strip()
         return suggested_name
     except Exception as e:
         print(f"Error suggesting filename for {file_path}: {str(e)}")
         return None
 
+"""
+Generates a digest of extracted file content.
+
+Args:
+    content (str): The extracted content of a file.
+
+Returns:
+    str: The hash of the content as a hexadecimal string.
+"""
+def get_content_digest(content):
+    return hashlib.new(config.HASH_ALGORITHM, content.encode('utf-8')).hexdigest()
+
 """
 Sanitizes a filename by removing invalid characters.
 
@@ -281,6 +327,19 @@ def should_rename_file(file_path):
         return False
     return True
 
+"""
+Determines whether a file is a code file based on its extension.
+
+Args:
+    file_path (str): The path to the file being checked.
+
+Returns:
+    bool: Returns True if the extension is one of `CODE_EXTENSIONS`, False otherwise.
+"""
+def is_code_file(file_path):
+    _, ext = os.path.splitext(file_path)
+    return ext.lower() in CODE_EXTENSIONS
+
 """
 Reviews a code file and provides a brief summary of its functionality.
 
@@ -298,16 +357,15 @@ Raises:
     Exception: Catches and logs any errors that occur during the code review process.
 """
 def review_code_file(file_path):
+    if config.OFFLINE:
+        return "Unable to review the file."
     content = get_file_content(file_path)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a code reviewer. Review the following code and provide a brief summary of its functionality."},
-                {"role": "user", "content": f"Review this code:\n\n{content}"}
-            ]
-        )
-        review = response.choices[0].message.content.strip()
+        response = llm.chat([
+            {"role": "system", "content": "You are a code reviewer. Review the following code and provide a brief summary of its functionality."},
+            {"role": "user", "content": f"Review this code:\n\n{content}"}
+        ])
+        review = response.strip()
         return review
     except Exception as e:
         print(f"Error reviewing code file {file_path}: {str(e)}")
@@ -322,13 +380,14 @@ to determine if the file is older than the given number of days.
 Args:
     file_path (str): The path to the file being checked.
     days_threshold (int, optional): The age threshold in days. Defaults to 365 days.
+    stat_result (os.stat_result, optional): An already available stat of the file, to avoid another stat call.
 
 Returns:
     bool: Returns True if the file is older than the specified number of days, False otherwise.
 """
-def is_file_old(file_path, days_threshold=365):
+def is_file_old(file_path, days_threshold=365, stat_result=None):
     current_time = datetime.now().timestamp()
-    last_access_time = os.path.getmtime(file_path)
+    last_access_time = stat_result.st_mtime if stat_result else os.path.getmtime(file_path)
     return (current_time - last_access_time) > (days_threshold * 24 * 60 * 60)
 
 """
@@ -340,6 +399,7 @@ respond with either 'YES' (if the content is useless) or 'NO' (if the content mi
 
 Args:
     file_path (str): The path to the file whose content needs to be analyzed.
+    content (str, optional): The already extracted content of the file. Extracted from the file if not given.
 
 Returns:
     bool: Returns True if the content is deemed useless ('YES' from the model), or False if the content is valuable 
@@ -348,137 +408,835 @@ Returns:
 Raises:
     Exception: Catches and logs any errors that occur during content analysis.
 """
-def is_content_useless(file_path):
-    content = get_file_content(file_path)
-    if not content:
+def is_content_useless(file_path, content=None):
+    if content is None:
+        content = get_file_content(file_path)
+    if not content or config.OFFLINE:
         return False
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an assistant that analyzes file content to determine if it's useless. Useless files: Content in a non english language, any way associated with junk, installers. Respond with 'YES' if the content is useless or 'NO' if it might be valuable."},
-                {"role": "user", "content": f"Is the following file content useless?\n\n{content}"}
-            ]
-        )
-        return response.choices[0].message.content.strip().upper() == "YES"
+        response = llm.chat([
+            {"role": "system", "content": "You are an assistant that analyzes file content to determine if it's useless. Useless files: Content in a non english language, any way associated with junk, installers. Respond with 'YES' if the content is useless or 'NO' if it might be valuable."},
+            {"role": "user", "content": f"Is the following file content useless?\n\n{content}"}
+        ])
+        useless = response.strip().upper() == "YES"
+        if classifier:
+            classifier.record(content, useless)
+        return useless
     except Exception as e:
         print(f"Error analyzing content usefulness for {file_path}: {str(e)}")
         return False
 
+"""
+Analyzes a file's content with a single model call.
+
+This function replaces the separate usefulness, code review and filename suggestion calls with one request whose
+reply is a JSON object. Each field of the reply is validated on its own, so a missing or malformed field falls
+back to the same value the dedicated function would have returned on error, without discarding the others.
+
+Args:
+    file_path (str): The path to the file to be analyzed.
+    content (str, optional): The already extracted content of the file. Extracted from the file if not given.
+    want_summary (bool, optional): Whether to also ask for a brief summary of the file (used for code files). Defaults to False.
+    name_only (bool, optional): Whether to ask only for the filename (and summary), for files whose usefulness and
+        category were already decided locally. Defaults to False.
+
+Returns:
+    dict: The analysis with the keys 'useless' (bool), 'category', 'suggested_name' and 'summary' (str or None).
+        With `name_only`, 'useless' and 'category' always have their fallback values.
+        If the content cannot be extracted or an error occurs, every field has its fallback value.
+
+Raises:
+    Exception: Catches and logs any errors that occur during the analysis.
+"""
+def analyze_file(file_path, content=None, want_summary=False, name_only=False):
+    if content is None:
+        content = get_file_content(file_path)
+    if not content or config.OFFLINE:
+        return {field: default for field, (_, default) in ANALYSIS_FIELDS.items()}
+
+    decision_instruction = "" if name_only else (
+        "\"useless\": true if the content is useless (content in a non english language, any way associated with junk, installers), false if it might be valuable. "
+        "\"category\": a short, precise category name for the file, for example 'Code' instead of 'Text'. ")
+    summary_instruction = '"summary": a brief summary of what the file does or contains. ' if want_summary else ''
+    try:
+        response = llm.chat([
+            {"role": "system", "content": "You are an assistant that helps users organize their files. Analyze the file content and respond with a JSON object with these keys: "
+                                          + decision_instruction +
+                                          "\"suggested_name\": a concise and descriptive filename without extension, max 20 characters. "
+                                          + summary_instruction},
+            {"role": "user", "content": f"Analyze the following file content:\n\n{content}"}
+        ], response_format={"type": "json_object"})
+    except Exception as e:
+        print(f"Error analyzing file {file_path}: {str(e)}")
+        return {field: default for field, (_, default) in ANALYSIS_FIELDS.items()}
+    analysis = parse_analysis(response, file_path)
+    if name_only:
+        analysis.update(useless=ANALYSIS_FIELDS['useless'][1], category=ANALYSIS_FIELDS['category'][1])
+        return analysis
+    # Complete replies become training examples for the local classifier
+    if classifier and analysis['category'] is not None:
+        classifier.record(content, analysis['useless'], analysis['category'])
+    return analysis
+
+"""
+Parses and validates the model's reply to a combined file analysis.
+
+Args:
+    response (str): The raw reply, expected to contain a JSON object (optionally wrapped in a code fence).
+    file_path (str): The path to the analyzed file, used in log messages.
+
+Returns:
+    dict: Every field of `ANALYSIS_FIELDS`, with the fallback value for fields that are missing or malformed.
+"""
+def parse_analysis(response, file_path):
+    analysis = {field: default for field, (_, default) in ANALYSIS_FIELDS.items()}
+    try:
+        reply = json.loads(response[response.index('{'):response.rindex('}') + 1])
+    except (AttributeError, ValueError):
+        print(f"Error parsing analysis for {file_path}: {response!r}")
+        return analysis
+    if not isinstance(reply, dict):
+        print(f"Error parsing analysis for {file_path}: {response!r}")
+        return analysis
+
+    for field, (expected_type, _) in ANALYSIS_FIELDS.items():
+        value = reply.get(field)
+        # Tolerate the YES/NO answers of the single-purpose prompt
+        if expected_type is bool and isinstance(value, str) and value.strip().upper() in ('YES', 'NO', 'TRUE', 'FALSE'):
+            value = value.strip().upper() in ('YES', 'TRUE')
+        if expected_type is str and isinstance(value, str):
+            value = value.strip() or None
+        if isinstance(value, expected_type):
+            analysis[field] = value
+        elif value is not None:
+            print(f"Ignoring malformed '{field}' in analysis for {file_path}: {value!r}")
+    return analysis
+
+"""
+Analyzes whether a file's content is useless.
+
+Runs on an I/O worker: the content is extracted (OCR and PDF parsing on the process pool, if given) and then
+sent to the model. With `config.COMBINED_ANALYSIS` the same call also returns the category, suggested filename
+and summary, so the file needs no further model calls. Files the local classifier is confident about are
+decided without the model (see `LocalClassifier`).
+
+Args:
+    file_path (str): The path to the file to be analyzed.
+    pool (WorkerPool, optional): The worker pool used for CPU-bound extraction.
+    is_code (bool, optional): Whether the file is a code file, whose summary is requested too. Defaults to False.
+    stat_result (os.stat_result, optional): An already available stat of the file, to avoid another stat call.
+
+Returns:
+    tuple: The digest of the extracted content, whether the content is deemed useless, and the full analysis
+        from `analyze_file` or `LocalClassifier.classify` (or None when combined analysis is off).
+"""
+def analyze_usefulness(file_path, pool=None, is_code=False, stat_result=None):
+    content = get_file_content(file_path, pool=pool, stat_result=stat_result)
+    local = classifier.classify(content) if classifier and content else None
+    if local is not None:
+        return get_content_digest(content), local['useless'], local
+    if config.COMBINED_ANALYSIS:
+        analysis = analyze_file(file_path, content, want_summary=is_code)
+        return get_content_digest(content), analysis['useless'], analysis
+    return get_content_digest(content), is_content_useless(file_path, content), None
+
+"""
+Asks the model for everything needed to place a kept file.
+
+With `config.COMBINED_ANALYSIS` an analysis from `analyze_file` is reused, or made with one call if there is
+none yet. A file the local classifier decided only has its name and summary asked for. Otherwise the code review
+and filename suggestion are separate calls.
+
+Args:
+    file_path (str): The path to the file to be placed.
+    is_code (bool): Whether the file is a code file that should be reviewed.
+    rename (bool): Whether a new filename should be suggested.
+    analysis (dict, optional): An earlier combined analysis of the file.
+
+Returns:
+    tuple: The code review (or None) and the suggested filename (or None).
+"""
+def describe_file(file_path, is_code, rename, analysis=None):
+    if config.COMBINED_ANALYSIS:
+        if (analysis is None or analysis.get('tier') == 'local') and (is_code or rename):
+            # A local analysis has no name or summary; only those are asked of the model
+            name_only = analysis is not None
+            if name_only and classifier and not config.OFFLINE:
+                classifier.named()
+            analysis = analyze_file(file_path, want_summary=is_code, name_only=name_only)
+        review = (analysis['summary'] or "Unable to review the file.") if is_code else None
+        new_name = analysis['suggested_name'] if rename else None
+        return review, new_name
+
+    review = review_code_file(file_path) if is_code else None
+    new_name = suggest_filename(file_path) if rename else None
+    return review, new_name
+
 """
 Organizes files in a directory.
 
 This function traverses the specified directory and performs several operations on the files:
-- Removes old and potentially useless files.
-- Deletes duplicates based on file hash.
-- Removes specific file types (e.g., .dmg files).
+- Removes specific file types (e.g., .dmg files) and old files.
+- Deletes duplicates, comparing file sizes first and hashing only files whose size and partial hash collide.
+- Removes potentially useless files.
 - Organizes files into categories based on their type and content.
 - Renames files based on their content, if necessary.
 - Moves files into appropriate category folders.
+- Reports clusters of near-duplicate images and texts among the kept files, without deleting them.
+
+The removal checks are evaluated cheapest first (see `build_organize_policy`), so content is only read and sent
+to the model for files that no metadata or hash check has already decided.
+
+Hashes, content digests, usefulness verdicts and decisions are kept in a persistent `FileIndex`. Files that are
+unchanged since a previous run reuse what was recorded for them, and files this function already organized are
+skipped, so a re-run over the same tree costs about one stat per file.
+
+Files are streamed from `walk_files` rather than listed upfront, and the stat taken by the walk is reused for
+every later check, so memory stays flat on very large trees. Category folders created by this run are left out
+of the walk, and files that were already moved this run are recognized and not processed again.
+
+In parallel mode content extraction, partial hashing and model calls for upcoming files run on a `WorkerPool`
+while this function acts as the single coordinator: delete, dedupe and move decisions are still taken one file
+at a time in walk order, so the outcome is the same as in sequential mode. The walk itself runs ahead of the
+coordinator through a bounded queue, and the analysis and placement queues are bounded by the pool's lookahead.
+
+Deletions and moves are applied as soon as each file is decided. In two-phase mode the whole directory is
+planned first with `plan_directory` and the plan is then applied in bulk with `apply_plan`. Either way, the
+walk records how many entries every folder holds and folders are removed as soon as their last entry leaves,
+so emptied folders are cleaned up without walking the tree again.
 
 Args:
     directory (str): The path to the directory that needs to be organized.
     user_categories (dict): A dictionary defining user-specific file categories and their associated types (e.g., extensions or MIME types).
+    index_path (str, optional): The path to the persistent file index. Defaults to `config.INDEX_PATH`.
+    parallel (bool, optional): Whether to run on worker pools. Defaults to `config.PARALLEL`.
+    two_phase (bool, optional): Whether to plan everything before applying anything. Defaults to `config.TWO_PHASE`.
+    progress (ScanProgress, optional): Counts files scanned, bytes hashed and actions taken, and can cancel the run.
 
 Returns:
     None: The function modifies the file system by deleting, moving, and renaming files as needed.
 
 Raises:
-    Exception: Catches and logs any errors that occur during the file organization process.
-"""
-def organize_directory(directory, user_categories):
-    hash_dict = {}
-    for root, dirs, files in os.walk(directory):
-        # Ignore hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-        
-        for file in files:
-            # Ignore hidden files
-            if file.startswith('.'):
-                continue
-            
-            file_path = os.path.join(root, file)
+    ScanCancelled: If the run was cancelled through `progress`; actions taken until then are kept.
+"""
+def organize_directory(directory, user_categories, index_path=None, parallel=None, two_phase=None, progress=None):
+    two_phase = config.TWO_PHASE if two_phase is None else two_phase
+    if two_phase:
+        apply_plan(plan_directory(directory, user_categories, index_path, parallel, progress), index_path, parallel, progress)
+        return
 
-            old = is_file_old(file_path)
-            useless = is_content_useless(file_path)
+    with FileIndex(index_path) as index, WorkerPool(parallel) as pool:
+        plan = ActionPlan(directory, PlanApplier(directory, index, pool, search=search_index, progress=progress))
+        run_organizer(directory, user_categories, index, pool, plan, progress=progress)
 
-            # Check if file is old and potentially useless
-            if old and useless:
-                os.remove(file_path)
-                print(f"Removed old and useless file: {file_path}")
-                continue
-            # Check if file is old
-            elif old:
-                os.remove(file_path)
-                print(f"Removed old file: {file_path}")
-                continue
-            # Check if file is potentially useless
-            elif useless:
-                os.remove(file_path)
-                print(f"Removed useless file: {file_path}")
-                continue
+"""
+Works out how a directory would be organized, without changing any file.
 
-            file_hash = get_file_hash(file_path)
-            
-            if file_hash in hash_dict:
-                # This is a duplicate, remove it
-                os.remove(file_path)
-                print(f"Removed duplicate: {file_path}")
-                continue
-            
-            hash_dict[file_hash] = file_path
-            
-            # Remove .dmg files by default
-            if file.endswith('.dmg'):
-                os.remove(file_path)
-                print(f"Removed .dmg file: {file_path}")
+This is the first phase of a two-phase run and doubles as a dry run: every file goes through the same checks
+as in `organize_directory`, but deletions and moves are only recorded in the returned plan. Model answers,
+hashes and extracted text are cached as usual, so applying the plan or planning again later is fast.
+
+Args:
+    directory (str): The path to the directory to be organized.
+    user_categories (dict): The user-specific file categories.
+    index_path (str, optional): The path to the persistent file index. Defaults to `config.INDEX_PATH`.
+    parallel (bool, optional): Whether to run on worker pools. Defaults to `config.PARALLEL`.
+    progress (ScanProgress, optional): Counts files scanned and bytes hashed, and can cancel planning.
+
+Returns:
+    ActionPlan: The planned deletions, moves and renames, in the order they would happen.
+"""
+def plan_directory(directory, user_categories, index_path=None, parallel=None, progress=None):
+    plan = ActionPlan(directory)
+    with FileIndex(index_path) as index, WorkerPool(parallel) as pool:
+        run_organizer(directory, user_categories, index, pool, plan, progress=progress)
+    print(f"Planned: {plan.summary()}")
+    return plan
+
+"""
+Applies a plan made by `plan_directory`, in bulk.
+
+Target folders are created once upfront, moves within a device are atomic renames and moves to other devices
+are copied in parallel. Files that changed since the plan was made are left alone. Folders emptied by the plan
+are removed as soon as they become empty.
+
+Args:
+    plan (ActionPlan): The plan to apply.
+    index_path (str, optional): The path to the persistent file index. Defaults to `config.INDEX_PATH`.
+    parallel (bool, optional): Whether to copy across devices on worker pools. Defaults to `config.PARALLEL`.
+    progress (ScanProgress, optional): Counts the actions taken, and can cancel the rest of the plan.
+
+Returns:
+    None
+"""
+def apply_plan(plan, index_path=None, parallel=None, progress=None):
+    with FileIndex(index_path) as index, WorkerPool(parallel) as pool:
+        applier = PlanApplier(plan.directory, index, pool, plan.pruner, search_index, progress)
+        applier.apply_all(plan)
+        print(f"Applied: {applier.report()}")
+
+"""
+Organizes whole drives: several roots at once, scheduled by the physical disk they are on.
+
+Each disk gets a thread of its own that organizes the disk's roots one after another, with a group of I/O
+workers sized for the disk (see `DeviceProgress`), so disks are scanned in parallel while a spinning disk is
+never read by more threads than it can serve. The walk of a root never leaves its file system. CPU-bound work
+shares one process pool, and the file index, the duplicate detector and the near-duplicate index are shared by
+every disk, so a file is recognized as a duplicate of a file under any other root. Which of two duplicates on
+different disks is kept depends on which disk reaches its copy first.
+
+Progress per disk is printed every `config.DRIVE_PROGRESS_INTERVAL` seconds and passed to `on_progress`. The
+disks' counters add up in `progress`, and cancelling it stops every disk after the file it is on.
+
+Args:
+    roots (list): The paths of the drives or folders to organize.
+    user_categories (dict): The user-specific file categories.
+    index_path (str, optional): The path to the persistent file index. Defaults to `config.INDEX_PATH`.
+    parallel (bool, optional): Whether each disk's organizer runs on worker pools. Defaults to `config.PARALLEL`.
+    on_progress (callable, optional): Called with the list of `DeviceProgress` on every progress report.
+    progress (ScanProgress, optional): Counts files scanned, bytes hashed and actions taken on all disks.
+
+Returns:
+    list: The `DeviceProgress` of every disk.
+
+Raises:
+    ScanCancelled: If the scan was cancelled through `progress`.
+"""
+def organize_drive(roots, user_categories, index_path=None, parallel=None, on_progress=None, progress=None):
+    devices = group_roots(roots, progress)
+    with FileIndex(index_path) as index, WorkerPool(parallel, io_workers=1) as cpu_pool:
+        duplicates = DuplicateFinder(index=index, progress=progress)
+        similar = NearDuplicateIndex() if config.NEAR_DUPLICATES else None
+        if classifier:
+            classifier.prepare()
+
+        def organize_device(progress):
+            with WorkerPool(parallel, io_workers=progress.io_workers, cpu_pool=cpu_pool) as pool:
+                for root, device in progress.roots:
+                    progress.start(root)
+                    try:
+                        plan = ActionPlan(root, PlanApplier(root, index, pool, search=search_index, progress=progress))
+                        run_organizer(root, user_categories, index, pool, plan, duplicates, similar, device, progress)
+                    except ScanCancelled:
+                        break
+                    except Exception as e:
+                        print(f"Error organizing {root}: {str(e)}")
+            progress.finish()
+
+        threads = [threading.Thread(target=organize_device, args=(progress,), name=f"walle-{progress.disk}")
+                   for progress in devices]
+        for thread in threads:
+            thread.start()
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if not alive:
+                break
+            alive[0].join(config.DRIVE_PROGRESS_INTERVAL)
+            for progress in devices:
+                print(f"Progress {progress.report()}")
+            if on_progress:
+                on_progress(devices)
+        report_scan(similar)
+    if progress:
+        progress.check()
+    return devices
+
+"""
+Organizes a directory, then keeps watching it and organizes every file that is added or changed afterwards.
+
+The watcher is started before the first full pass, so nothing that arrives during the pass is missed. After it,
+the watch thread sleeps until the file system reports a change (see `DirectoryWatcher`), and only the files that
+changed, once they have settled, go through the same pipeline as a full pass. The duplicate and near-duplicate
+detectors live for the whole watch, so a new file is recognized as a duplicate of any file already kept. Events
+caused by the organizer's own moves are harmless: moved files are already known and skipped. Stops when
+`watcher.stop()` is called or on Ctrl+C.
+
+Args:
+    directory (str): The path to the directory to watch.
+    user_categories (dict): The user-specific file categories.
+    index_path (str, optional): The path to the persistent file index. Defaults to `config.INDEX_PATH`.
+    parallel (bool, optional): Whether to run on worker pools. Defaults to `config.PARALLEL`.
+    watcher (DirectoryWatcher, optional): The watcher to take changes from, e.g. to stop it from another thread.
+
+Returns:
+    None
+"""
+def watch_directory(directory, user_categories, index_path=None, parallel=None, watcher=None):
+    watcher = watcher or DirectoryWatcher(directory)
+    try:
+        with FileIndex(index_path) as index, WorkerPool(parallel) as pool:
+            duplicates = DuplicateFinder(index=index)
+            similar = NearDuplicateIndex() if config.NEAR_DUPLICATES else None
+            if classifier:
+                classifier.prepare()
+
+            def organize(files=None):
+                plan = ActionPlan(directory, PlanApplier(directory, index, pool, search=search_index))
+                run_organizer(directory, user_categories, index, pool, plan, duplicates, similar, files=files)
+                report_scan(similar)
+
+            organize()
+            print(f"Watching {directory} for new files, press Ctrl+C to stop")
+            while True:
+                files = watcher.wait()
+                if files is None:
+                    break
+                for file_path, _, stat_result in files:
+                    # A kept file that was changed since is checked again like a new one
+                    kept = duplicates.stats.get(file_path)
+                    if kept and (kept.st_size, kept.st_mtime_ns) != (stat_result.st_size, stat_result.st_mtime_ns):
+                        duplicates.forget(file_path)
+                print(f"Organizing {len(files)} new or changed files")
+                organize(files)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+
+"""
+Runs the organizer's pipeline over a directory, handing every decided deletion and move to a plan.
+
+The plan either applies each action right away (single-phase mode) or only records it (planning). When the
+run is one part of a larger scan, such as one root of `organize_drive`, the scan passes in the duplicate and
+near-duplicate detectors it shares between its roots, and prepares and reports them itself.
+
+Args:
+    directory (str): The directory being organized.
+    user_categories (dict): The user-specific file categories.
+    index (FileIndex): The persistent file index.
+    pool (WorkerPool): The worker pool for this run.
+    plan (ActionPlan): Receives the decided actions.
+    duplicates (DuplicateFinder, optional): A duplicate detector shared with other runs.
+    similar (NearDuplicateIndex, optional): A near-duplicate index shared with other runs.
+    device (int, optional): The `st_dev` of the file system the walk stays on.
+    progress (ScanProgress, optional): Is told about every file walked and byte hashed, and cancels the run between files.
+    files (list, optional): The (path, name, stat) of the files to organize instead of walking the directory.
+
+Returns:
+    None
+
+Raises:
+    ScanCancelled: If the run was cancelled through `progress`.
+"""
+def run_organizer(directory, user_categories, index, pool, plan, duplicates=None, similar=None, device=None, progress=None, files=None):
+    shared = duplicates is not None
+    if not shared:
+        duplicates = DuplicateFinder(index=index, progress=progress)
+        similar = NearDuplicateIndex() if config.NEAR_DUPLICATES else None
+        if classifier:
+            classifier.prepare()
+    policy = build_organize_policy(index, duplicates)
+    matcher = CategoryMatcher(user_categories)
+    # Folders created by this run, which the walk must not enter
+    excluded = plan.applier.created if plan.applier else set()
+
+    analyzing = deque()
+    analyzing_sizes = {}  # size -> number of files in `analyzing` with that size
+    placing = deque()
+
+    def decide_next():
+        job = analyzing.popleft()
+        size = job['stat'].st_size
+        analyzing_sizes[size] -= 1
+        if not analyzing_sizes[size]:
+            del analyzing_sizes[size]
+        decide_file(job, directory, matcher, duplicates, pool, policy, plan, placing, similar)
+
+    if progress:
+        progress.watch_queue('analyzing', analyzing.__len__)
+        progress.watch_queue('placing', placing.__len__)
+        progress.watch_queue('io', lambda: pool.backlog['io'])
+        progress.watch_queue('cpu', lambda: pool.backlog['cpu'])
+
+    # Cancelling stops at the next file; what was done until then is still reported and flushed
+    try:
+        if files is None:
+            files = walk_files(directory, excluded, plan.pruner, device)
+        for file_path, file, stat_result in pool.stream(files):
+            if progress:
+                progress.check()
+            # Moved here earlier in this run, into a folder that existed before
+            if file_path in duplicates.stats:
                 continue
-            
-            # Get file category and subcategories
-            categories = get_file_category(file_path, user_categories)
-            
-            # Handle code files (.c, .java, etc.)
-            _, ext = os.path.splitext(file)
-            if ext.lower() in ['.c', '.java', '.py', '.cpp', '.h', '.js', '.cs']:
-                review = review_code_file(file_path)
-                print(f"Code file review for {file}:\n{review}")
-                categories = ['Code']
-            
-            # Create category and subcategory folders
-            category_path = os.path.join(directory, *categories)
-            os.makedirs(category_path, exist_ok=True)
-            
-            # Suggest new filename if appropriate
-            if should_rename_file(file_path):
-                new_name = suggest_filename(file_path)
-                if new_name:
-                    new_name = sanitize_filename(new_name)
-                    file_extension = os.path.splitext(file)[1]
-                    new_file_path = os.path.join(category_path, new_name + file_extension)
-                    
-                    # Handle filename conflicts
-                    counter = 1
-                    while os.path.exists(new_file_path):
-                        new_file_path = os.path.join(category_path, f"{new_name}_{counter}{file_extension}")
-                        counter += 1
-                else:
-                    new_file_path = os.path.join(category_path, sanitize_filename(os.path.splitext(file)[0]) + os.path.splitext(file)[1])
-            else:
-                new_file_path = os.path.join(category_path, file)
-            
-            # Move and rename file
-            shutil.move(file_path, new_file_path)
-            print(f"Moved and renamed: {file} -> {new_file_path}")
+            if progress:
+                progress.walked(stat_result)
+
+            record = index.lookup(stat_result)
+            job = {'path': file_path, 'name': file, 'stat': stat_result, 'record': record}
+            # Only a file sharing its size with an earlier one can be a duplicate and ever need a partial hash
+            size = stat_result.st_size
+            shared_size = bool(duplicates.files_by_size.get(size) or analyzing_sizes.get(size))
+
+            # Unchanged since a previous run placed it here, only keep it visible to duplicate detection
+            job['organized'] = bool(record and record['decision'] == 'organized' and record['path'] == file_path)
+            # Rules that only need the name and stat decide right away, before any content is read. They cost
+            # nothing beyond the stat already taken, so they also apply to organized files, e.g. once they are old.
+            job['rule'] = policy.evaluate(job, max_cost=COST_STAT)
+            if not job['organized'] and job['rule'] is None and not (record and record['useless'] is not None):
+                # Analyzed ahead only if the file can't turn out to be a duplicate, otherwise on demand
+                usefulness_args = (analyze_usefulness, file_path, pool, is_code_file(file_path), stat_result)
+                job['usefulness'] = DeferredResult(*usefulness_args) if shared_size else pool.prefetch_io(*usefulness_args)
+            if shared_size and job['rule'] is None and not (record and record['hash_algorithm'] == duplicates.algorithm and record['partial_hash']):
+                job['partial_hash'] = pool.submit_io(partial_hash_file, file_path, duplicates.algorithm, duplicates.block_size, True, progress)
+            analyzing.append(job)
+            analyzing_sizes[size] = analyzing_sizes.get(size, 0) + 1
+
+            if len(analyzing) >= pool.lookahead:
+                decide_next()
+            while placing and (placing[0]['description'].done() or len(placing) >= pool.lookahead):
+                place_file(placing.popleft(), duplicates, plan, similar)
+
+        while analyzing:
+            if progress:
+                progress.check()
+            decide_next()
+        while placing:
+            if progress:
+                progress.check()
+            place_file(placing.popleft(), duplicates, plan, similar)
+    finally:
+        print(f"Rule hits: {policy.report()}")
+        if not shared:
+            report_scan(similar)
+
+"""
+Prints what a scan's shared stages found and flushes the content cache and search index.
+
+Args:
+    similar (NearDuplicateIndex, optional): The near-duplicate index of the scan.
+
+Returns:
+    None
+"""
+def report_scan(similar):
+    if classifier:
+        print(f"Usefulness decided by: {classifier.report()}")
+    if similar:
+        clusters = similar.save_report()
+        print(f"Near-duplicate clusters: {len(clusters)} ({sum(len(cluster) for cluster in clusters)} files), "
+              f"listed in {config.NEAR_DUPLICATE_REPORT_PATH}")
+    content_cache.flush()
+    if search_index:
+        search_index.commit()
+
+"""
+Builds the removal rules applied to every file by `organize_directory`.
+
+Rules declare the cost of their check and are evaluated cheapest first, stopping at the first one that applies:
+.dmg files and old files are removed on their name and stat alone, duplicates on their hashes, and only files
+that survive those are sent to the model to decide whether their content is useless.
+
+Args:
+    index (FileIndex): The persistent file index, used to reuse and record usefulness verdicts.
+    duplicates (DuplicateFinder): The duplicate detector for this run.
+
+Returns:
+    PolicyEngine: The engine evaluating the rules against organizer jobs.
+"""
+def build_organize_policy(index, duplicates):
+    def is_duplicate(job):
+        return duplicates.find_duplicate(job['path'], job['stat'], get_partial_hash(job)) is not None
+
+    def is_useless(job):
+        record = job['record']
+        if record and record['useless'] is not None:
+            return bool(record['useless'])
+        content_digest, useless, job['analysis'] = job['usefulness'].result()
+        index.update(job['stat'], job['path'], content_digest=content_digest, useless=useless)
+        return useless
+
+    return PolicyEngine([
+        # Remove .dmg files by default
+        Rule('dmg', COST_NAME, lambda job: job['name'].endswith('.dmg'), 'remove', "Removed .dmg file"),
+        Rule('old', COST_STAT, lambda job: is_file_old(job['path'], stat_result=job['stat']), 'remove', "Removed old file"),
+        Rule('duplicate', COST_FULL_READ, is_duplicate, 'remove', "Removed duplicate"),
+        Rule('useless', COST_LLM, is_useless, 'remove', "Removed useless file"),
+    ])
+
+"""
+Returns the partial hash computed ahead for an organizer job, if any.
+
+Args:
+    job (dict): The organizer job.
+
+Returns:
+    str: The partial hash, or None if it wasn't computed ahead or hashing failed.
+"""
+def get_partial_hash(job):
+    if 'partial_hash' not in job:
+        return None
+    try:
+        return job['partial_hash'].result()[0]
+    except OSError as e:
+        print(f"Error hashing file {job['path']}: {str(e)}")
+        return None
+
+"""
+Returns the first bytes of a file that were read along with its partial hash, if any.
+
+Args:
+    job (dict): The organizer job.
+
+Returns:
+    bytes: The file's header, or None if no partial hash was computed ahead or hashing failed.
+"""
+def get_header(job):
+    if 'partial_hash' not in job:
+        return None
+    try:
+        return job['partial_hash'].result()[1]
+    except OSError:
+        return None
+
+"""
+Decides whether a file is removed or kept, and queues kept files for placement.
+
+Called by the coordinator in `organize_directory` once per file, in walk order. Rules that weren't already
+evaluated when the file was listed are evaluated here, in cost order.
+
+Args:
+    job (dict): The file's path, name, stat result, index record and pending worker results.
+    directory (str): The directory being organized.
+    matcher (CategoryMatcher): The compiled file categories for this run.
+    duplicates (DuplicateFinder): The duplicate detector for this run.
+    pool (WorkerPool): The worker pool for this run.
+    policy (PolicyEngine): The removal rules for this run.
+    plan (ActionPlan): Receives deletions.
+    placing (deque): The queue of kept files waiting to be moved.
+    similar (NearDuplicateIndex, optional): Collects the kept files' similarity signatures.
+
+Returns:
+    None
+"""
+def decide_file(job, directory, matcher, duplicates, pool, policy, plan, placing, similar=None):
+    file_path, file, stat_result = job['path'], job['name'], job['stat']
+
+    # Organized files skip the content, model and placement stages
+    if job['organized'] and job['rule'] is None:
+        if duplicates.find_duplicate(file_path, stat_result, get_partial_hash(job)):
+            plan.delete(file_path, stat_result, "Removed duplicate")
+        else:
+            if similar:
+                track_similarity(job, file_path, stat_result, similar, pool, duplicates.index)
+            add_to_search(file_path, stat_result)
+        return
+
+    rule = job['rule'] or policy.evaluate(job, min_cost=COST_STAT + 1)
+    if rule and rule.action == 'remove':
+        plan.delete(file_path, stat_result, rule.message)
+        # The file may already have been registered as an original by the duplicate rule
+        duplicates.forget(file_path)
+        return
+
+    # Get file category and subcategories
+    categories = matcher.categorize(file_path, get_header(job))
+    analysis = job.get('analysis')
+
+    # Let the model's category place files the type-based rules can't
+    if categories[0].lower() == 'others' and analysis and analysis['category'] and sanitize_filename(analysis['category']):
+        categories = [sanitize_filename(analysis['category'])]
+
+    # Handle code files (.c, .java, etc.)
+    is_code = is_code_file(file_path)
+    if is_code:
+        categories = ['Code']
+
+    job['category_path'] = os.path.join(directory, *categories)
+    job['rename'] = should_rename_file(file_path)
+    job['description'] = pool.submit_io(describe_file, file_path, is_code, job['rename'], analysis)
+    if similar and not (job['record'] and job['record']['similarity_hash'] is not None):
+        job['signature'] = pool.submit_io(get_similarity_signature, file_path, similar, pool, stat_result)
+    placing.append(job)
+
+"""
+Moves a kept file into its category folder under its new name.
+
+Called by the coordinator in `organize_directory` once per kept file, in walk order, so filename conflicts are
+resolved the same way in sequential and parallel mode. Free names come from the plan's `NameIndex`, without
+probing the disk.
+
+Args:
+    job (dict): The file's path, name, stat result, category folder and pending description.
+    duplicates (DuplicateFinder): The duplicate detector for this run.
+    plan (ActionPlan): Receives the move, and applies it right away in single-phase mode.
+    similar (NearDuplicateIndex, optional): Collects the kept files' similarity signatures.
+
+Returns:
+    None
+"""
+def place_file(job, duplicates, plan, similar=None):
+    file_path, file, category_path = job['path'], job['name'], job['category_path']
+    review, new_name = job['description'].result()
+    # Read from the file before it moves
+    if 'signature' in job:
+        job['signature'] = job['signature'].result()
+    if review is not None:
+        print(f"Code file review for {file}:\n{review}")
+
+    # Suggest new filename if appropriate
+    if job['rename']:
+        if new_name:
+            new_name = sanitize_filename(new_name)
+            file_extension = os.path.splitext(file)[1]
+
+            # Handle filename conflicts
+            new_file_path = plan.names.reserve(category_path, new_name, file_extension)
+        else:
+            new_file_path = os.path.join(category_path, sanitize_filename(os.path.splitext(file)[0]) + os.path.splitext(file)[1])
+    else:
+        new_file_path = os.path.join(category_path, file)
+
+    # Other names are kept as they are; if one is taken the move is skipped rather than overwrite a file
+    if not job['rename'] or not new_name:
+        plan.names.claim(category_path, os.path.basename(new_file_path))
+
+    # Move and rename file
+    new_stat = plan.move(file_path, job['stat'], new_file_path, "Moved and renamed")
+    if new_stat is not None:
+        duplicates.relocate(file_path, new_file_path, new_stat)
+    if similar:
+        track_similarity(job, new_file_path if new_stat else file_path, new_stat or job['stat'], similar, None, duplicates.index)
+    add_to_search(new_file_path if new_stat else file_path, new_stat or job['stat'])
+
+"""
+Adds a kept file to the search index, with the text extracted from it earlier if there is any.
+
+Content is only taken from the content cache; a file is never read just to index it.
+
+Args:
+    file_path (str): The path of the file now.
+    stat_result (os.stat_result): The stat of the file now.
+
+Returns:
+    None
+"""
+def add_to_search(file_path, stat_result):
+    if search_index:
+        search_index.add(file_path, stat_result, content_cache.get(content_cache.make_key(stat_result, 1000)))
+
+"""
+Finds files by name and content in the search index.
+
+Args:
+    query (str): Words that must each appear in a file's name or content; name words may be any part of the name.
+    limit (int, optional): The maximum number of results. Defaults to `config.SEARCH_MAX_RESULTS`.
+
+Returns:
+    list: The paths of the matching files.
+"""
+def find_files(query, limit=None):
+    if not search_index:
+        return []
+    return search_index.search(query, limit)
+
+"""
+Returns a value below which a given fraction of the samples lie, or None without samples.
+
+Args:
+    samples (iterable): The samples, e.g. recent latencies.
+    fraction (float): The fraction, e.g. 0.5 for the median or 0.99 for the 99th percentile.
+
+Returns:
+    float: The percentile, or None if there are no samples.
+"""
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+"""
+Collects the organizer's internal metrics, to tell whether a run is held back by the disk, the CPU or the API.
+
+Latencies cover the most recent OCR runs and model requests, cache hit rates everything since startup.
+
+Args:
+    progress (ScanProgress, optional): The progress of a running scan, for its counters and queue depths.
+
+Returns:
+    dict: The scan's counters and queue depths (when a scan is given), OCR and model latency percentiles in
+        seconds, the number of model requests waiting or in flight and the hit rates of the caches.
+"""
+def get_pipeline_metrics(progress=None):
+    metrics = progress.snapshot() if progress else {}
+
+    ocr_samples = list(ocr_latencies)
+    llm_samples = list(llm.latencies)
+    metrics['ocr_latency'] = (percentile(ocr_samples, 0.5), percentile(ocr_samples, 0.99))
+    metrics['llm_latency'] = (percentile(llm_samples, 0.5), percentile(llm_samples, 0.99))
+    metrics['llm_queued'] = llm.queued
+
+    caches = {'content': (content_cache.stats['memory_hits'] + content_cache.stats['disk_hits'], content_cache.stats['misses'])}
+    if llm.cache:
+        caches['llm'] = (llm.cache.stats['hits'], llm.cache.stats['misses'])
+    metrics['cache_hit_rates'] = {name: hits / (hits + misses) if hits + misses else None
+                                  for name, (hits, misses) in caches.items()}
+    return metrics
+
+"""
+Computes the similarity signature of a file for near-duplicate detection.
 
-    # After organizing, delete empty folders
-    delete_empty_folders(directory)
+Images get a perceptual hash; every other file, and any image whose pixels can't be read, a MinHash of its
+extracted content (see `NearDuplicateIndex`).
+
+Args:
+    file_path (str): The path to the file.
+    similar (NearDuplicateIndex): The index the signature is meant for.
+    pool (WorkerPool, optional): The worker pool used for CPU-bound extraction.
+    stat_result (os.stat_result, optional): An already available stat of the file, to avoid another stat call.
+
+Returns:
+    str: The signature, or "" if the file has none.
+"""
+def get_similarity_signature(file_path, similar, pool=None, stat_result=None):
+    if is_image(file_path):
+        signature = similar.signature(image_path=file_path)
+        if signature:
+            return signature
+    return similar.signature(text=get_file_content(file_path, pool=pool, stat_result=stat_result))
+
+"""
+Adds a kept file to the near-duplicate index and reports the files it resembles.
+
+The signature comes from the file's index record, from the job, or is computed now; new signatures are stored in
+the file index so unchanged files are never hashed again.
+
+Args:
+    job (dict): The organizer job of the file.
+    file_path (str): The path of the file now.
+    stat_result (os.stat_result): The stat of the file now.
+    similar (NearDuplicateIndex): The near-duplicate index for this run.
+    pool (WorkerPool, optional): The worker pool used for CPU-bound extraction.
+    index (FileIndex, optional): The persistent file index.
+
+Returns:
+    None
+"""
+def track_similarity(job, file_path, stat_result, similar, pool, index=None):
+    record = job['record']
+    if record and record['similarity_hash'] is not None:
+        signature = record['similarity_hash']
+    else:
+        try:
+            signature = job['signature'] if 'signature' in job else get_similarity_signature(file_path, similar, pool, stat_result)
+        except OSError as e:
+            print(f"Error computing similarity signature for {file_path}: {str(e)}")
+            return
+        if index:
+            index.update(stat_result, file_path, similarity_hash=signature)
+
+    matches = similar.add(file_path, signature)
+    if matches:
+        print(f"Near-duplicate of {matches[0]}: {file_path}")
 
 """
 Deletes empty folders within a specified directory.
 
-This function walks through a directory and its subdirectories, checking each folder to see if it is empty.
-If a folder is found to be empty, it is removed. Any errors encountered during the deletion process are logged.
+Used on its own to tidy a tree without organizing it; `organize_directory` removes the folders it empties as it
+goes. Each folder is read once with `os.scandir` (see `tree_walker.prune_empty_folders`), and folders holding only
+empty folders are removed bottom-up in the same pass. Hidden folders are left alone. Any errors encountered
+during the deletion process are logged.
 
 Args:
     path (str): The path to the directory where empty folders should be deleted.
@@ -487,25 +1245,33 @@ Returns:
     None: The function does not return any value. It simply performs the deletion of empty folders and prints logs.
 """
 def delete_empty_folders(path):
-    for root, dirs, files in os.walk(path, topdown=False):
-        for dir in dirs:
-            dir_path = os.path.join(root, dir)
-            try:
-                if not os.listdir(dir_path):  # Check if the directory is empty
-                    os.rmdir(dir_path)
-                    print(f"Deleted empty folder: {dir_path}")
-            except Exception as e:
-                print(f"Error deleting folder {dir_path}: {str(e)}")
+    removed = prune_empty_folders(path)
+    print(f"Deleted {removed} empty folders")
 
 if __name__ == "__main__":
     target_directory = input("Enter the directory path to organize: ")
-    
-    use_custom_categories = input("Do you want to use a custom directory organization scheme? (y/n): ").lower() == 'y'
-    
-    categorization_scheme = {}
-    if use_custom_categories:
-        user_description = input("Describe how you'd like your files organized (e.g., 'I want my photos, documents, and code files separated'): ")
-        categorization_scheme = get_ai_categorization_scheme(user_description)
-        print("Generated categorization scheme:", categorization_scheme)
-    
-    organize_directory(target_directory, categorization_scheme)
\ No newline at end of file
+
+    if input("Do you only want to delete empty folders? (y/n): ").lower() == 'y':
+        delete_empty_folders(target_directory)
+    else:
+        use_custom_categories = input("Do you want to use a custom directory organization scheme? (y/n): ").lower() == 'y'
+
+        categorization_scheme = {}
+        if use_custom_categories:
+            user_description = input("Describe how you'd like your files organized (e.g., 'I want my photos, documents, and code files separated'): ")
+            categorization_scheme = get_ai_categorization_scheme(user_description)
+            print("Generated categorization scheme:", categorization_scheme)
+
+        preview = input("Do you want to preview the changes before applying them? (y/n): ").lower() == 'y'
+        if preview:
+            plan = plan_directory(target_directory, categorization_scheme)
+            plan_path = os.path.join(config.DATA_DIR, "last_plan.json")
+            plan.save(plan_path)
+            print(f"Plan saved to {plan_path}")
+            if input("Apply this plan? (y/n): ").lower() == 'y':
+                apply_plan(plan)
+        else:
+            if input("Do you want to keep watching the directory for new files? (y/n): ").lower() == 'y':
+                watch_directory(target_directory, categorization_scheme)
+            else:
+                organize_directory(target_directory, categorization_scheme)
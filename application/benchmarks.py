@@ -0,0 +1,344 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+
+"""
+Micro-benchmarks for the backend's hot paths.
+
+Each benchmark runs in a fresh process, so peak memory (RSS) is measured per benchmark and not inherited from
+an earlier one. Run from the application directory, e.g.:
+
+    python benchmarks.py pdf --documents 200 --pages 50
+    python benchmarks.py categorize --files 200000
+    python benchmarks.py theme --switches 50 --repaints 500
+    python benchmarks.py startup --runs 5 --max-ms 1500
+"""
+
+# Starts the GUI like main.py and prints the wall-clock time of the window's first paint
+STARTUP_SCRIPT = """
+import sys, time
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent
+app = QApplication(sys.argv)
+from theme import Theme
+from file_manager import WALLEFileManager
+Theme.initialize()
+window = WALLEFileManager()
+
+class FirstPaint(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            print(f"painted {time.time()}", flush=True)
+            app.quit()
+        return False
+
+first_paint = FirstPaint()
+window.central_widget.installEventFilter(first_paint)
+window.show()
+app.exec_()
+"""
+
+"""
+Returns the peak resident set size of the current process in megabytes.
+"""
+def get_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+"""
+Writes a minimal PDF whose pages either hold lines of text or, for image-only pages, only an image.
+
+Args:
+    file_path (str): The path of the PDF to write.
+    pages (int): The number of pages.
+    image_only (bool, optional): Whether the pages carry no fonts or text. Defaults to False.
+"""
+def write_pdf(file_path, pages, image_only=False):
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    if image_only:
+        objects.append(b"<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray /BitsPerComponent 8 /Length 1 >>\nstream\n\x80\nendstream")
+        resources = b"<< /XObject << /Im1 3 0 R >> >>"
+    else:
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        resources = b"<< /Font << /F1 3 0 R >> >>"
+
+    page_ids = []
+    for page in range(pages):
+        if image_only:
+            stream = b"q 612 0 0 792 0 0 cm /Im1 Do Q"
+        else:
+            lines = b"".join(b"(Page %d line %d of the benchmark corpus text.) Tj T* " % (page, line) for line in range(40))
+            stream = b"BT /F1 10 Tf 14 TL 40 760 Td " + lines + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources %s /Contents %d 0 R >>" % (resources, len(objects)))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), pages)
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(file_path, 'wb') as file:
+        file.write(data)
+
+"""
+Creates a synthetic PDF corpus: mostly text documents, plus every fifth document image-only.
+"""
+def make_pdf_corpus(directory, documents, pages):
+    for number in range(documents):
+        write_pdf(os.path.join(directory, f"doc_{number}.pdf"), pages, image_only=number % 5 == 4)
+
+"""
+Extracts text the way the backend did before streaming: every page, concatenated with +=.
+"""
+def extract_pdf_text_eagerly(file_path, max_chars=1000):
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    extracted_text = ""
+    for page in reader.pages:
+        extracted_text += page.extract_text()
+    return extracted_text[:max_chars], len(reader.pages)
+
+"""
+Extracts text from every PDF in the corpus in the given mode and reports the timings through `results`.
+"""
+def run_pdf_benchmark(mode, corpus, results):
+    from pdf_text import extract_pdf_text
+    extract = extract_pdf_text if mode == 'streaming' else extract_pdf_text_eagerly
+
+    files = sorted(os.path.join(corpus, name) for name in os.listdir(corpus))
+    started = time.perf_counter()
+    pages = 0
+    for file_path in files:
+        pages += extract(file_path)[1]
+    elapsed = time.perf_counter() - started
+    results.put((mode, len(files), pages, elapsed, get_peak_rss_mb()))
+
+"""
+Compares eager and streaming PDF text extraction over a corpus: documents/sec, pages parsed/sec and peak RSS.
+"""
+def benchmark_pdf(corpus=None, documents=100, pages=30):
+    with tempfile.TemporaryDirectory() as scratch:
+        if corpus is None:
+            corpus = scratch
+            make_pdf_corpus(corpus, documents, pages)
+
+        results = multiprocessing.Queue()
+        for mode in ('eager', 'streaming'):
+            process = multiprocessing.Process(target=run_pdf_benchmark, args=(mode, corpus, results))
+            process.start()
+            mode, files, parsed, elapsed, peak = results.get()
+            process.join()
+            print(f"{mode:>10}: {files / elapsed:8.1f} docs/s  {parsed / elapsed:9.1f} pages/s  "
+                  f"{parsed} pages parsed  peak RSS {peak:.1f} MB")
+
+"""
+Builds file names and headers for the categorization benchmark: mostly common extensions, plus unknown and
+missing extensions whose type has to be sniffed from the header.
+"""
+def make_categorize_corpus(files):
+    names = ['report.pdf', 'photo.JPG', 'song.mp3', 'notes.txt', 'main.py', 'archive.tar.gz', 'clip.mp4',
+             'sheet.xlsx', 'page.html', 'data.bin', 'scan', 'export.dat', 'README']
+    headers = [b'%PDF-1.7\n', b'\xff\xd8\xff\xe0\x00\x10JFIF', b'ID3\x04', b'plain text', b'import os',
+               b'\x1f\x8b\x08\x00', b'\x00\x00\x00\x18ftypmp42', b'PK\x03\x04', b'<html>', b'\x89PNG\r\n\x1a\n',
+               b'\x89PNG\r\n\x1a\n', b'SQLite format 3\x00', b'Read me first']
+    return [(f"/data/{number}_{names[number % len(names)]}", headers[number % len(headers)]) for number in range(files)]
+
+"""
+Compares `get_file_category`-style categorization (two `mimetypes` lookups per file, no sniffing) with a compiled
+`CategoryMatcher`, in files categorized per second. Headers are passed in, as the organizer does when it already
+read them for partial hashing, so only categorization itself is timed.
+"""
+def benchmark_categorize(files=200000):
+    import mimetypes
+    from categorizer import CategoryMatcher
+    corpus = make_categorize_corpus(files)
+    user_categories = {'.py': ['Code'], 'image': ['Images'], 'application/pdf': ['Documents', 'PDF'], 'text/plain': ['Text']}
+
+    def categorize_with_mimetypes(file_path, user_categories):
+        _, ext = os.path.splitext(file_path)
+        if ext.lower() in user_categories:
+            return user_categories[ext.lower()]
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if mime_type in user_categories:
+            return user_categories[mime_type]
+        if mime_type and mime_type.split('/')[0] in user_categories:
+            return user_categories[mime_type.split('/')[0]]
+        return ['Others']
+
+    started = time.perf_counter()
+    for file_path, header in corpus:
+        categorize_with_mimetypes(file_path, user_categories)
+    elapsed = time.perf_counter() - started
+    print(f"{'mimetypes':>10}: {files / elapsed:12.0f} files/s")
+
+    started = time.perf_counter()
+    matcher = CategoryMatcher(user_categories)
+    compiled = time.perf_counter() - started
+    started = time.perf_counter()
+    for file_path, header in corpus:
+        matcher.categorize(file_path, header)
+    elapsed = time.perf_counter() - started
+    print(f"{'compiled':>10}: {files / elapsed:12.0f} files/s  (compiled in {compiled * 1000:.1f} ms, "
+          f"{matcher.stats['sniffed']} sniffed)")
+
+"""
+Compares theme switching and background repaints before and after the theme resource cache: stylesheets
+rebuilt and set on four widgets versus cached and set on the window once, and the background PNG scaled on every
+repaint versus pre-scaled once per size. Runs on Qt's offscreen platform unless another one is chosen.
+"""
+def benchmark_theme(switches=50, repaints=500):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QPainter, QPixmap
+    from PyQt5.QtCore import Qt
+    app = QApplication.instance() or QApplication(sys.argv)
+    from theme import Theme
+    from file_manager import WALLEFileManager
+    Theme.initialize()
+    window = WALLEFileManager()
+    window.show()
+    themes = ['#4fc8b7', '#e696a6', Theme.SYSTEM_DARK, '#d2ad68', Theme.SYSTEM_LIGHT, '#76adbc']
+
+    def switch_uncached(theme):
+        # What switching did before: a new stylesheet every time, set on four levels of the widget tree
+        Theme.set_theme(theme)
+        Theme.stylesheets.clear()
+        stylesheet = Theme.get_stylesheet()
+        for widget in (window, window.central_widget, window.main_menu, window.metric_menu):
+            widget.setStyleSheet(stylesheet)
+        window.setAttribute(Qt.WA_TranslucentBackground, Theme.get_current_theme() == Theme.CYBERPUNK)
+        window.central_widget.update_theme()
+        app.processEvents()
+
+    def switch_cached(theme):
+        window.change_theme(theme)
+        app.processEvents()
+
+    for name, switch in (('uncached', switch_uncached), ('cached', switch_cached)):
+        started = time.perf_counter()
+        for number in range(switches):
+            switch(themes[number % len(themes)])
+        elapsed = time.perf_counter() - started
+        print(f"{name:>10}: {elapsed / switches * 1000:8.2f} ms per theme switch")
+        # Back to a single stylesheet on the window
+        for widget in (window.central_widget, window.main_menu, window.metric_menu):
+            widget.setStyleSheet("")
+
+    Theme.set_theme('#4fc8b7')
+    width, height = 400, 600
+    target = QPixmap(width, height)
+    original = QPixmap(os.path.join(os.path.dirname(os.path.abspath(__file__)), Theme.get_current_background()))
+    painter = QPainter(target)
+    started = time.perf_counter()
+    for _ in range(repaints):
+        painter.drawPixmap(target.rect(), original, original.rect())
+    elapsed = time.perf_counter() - started
+    print(f"{'scaled':>10}: {elapsed / repaints * 1000:8.3f} ms per background repaint")
+
+    started = time.perf_counter()
+    for _ in range(repaints):
+        painter.drawPixmap(0, 0, Theme.get_background(width, height))
+    elapsed = time.perf_counter() - started
+    painter.end()
+    print(f"{'prescaled':>10}: {elapsed / repaints * 1000:8.3f} ms per background repaint")
+    window.close()
+
+"""
+Returns the import time of each module imported at `depth` or above, from the stderr of `python -X importtime`.
+
+Returns:
+    list: (module, cumulative seconds) pairs, slowest first.
+"""
+def parse_import_times(stderr, depth=1):
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        if level <= depth:
+            times.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(times, key=lambda item: -item[1])
+
+"""
+Measures GUI startup: time from launching a fresh interpreter to the window's first paint, over several runs,
+and which imports the time goes to. With `max_ms`, exits with an error when the median time to first paint is
+above it, so startup regressions fail a check. Runs on Qt's offscreen platform unless another one is chosen.
+"""
+def benchmark_startup(runs=5, max_ms=None, top=10):
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    timings = []
+    imports = []
+    for run in range(runs):
+        # Imports are only profiled in the last run, as profiling slows them down
+        profile = run == runs - 1
+        command = [sys.executable] + (["-X", "importtime"] if profile else []) + ["-c", STARTUP_SCRIPT]
+        started = time.time()
+        result = subprocess.run(command, cwd=directory, env=environment, capture_output=True, text=True)
+        painted = [line for line in result.stdout.splitlines() if line.startswith("painted ")]
+        if not painted:
+            print(f"Startup failed: {result.stderr.strip()[-500:]}")
+            sys.exit(1)
+        if not profile:
+            timings.append(float(painted[0].split()[1]) - started)
+        else:
+            imports = parse_import_times(result.stderr)
+
+    timings.sort()
+    median = timings[len(timings) // 2] if timings else None
+    if median is not None:
+        print(f"time to first paint: median {median * 1000:.0f} ms, best {timings[0] * 1000:.0f} ms over {len(timings)} runs")
+    print("slowest imports (cumulative):")
+    for name, seconds in imports[:top]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    if max_ms is not None and median is not None and median * 1000 > max_ms:
+        print(f"Startup regression: {median * 1000:.0f} ms is above {max_ms} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WALL-E backend benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pdf_parser = subparsers.add_parser("pdf", help="PDF text extraction")
+    pdf_parser.add_argument("--corpus", help="directory of PDFs to use instead of a synthetic corpus")
+    pdf_parser.add_argument("--documents", type=int, default=100)
+    pdf_parser.add_argument("--pages", type=int, default=30)
+
+    categorize_parser = subparsers.add_parser("categorize", help="file categorization")
+    categorize_parser.add_argument("--files", type=int, default=200000)
+
+    theme_parser = subparsers.add_parser("theme", help="theme switches and background repaints")
+    theme_parser.add_argument("--switches", type=int, default=50)
+    theme_parser.add_argument("--repaints", type=int, default=500)
+
+    startup_parser = subparsers.add_parser("startup", help="GUI time to first paint and import times")
+    startup_parser.add_argument("--runs", type=int, default=5, help="runs, the last of which profiles imports instead of being timed")
+    startup_parser.add_argument("--max-ms", type=float, help="fail when the median time to first paint is above this")
+    startup_parser.add_argument("--top", type=int, default=10, help="number of imports listed")
+
+    args = parser.parse_args()
+    if args.benchmark == "startup" and args.runs < 2:
+        parser.error("startup needs --runs of at least 2: one timed and one profiling imports")
+    if args.benchmark == "pdf":
+        benchmark_pdf(args.corpus, args.documents, args.pages)
+    elif args.benchmark == "categorize":
+        benchmark_categorize(args.files)
+    elif args.benchmark == "theme":
+        benchmark_theme(args.switches, args.repaints)
+    elif args.benchmark == "startup":
+        benchmark_startup(args.runs, args.max_ms, args.top)
@@ -1,8 +1,7 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
-from PyQt5.QtGui import QPainter, QColor, QPen, QPixmap, QPainterPath
+from PyQt5.QtGui import QPainter, QColor, QPen, QPainterPath
 from PyQt5.QtCore import Qt, QRectF
 from theme import Theme
-import os
 
 class BorderedWidget(QWidget):
     def __init__(self, parent=None):
@@ -11,18 +10,6 @@ class BorderedWidget(QWidget):
         self.content_layout = QVBoxLayout(self)
         self.content_layout.setContentsMargins(20, 20, 20, 20)
 
-        self.background_image = None
-        self.load_background_image()
-
-    def load_background_image(self):
-        if Theme.get_current_background():
-            image_path = os.path.join(os.path.dirname(__file__), Theme.get_current_background())
-            self.background_image = QPixmap(image_path)
-            if self.background_image.isNull():
-                print(f"Error: Background image could not be loaded: {image_path}")
-        else:
-            self.background_image = None
-
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -30,9 +17,10 @@ class BorderedWidget(QWidget):
         # Fill background
         painter.fillRect(self.rect(), QColor(Theme.COLORS[Theme.get_current_theme()]['background']))
 
-        # Draw the background image for cyberpunk theme
-        if self.background_image and not self.background_image.isNull():
-            painter.drawPixmap(self.rect(), self.background_image, self.background_image.rect())
+        # Draw the background image for cyberpunk theme, already scaled to this size
+        background = Theme.get_background(self.width(), self.height(), self.devicePixelRatioF())
+        if background:
+            painter.drawPixmap(0, 0, background)
 
         # Draw rounded rectangle border
         path = QPainterPath()
@@ -43,7 +31,6 @@ class BorderedWidget(QWidget):
         painter.drawPath(path)
 
     def update_theme(self):
-        self.load_background_image()
         self.update()
 
     def resizeEvent(self, event):
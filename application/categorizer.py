@@ -0,0 +1,180 @@
+import os
+import mimetypes
+import config
+
+# MIME types that say nothing about what a file really holds, so its first bytes are checked instead
+GENERIC_MIME_TYPES = {'application/octet-stream'}
+
+# Magic numbers: (offset, signature, MIME type), most specific first
+SIGNATURES = [
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (8, b'WEBP', 'image/webp'),
+    (0, b'BM', 'image/bmp'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'\x1f\x8b', 'application/gzip'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (0, b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (0, b'SQLite format 3\x00', 'application/vnd.sqlite3'),
+    (0, b'\x7fELF', 'application/x-executable'),
+    (0, b'MZ', 'application/x-msdownload'),
+    (0, b'\xcf\xfa\xed\xfe', 'application/x-mach-binary'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'fLaC', 'audio/flac'),
+    (8, b'WAVE', 'audio/wav'),
+    (8, b'AVI ', 'video/x-msvideo'),
+    (4, b'ftyp', 'video/mp4'),
+    (0, b'\x1a\x45\xdf\xa3', 'video/x-matroska'),
+]
+
+# Signatures at offset 0 grouped by first byte, so a header is compared with at most a few of them
+SIGNATURE_PREFIXES = {}
+OFFSET_SIGNATURES = []
+SIGNATURE_TYPES = {}
+for offset, signature, mime_type in SIGNATURES:
+    SIGNATURE_TYPES[offset, signature] = mime_type
+    if offset == 0:
+        SIGNATURE_PREFIXES.setdefault(signature[:1], []).append((offset, signature))
+    else:
+        OFFSET_SIGNATURES.append((offset, signature))
+
+"""
+Reads the first bytes of a file, enough for `sniff_mime_type`.
+
+Args:
+    file_path (str): The path to the file.
+    size (int, optional): The number of bytes to read. Defaults to `config.MAGIC_HEADER_SIZE`.
+
+Returns:
+    bytes: The first bytes of the file, or b"" if it can't be read.
+"""
+def read_header(file_path, size=None):
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read(size or config.MAGIC_HEADER_SIZE)
+    except OSError as e:
+        print(f"Error reading file {file_path}: {str(e)}")
+        return b""
+
+"""
+Recognizes a file type from the first bytes of the file.
+
+Known binary signatures are matched first; two-byte signatures such as "MZ" only count in headers that hold
+a NUL byte, so text that happens to start with them isn't mistaken for a binary. A header without NUL bytes
+that decodes as UTF-8 is taken to be plain text.
+
+Args:
+    header (bytes): The first bytes of the file.
+
+Returns:
+    str: The MIME type, or None if the bytes are not recognized.
+"""
+def sniff_mime_type(header):
+    if not header:
+        return None
+    binary = b'\x00' in header
+    for offset, signature in SIGNATURE_PREFIXES.get(header[:1], ()):
+        if header.startswith(signature, offset) and (binary or len(signature) > 2):
+            return SIGNATURE_TYPES[offset, signature]
+    for offset, signature in OFFSET_SIGNATURES:
+        if header.startswith(signature, offset):
+            return SIGNATURE_TYPES[offset, signature]
+
+    if not binary:
+        try:
+            # The header may end in the middle of a multi-byte character
+            header.decode('utf-8')
+            return 'text/plain'
+        except UnicodeDecodeError as e:
+            if e.start >= len(header) - 3:
+                return 'text/plain'
+    return None
+
+"""
+Maps files to categories with tables compiled once per run.
+
+Every extension known to `mimetypes` is resolved to its category up front, taking the user's categories into
+account in the same order as before: extension, full MIME type, general type. Categorizing a file is then a
+single dictionary lookup on its extension. Only files whose extension is unknown or generic (e.g. .bin, .dat)
+have their first bytes checked against magic-number signatures, so extensionless and mislabeled files are
+recognized too. Their header can be passed in when it was already read, e.g. by partial hashing.
+
+Args:
+    user_categories (dict, optional): Extensions, MIME types or general types mapped to categories.
+"""
+class CategoryMatcher:
+    def __init__(self, user_categories=None):
+        self.user_categories = user_categories or {}
+        self.by_mime = {}  # MIME type -> category, filled as types are seen
+        self.by_extension = {}  # extension -> category, for extensions that need no sniffing
+        self.extension_types = {}  # extension -> MIME type, for generic extensions that are sniffed first
+        self.stats = {'extension': 0, 'sniffed': 0}
+
+        if not mimetypes.inited:
+            mimetypes.init()
+        extensions = set(mimetypes.types_map) | set(mimetypes.common_types) | set(mimetypes.suffix_map)
+        for extension in extensions:
+            extension = extension.lower()
+            if extension in self.user_categories:
+                continue
+            mime_type, _ = mimetypes.guess_type('file' + extension)
+            if mime_type in GENERIC_MIME_TYPES:
+                self.extension_types[extension] = mime_type
+            elif mime_type:
+                self.by_extension[extension] = self.resolve(mime_type)
+        # The user's own extensions always win, even generic ones
+        for key, category in self.user_categories.items():
+            if key.startswith('.'):
+                self.by_extension[key.lower()] = category
+                self.extension_types.pop(key.lower(), None)
+
+    def resolve(self, mime_type):
+        # Returns the category of a MIME type, None standing for an unknown type
+        if mime_type in self.by_mime:
+            return self.by_mime[mime_type]
+
+        if not self.user_categories:
+            # Default categorization if no user categories are defined
+            if mime_type:
+                category = mime_type.split('/')[0]
+                category = [category if category != 'application' else 'documents']
+            else:
+                category = ['others']
+        elif mime_type in self.user_categories:
+            category = self.user_categories[mime_type]
+        elif mime_type and mime_type.split('/')[0] in self.user_categories:
+            category = self.user_categories[mime_type.split('/')[0]]
+        elif mime_type and mime_type.startswith('application/drawing'):
+            # Consider drawings as images
+            category = ['Images']
+        else:
+            category = ['Others']
+
+        self.by_mime[mime_type] = category
+        return category
+
+    def categorize(self, file_path, header=None):
+        raw_extension = os.path.splitext(file_path)[1]
+        extension = raw_extension.lower()
+        category = self.by_extension.get(extension)
+        if category is not None:
+            self.stats['extension'] += 1
+            return category
+
+        mime_type = self.extension_types.get(extension)
+        if raw_extension in mimetypes.encodings_map or extension in mimetypes.encodings_map:
+            # Compressed files such as .tar.gz are typed by their inner extension
+            mime_type, _ = mimetypes.guess_type(file_path)
+            if mime_type:
+                self.stats['extension'] += 1
+                return self.resolve(mime_type)
+
+        self.stats['sniffed'] += 1
+        sniffed = sniff_mime_type(header if header is not None else read_header(file_path))
+        return self.resolve(sniffed or mime_type)
@@ -0,0 +1,104 @@
+import os
+
+# Duplicate detection
+HASH_ALGORITHM = "blake2b"  # Any name accepted by hashlib.new, e.g. "md5", "sha256", "blake2b"
+HASH_CHUNK_SIZE = 1024 * 1024  # Bytes read per update when hashing a whole file
+PARTIAL_HASH_BLOCK_SIZE = 64 * 1024  # Size of the head and tail blocks used for the partial hash
+HASH_USE_MMAP = False  # Hash whole files through mmap instead of buffered reads
+
+# Persistent state
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".walle")
+INDEX_PATH = os.path.join(DATA_DIR, "index.sqlite3")  # File metadata, hash and decision index
+INDEX_COMMIT_INTERVAL = 500  # Index writes grouped into one transaction
+
+# Parallel execution
+PARALLEL = False  # Run content extraction, hashing and LLM calls on worker pools
+IO_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # Threads for hashing, reads and network calls
+CPU_WORKERS = os.cpu_count() or 1  # Processes for OCR and PDF parsing
+PARALLEL_LOOKAHEAD = 4 * IO_WORKERS  # Files analyzed ahead of the coordinator
+
+# Near-duplicate detection
+NEAR_DUPLICATES = True  # Report clusters of near-identical images and texts among the kept files
+NEAR_DUPLICATE_TEXT_SIMILARITY = 0.8  # Estimated Jaccard similarity of word shingles for texts
+NEAR_DUPLICATE_IMAGE_DISTANCE = 6  # Differing bits out of 64 in the perceptual hash for images
+MINHASH_PERMUTATIONS = 128  # Signature length, longer is more accurate but slower
+MINHASH_SHINGLE_SIZE = 3  # Words per shingle
+NEAR_DUPLICATE_REPORT_PATH = os.path.join(DATA_DIR, "near_duplicates.json")
+
+# Drive scans
+DRIVE_ROTATIONAL_IO_WORKERS = 2  # I/O threads per spinning disk; solid state disks get IO_WORKERS
+DRIVE_PROGRESS_INTERVAL = 5  # Seconds between progress reports
+
+# Watch mode
+WATCH_SETTLE_SECONDS = 2  # A new or changed file is organized once it has been left alone this long
+WATCH_POLL_INTERVAL = 30  # Seconds between walks where file system events aren't available
+WATCH_PARTIAL_SUFFIXES = ('.part', '.partial', '.crdownload', '.download', '.tmp')  # Downloads in progress
+
+# Categorization
+MAGIC_HEADER_SIZE = 512  # Bytes read to recognize files with an unknown or generic extension
+
+# Applying changes
+TWO_PHASE = False  # Plan the whole directory before deleting or moving anything, then apply in bulk
+PROGRESS_REPORT_INTERVAL = 0.2  # Minimum seconds between progress updates sent to the GUI
+
+# Live metrics
+METRICS_INTERVAL = 1.0  # Seconds between samples while the metrics are shown
+METRICS_HIDDEN_INTERVAL = 10.0  # Seconds between samples while the window is hidden or minimized
+METRICS_DISK_USAGE_INTERVAL = 30.0  # Seconds between disk usage checks, which change slowly
+METRICS_HISTORY = 60  # Samples kept per metric for the sparklines
+
+# Language model
+LLM_MODEL = "gpt-3.5-turbo"
+LLM_MAX_CONCURRENCY = 8  # Requests in flight at once
+LLM_TOKENS_PER_MINUTE = 90000  # Token budget, 0 disables the limit
+LLM_OUTPUT_TOKEN_ESTIMATE = 100  # Reply tokens reserved per request before the real usage is known
+LLM_MAX_RETRIES = 5  # Retries on 429, 5xx and connection errors
+LLM_BACKOFF_BASE = 0.5  # Seconds, doubled per retry
+LLM_BACKOFF_MAX = 30  # Seconds
+COMBINED_ANALYSIS = True  # One JSON-validated call per file for usefulness, category, name and summary
+LLM_PROMPT_VERSION = 1  # Bump to invalidate every cached response, e.g. after changing how replies are parsed
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = 100000
+LLM_CACHE_TTL = 30 * 24 * 60 * 60  # Seconds
+OFFLINE = False  # Never call the model: files are decided by the local classifier or kept as they are
+
+# Search index
+SEARCH_INDEX_ENABLED = True  # Index kept files' names and extracted text for Find Files
+SEARCH_INDEX_PATH = os.path.join(DATA_DIR, "search_index.sqlite3")
+SEARCH_COMMIT_INTERVAL = 500  # Index writes grouped into one transaction
+SEARCH_MAX_TERMS = 500  # Distinct words indexed per file
+SEARCH_MAX_RESULTS = 100
+
+# Local classifier
+LOCAL_CLASSIFIER_ENABLED = True  # Decide confident files locally, from past model verdicts, before calling the model
+LOCAL_CLASSIFIER_PATH = os.path.join(DATA_DIR, "local_classifier.sqlite3")
+LOCAL_CLASSIFIER_DIMENSIONS = 2 ** 16  # Hash buckets for word unigrams and bigrams
+LOCAL_CLASSIFIER_CONFIDENCE = 0.9  # Probability needed to decide without the model
+LOCAL_CLASSIFIER_MIN_EXAMPLES = 200  # Model verdicts recorded before the first training
+LOCAL_CLASSIFIER_RETRAIN_INTERVAL = 100  # New verdicts that trigger retraining at the start of a run
+LOCAL_CLASSIFIER_MAX_EXAMPLES = 5000  # Most recent verdicts trained on
+LOCAL_CLASSIFIER_EPOCHS = 5
+LOCAL_CLASSIFIER_LEARNING_RATE = 0.5
+LOCAL_CLASSIFIER_MAX_CATEGORIES = 32  # Most frequent categories the category model chooses from
+LOCAL_CLASSIFIER_MIN_CATEGORY_EXAMPLES = 10  # Verdicts a category needs to be learned
+
+# Extracted content
+CONTENT_CACHE_PATH = os.path.join(DATA_DIR, "content_cache.sqlite3")
+CONTENT_CACHE_MEMORY = 64 * 1024 * 1024  # Characters of extracted text kept in memory before spilling to disk
+CONTENT_CACHE_MAX_ENTRIES = 500000
+
+# OCR
+OCR_TIMEOUT = 10  # Seconds per image, text read before the timeout is kept
+OCR_TARGET_DPI = 300  # Images scanned at a higher DPI are scaled down to this
+OCR_MAX_SIDE = 2500  # Pixels, longer images are scaled down to fit
+OCR_STRIP_HEIGHT = 600  # Pixels per strip read before checking whether enough text was collected
+OCR_PRECHECK_SIZE = 256  # Pixels, size of the thumbnail used to check for any sign of text
+OCR_MIN_CONTRAST = 2  # Grayscale standard deviation below which an image is considered blank
+OCR_EDGE_THRESHOLD = 32  # Edge strength counted as an edge pixel
+OCR_MIN_EDGE_DENSITY = 0.01  # Fraction of edge pixels below which an image is considered textless
+
+# PDF text extraction
+PDF_TIMEOUT = 5  # Seconds per document, text read before the timeout is kept
+PDF_MEMORY_BUDGET = 256 * 1024 * 1024  # Bytes the process may grow by while parsing one document
+PDF_PROBE_PAGES = 3  # Leading pages without fonts after which a document is treated as image-only
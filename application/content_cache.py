@@ -0,0 +1,132 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import config
+
+"""
+Two-tier cache of text extracted from files.
+
+Every consumer of a file's content (usefulness check, code review, filename suggestion) goes through this
+cache, so OCR, PDF parsing and raw reads happen once per file per run. Entries are keyed on the file's device,
+inode, size and modification time, which identifies unchanged content without reading the file. Recently used
+entries are kept in memory up to `max_memory` characters; older ones spill to an SQLite database, which also
+carries extracted text over to later runs. The database keeps at most `max_entries` entries, oldest first out.
+
+Args:
+    path (str, optional): The path to the SQLite database. Defaults to `config.CONTENT_CACHE_PATH`.
+    max_memory (int, optional): The memory budget for cached text in characters. Defaults to `config.CONTENT_CACHE_MEMORY`.
+    max_entries (int, optional): The maximum number of entries on disk. Defaults to `config.CONTENT_CACHE_MAX_ENTRIES`.
+"""
+class ContentCache:
+    def __init__(self, path=None, max_memory=None, max_entries=None):
+        self.path = path or config.CONTENT_CACHE_PATH
+        self.max_memory = max_memory or config.CONTENT_CACHE_MEMORY
+        self.max_entries = max_entries or config.CONTENT_CACHE_MAX_ENTRIES
+
+        self.memory = OrderedDict()  # key -> text, least recently used first
+        self.memory_chars = 0
+        self.unsaved = set()  # keys in memory that aren't on disk yet
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'spills': 0}
+        self.connection = None
+        # Content is requested from the coordinator and from I/O worker threads
+        self.lock = threading.RLock()
+
+    def connect(self):
+        # Opened on first use, so importing the backend doesn't touch the disk
+        if self.connection:
+            return self.connection
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS content (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS content_last_used ON content (last_used)")
+        self.connection.commit()
+        return self.connection
+
+    def make_key(self, stat_result, max_chars):
+        return f"{stat_result.st_dev}:{stat_result.st_ino}:{stat_result.st_size}:{stat_result.st_mtime_ns}:{max_chars}"
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self.memory[key]
+
+            row = self.connect().execute("SELECT text FROM content WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.stats['disk_hits'] += 1
+                self.remember(key, row[0])
+                self.spill()
+                return row[0]
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, text, persist=True):
+        # Results that shouldn't outlive the run (e.g. empty text after an extraction error) are kept in memory only
+        with self.lock:
+            self.remember(key, text)
+            if persist:
+                self.unsaved.add(key)
+            self.spill()
+
+    def remember(self, key, text):
+        if key in self.memory:
+            self.memory_chars -= len(self.memory.pop(key))
+        self.memory[key] = text
+        self.memory_chars += len(text)
+
+    def spill(self):
+        connection = None
+        while self.memory_chars > self.max_memory and len(self.memory) > 1:
+            key, text = self.memory.popitem(last=False)
+            self.memory_chars -= len(text)
+            if key in self.unsaved:
+                self.unsaved.discard(key)
+                connection = self.connect()
+                self.save(connection, key, text)
+                self.stats['spills'] += 1
+        if connection:
+            connection.commit()
+
+    def save(self, connection, key, text):
+        connection.execute(
+            "INSERT OR REPLACE INTO content (key, text, last_used) VALUES (?, ?, ?)",
+            (key, text, time.time())
+        )
+
+    def flush(self):
+        # Writes everything not yet on disk and trims the database to its size bound
+        with self.lock:
+            if not self.unsaved:
+                return
+            connection = self.connect()
+            for key in self.unsaved:
+                self.save(connection, key, self.memory[key])
+            self.unsaved.clear()
+
+            count = connection.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM content WHERE key IN (SELECT key FROM content ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.connection:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,45 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QPushButton, QFileDialog
+from PyQt5.QtCore import Qt
+from drives import list_drives
+
+class DriveDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Organize Drive")
+        self.setMinimumWidth(320)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Drives and folders to organize:"))
+        self.root_list = QListWidget(self)
+        layout.addWidget(self.root_list)
+
+        # Mounted drives are listed unchecked, so nothing is organized without choosing it
+        for mountpoint in list_drives():
+            self.add_root(mountpoint, Qt.Unchecked)
+
+        buttons = QHBoxLayout()
+        add_button = QPushButton("Add Folder", self)
+        add_button.clicked.connect(self.add_folder)
+        ok_button = QPushButton("Organize", self)
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancel", self)
+        cancel_button.clicked.connect(self.reject)
+        buttons.addWidget(add_button)
+        buttons.addStretch()
+        buttons.addWidget(ok_button)
+        buttons.addWidget(cancel_button)
+        layout.addLayout(buttons)
+
+    def add_root(self, path, state=Qt.Checked):
+        item = QListWidgetItem(path, self.root_list)
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        item.setCheckState(state)
+
+    def add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Folder to Organize")
+        if directory:
+            self.add_root(directory)
+
+    def selected_roots(self):
+        return [self.root_list.item(row).text() for row in range(self.root_list.count())
+                if self.root_list.item(row).checkState() == Qt.Checked]
@@ -0,0 +1,151 @@
+import os
+import time
+import psutil
+import config
+from scan_progress import ScanProgress
+
+"""
+Returns the physical disk holding a file system device, e.g. "sda" for a partition on /dev/sda1.
+
+Partitions of one disk share its read head, so they are scheduled together. On Linux the disk is found through
+/sys/dev/block; elsewhere, or if it can't be found, every file system device counts as its own disk.
+
+Args:
+    device (int): The `st_dev` of a file or folder.
+
+Returns:
+    str: The name of the disk.
+"""
+def physical_disk(device):
+    block = os.path.realpath(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}")
+    if not os.path.isdir(block):
+        return f"device {os.major(device)}:{os.minor(device)}"
+    # A partition's folder sits inside the folder of its disk
+    if os.path.exists(os.path.join(block, 'partition')):
+        block = os.path.dirname(block)
+    return os.path.basename(block)
+
+"""
+Returns whether a disk is a spinning disk, which is slowed down rather than sped up by concurrent random reads.
+
+Args:
+    disk (str): The name of the disk, as returned by `physical_disk`.
+
+Returns:
+    bool: True for rotational disks, False for solid state and unknown disks.
+"""
+def is_rotational(disk):
+    try:
+        with open(f"/sys/block/{disk}/queue/rotational") as file:
+            return file.read().strip() == '1'
+    except OSError:
+        return False
+
+"""
+Lists the mount points of the mounted drives, for choosing the roots of a drive scan.
+
+Returns:
+    list: The mount points of physical partitions.
+"""
+def list_drives():
+    try:
+        return [partition.mountpoint for partition in psutil.disk_partitions(all=False)]
+    except Exception as e:
+        print(f"Error listing drives: {str(e)}")
+        return []
+
+"""
+Groups the roots of a drive scan by the physical disk they are on.
+
+Roots inside another root are dropped, as the walk of the outer root covers them, unless they are on another
+device: the walk never crosses into another file system, so those stay roots of their own.
+
+Args:
+    roots (list): The paths of the roots to scan.
+    parent (ScanProgress, optional): The progress of the whole scan, which every disk's progress adds to.
+
+Returns:
+    list: A `DeviceProgress` per disk, holding its roots as (path, st_dev) pairs.
+"""
+def group_roots(roots, parent=None):
+    devices = {}
+    for root in roots:
+        try:
+            devices[os.path.abspath(root)] = os.stat(root).st_dev
+        except OSError as e:
+            print(f"Error reading {root}: {str(e)}")
+
+    groups = {}
+    for root, device in sorted(devices.items()):
+        covered = any(root != other and root.startswith(other.rstrip(os.sep) + os.sep) and devices[other] == device
+                      for other in devices)
+        if not covered:
+            disk = physical_disk(device)
+            groups.setdefault(disk, DeviceProgress(disk, parent)).roots.append((root, device))
+    return list(groups.values())
+
+"""
+Scan state and progress of one physical disk in a drive scan.
+
+The disk's roots are organized one after another by a thread of its own, with `io_workers` I/O threads: few on
+spinning disks, so their head isn't sent back and forth, and the usual number on solid state disks. Counters are
+updated from that thread and read from the thread reporting progress. Everything is also counted in the
+`parent` progress of the whole scan, and cancelling the scan cancels every disk.
+
+Args:
+    disk (str): The name of the disk.
+    parent (ScanProgress, optional): The progress of the whole scan.
+"""
+class DeviceProgress(ScanProgress):
+    def __init__(self, disk, parent=None):
+        super().__init__()
+        self.parent = parent
+        if parent:
+            self.cancelled = parent.cancelled
+        self.disk = disk
+        self.rotational = is_rotational(disk)
+        self.io_workers = config.DRIVE_ROTATIONAL_IO_WORKERS if self.rotational else config.IO_WORKERS
+        self.roots = []  # (path, st_dev) of the roots on this disk
+        self.current = None
+        self.started = None
+        self.finished = None
+
+    def start(self, root):
+        with self.lock:
+            self.current = root
+            if self.started is None:
+                self.started = time.monotonic()
+
+    def walked(self, stat_result):
+        super().walked(stat_result)
+        if self.parent:
+            self.parent.walked(stat_result)
+
+    def hashed(self, count):
+        super().hashed(count)
+        if self.parent:
+            self.parent.hashed(count)
+
+    def acted(self):
+        super().acted()
+        if self.parent:
+            self.parent.acted()
+
+    def watch_queue(self, name, depth):
+        super().watch_queue(name, depth)
+        if self.parent:
+            self.parent.watch_queue(f"{self.disk} {name}", depth)
+
+    def finish(self):
+        with self.lock:
+            self.current = None
+            self.finished = time.monotonic()
+
+    def report(self):
+        with self.lock:
+            if self.started is None:
+                return f"{self.disk}: waiting"
+            seconds = max((self.finished or time.monotonic()) - self.started, 1e-9)
+            state = "done" if self.finished else f"in {self.current}"
+            return (f"{self.disk}: {self.files} files, {self.bytes / (1024 * 1024):.1f} MB, "
+                    f"{self.files / seconds:.1f} files/s ({state})")
@@ -0,0 +1,238 @@
+import os
+import mmap
+import hashlib
+import threading
+import config
+
+"""
+Generates a hash for a whole file without loading it into memory.
+
+The file is read in fixed-size chunks (or through a read-only memory map), so memory use stays bounded
+by `chunk_size` regardless of how large the file is.
+
+Args:
+    file_path (str): The path to the file for which the hash is to be computed.
+    algorithm (str, optional): Any algorithm name accepted by `hashlib.new`. Defaults to `config.HASH_ALGORITHM`.
+    chunk_size (int, optional): The number of bytes hashed per update. Defaults to `config.HASH_CHUNK_SIZE`.
+    use_mmap (bool, optional): Whether to hash through a memory map instead of buffered reads. Defaults to `config.HASH_USE_MMAP`.
+    progress (ScanProgress, optional): Is told how many bytes were hashed.
+
+Returns:
+    str: The hash of the file as a hexadecimal string.
+"""
+def hash_file(file_path, algorithm=None, chunk_size=None, use_mmap=None, progress=None):
+    algorithm = algorithm or config.HASH_ALGORITHM
+    chunk_size = chunk_size or config.HASH_CHUNK_SIZE
+    use_mmap = config.HASH_USE_MMAP if use_mmap is None else use_mmap
+
+    hasher = hashlib.new(algorithm)
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+
+        # mmap cannot map empty files, those fall through to the buffered path
+        if use_mmap and size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, chunk_size):
+                    hasher.update(mapped[offset:offset + chunk_size])
+            if progress:
+                progress.hashed(size)
+            return hasher.hexdigest()
+
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            read = file.readinto(buf)
+            if not read:
+                break
+            hasher.update(view[:read])
+        if progress:
+            progress.hashed(file.tell())
+    return hasher.hexdigest()
+
+"""
+Generates a hash over the first and last blocks of a file.
+
+This is a cheap pre-filter for files of equal size: two files whose partial hashes differ cannot be identical,
+so the full hash only has to be computed when the partial hashes collide. For files no larger than two blocks
+the partial hash already covers every byte.
+
+Args:
+    file_path (str): The path to the file for which the hash is to be computed.
+    algorithm (str, optional): Any algorithm name accepted by `hashlib.new`. Defaults to `config.HASH_ALGORITHM`.
+    block_size (int, optional): The size of the head and tail blocks. Defaults to `config.PARTIAL_HASH_BLOCK_SIZE`.
+    with_header (bool, optional): Whether to also return the file's first `config.MAGIC_HEADER_SIZE` bytes, which
+        the head block already holds, for file type detection. Defaults to False.
+    progress (ScanProgress, optional): Is told how many bytes were hashed.
+
+Returns:
+    str: The partial hash of the file as a hexadecimal string, or a tuple of the hash and the header.
+"""
+def partial_hash_file(file_path, algorithm=None, block_size=None, with_header=False, progress=None):
+    algorithm = algorithm or config.HASH_ALGORITHM
+    block_size = block_size or config.PARTIAL_HASH_BLOCK_SIZE
+
+    hasher = hashlib.new(algorithm)
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        head = file.read(block_size)
+        hasher.update(head)
+        tail = b''
+        if size > block_size:
+            file.seek(max(block_size, size - block_size))
+            tail = file.read(block_size)
+            hasher.update(tail)
+    if progress:
+        progress.hashed(len(head) + len(tail))
+    if with_header:
+        return hasher.hexdigest(), head[:config.MAGIC_HEADER_SIZE]
+    return hasher.hexdigest()
+
+"""
+Detects byte-identical files in stages, from cheapest to most expensive check.
+
+Files are first grouped by size. Only when a file has the same size as one seen before is a partial hash of
+its head and tail blocks computed, and only when the partial hashes also collide is the whole file hashed.
+Files with a unique size are never read at all. Hashes are computed lazily and kept only for files that took
+part in a collision. When a `FileIndex` is given, hashes of unchanged files are reused from earlier runs and
+newly computed ones are stored in it. One finder can be shared by several threads, e.g. to find duplicates
+across all the roots of a drive scan. Only files of the same size can be duplicates of each other, so each size
+has a lock of its own: hashing a large file holds up other files of its size, never the checks on other sizes.
+
+Args:
+    algorithm (str, optional): Any algorithm name accepted by `hashlib.new`. Defaults to `config.HASH_ALGORITHM`.
+    chunk_size (int, optional): The number of bytes hashed per update for full hashes. Defaults to `config.HASH_CHUNK_SIZE`.
+    block_size (int, optional): The size of the head and tail blocks for partial hashes. Defaults to `config.PARTIAL_HASH_BLOCK_SIZE`.
+    use_mmap (bool, optional): Whether full hashes are computed through a memory map. Defaults to `config.HASH_USE_MMAP`.
+    index (FileIndex, optional): A persistent index used to reuse and store hashes across runs.
+    progress (ScanProgress, optional): Is told how many bytes were hashed.
+"""
+class DuplicateFinder:
+    def __init__(self, algorithm=None, chunk_size=None, block_size=None, use_mmap=None, index=None, progress=None):
+        self.algorithm = algorithm or config.HASH_ALGORITHM
+        self.chunk_size = chunk_size or config.HASH_CHUNK_SIZE
+        self.block_size = block_size or config.PARTIAL_HASH_BLOCK_SIZE
+        self.use_mmap = config.HASH_USE_MMAP if use_mmap is None else use_mmap
+        self.index = index
+        self.progress = progress
+
+        self.files_by_size = {}  # size -> paths of files kept so far
+        self.stats = {}  # path -> stat result, for every kept file and the file being checked
+        self.partial_hashes = {}
+        self.full_hashes = {}
+        # A file's entries above are only touched while holding the lock of its size
+        self.size_locks = {}  # size -> lock
+        self.lock = threading.Lock()
+
+    def size_lock(self, size):
+        with self.lock:
+            return self.size_locks.setdefault(size, threading.RLock())
+
+    def find_duplicate(self, file_path, stat_result=None, partial_hash=None):
+        # Returns the path of an earlier identical file, or registers this one as an original and returns None
+        if stat_result is None:
+            stat_result = os.stat(file_path)
+        with self.size_lock(stat_result.st_size):
+            return self.register(file_path, stat_result, partial_hash)
+
+    def register(self, file_path, stat_result, partial_hash):
+        size = stat_result.st_size
+        self.stats[file_path] = stat_result
+
+        # Computed ahead of time by a worker, only needs to be remembered
+        if partial_hash is not None:
+            self.partial_hashes[file_path] = partial_hash
+            self.store_hash(file_path, 'partial_hash', partial_hash)
+
+        candidates = self.files_by_size.setdefault(size, [])
+        for candidate in candidates:
+            try:
+                if self.is_identical(candidate, file_path, size):
+                    self.discard(file_path)
+                    return candidate
+            except OSError as e:
+                print(f"Error comparing {file_path} with {candidate}: {str(e)}")
+
+        candidates.append(file_path)
+        return None
+
+    def is_identical(self, first_path, second_path, size):
+        if self.get_partial_hash(first_path) != self.get_partial_hash(second_path):
+            return False
+        # The partial hash already covered every byte
+        if size <= 2 * self.block_size:
+            return True
+        return self.get_full_hash(first_path) == self.get_full_hash(second_path)
+
+    def get_partial_hash(self, file_path):
+        if file_path not in self.partial_hashes:
+            self.partial_hashes[file_path] = self.get_indexed_hash(
+                file_path, 'partial_hash',
+                lambda: partial_hash_file(file_path, self.algorithm, self.block_size, progress=self.progress)
+            )
+        return self.partial_hashes[file_path]
+
+    def get_full_hash(self, file_path):
+        if file_path not in self.full_hashes:
+            self.full_hashes[file_path] = self.get_indexed_hash(
+                file_path, 'full_hash',
+                lambda: hash_file(file_path, self.algorithm, self.chunk_size, self.use_mmap, self.progress)
+            )
+        return self.full_hashes[file_path]
+
+    def get_indexed_hash(self, file_path, field, compute):
+        stat_result = self.stats.get(file_path)
+        if not self.index or stat_result is None:
+            return compute()
+
+        record = self.index.lookup(stat_result)
+        if record and record['hash_algorithm'] == self.algorithm and record[field]:
+            return record[field]
+
+        value = compute()
+        self.store_hash(file_path, field, value, record)
+        return value
+
+    def store_hash(self, file_path, field, value, record=None):
+        stat_result = self.stats.get(file_path)
+        if not self.index or stat_result is None:
+            return
+        if record is None:
+            record = self.index.lookup(stat_result)
+
+        fields = {'hash_algorithm': self.algorithm}
+        if record and record['hash_algorithm'] != self.algorithm:
+            # Hashes stored under another algorithm can't be compared with this one
+            fields.update(partial_hash=None, full_hash=None)
+        fields[field] = value
+        self.index.update(stat_result, file_path, **fields)
+
+    def relocate(self, old_path, new_path, stat_result=None):
+        # Keep tracking a kept file after it has been moved or renamed
+        old_stat = self.stats.get(old_path)
+        if old_stat is None:
+            return
+        with self.size_lock(old_stat.st_size):
+            if self.stats.pop(old_path, None) is None:
+                return
+            candidates = self.files_by_size[old_stat.st_size]
+            candidates[candidates.index(old_path)] = new_path
+            self.stats[new_path] = stat_result or old_stat
+            for hashes in (self.partial_hashes, self.full_hashes):
+                if old_path in hashes:
+                    hashes[new_path] = hashes.pop(old_path)
+
+    def forget(self, file_path):
+        # Stop tracking a kept file, e.g. after it has been deleted
+        stat_result = self.stats.get(file_path)
+        if stat_result is None:
+            return
+        with self.size_lock(stat_result.st_size):
+            if file_path not in self.stats:
+                return
+            self.files_by_size[stat_result.st_size].remove(file_path)
+            self.discard(file_path)
+
+    def discard(self, file_path):
+        self.stats.pop(file_path, None)
+        self.partial_hashes.pop(file_path, None)
+        self.full_hashes.pop(file_path, None)
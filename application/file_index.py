@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import threading
+import config
+
+"""
+Persistent index of file metadata, hashes and past decisions.
+
+Records are keyed on (device, inode) and are only considered valid while the file's size and modification
+time (in nanoseconds) still match, so a single `os.stat` is enough to tell whether anything cached for a file
+can be reused on the next run. Writes are batched into transactions of `commit_interval` updates. One index
+can be shared by several threads, e.g. the per-device organizers of a drive scan.
+
+Args:
+    path (str, optional): The path to the SQLite database. Defaults to `config.INDEX_PATH`.
+    commit_interval (int, optional): The number of writes grouped into one transaction. Defaults to `config.INDEX_COMMIT_INTERVAL`.
+"""
+class FileIndex:
+    COLUMNS = ('path', 'hash_algorithm', 'partial_hash', 'full_hash', 'content_digest', 'useless', 'decision', 'similarity_hash')
+
+    def __init__(self, path=None, commit_interval=None):
+        self.path = path or config.INDEX_PATH
+        self.commit_interval = commit_interval or config.INDEX_COMMIT_INTERVAL
+        self.pending_writes = 0
+
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT,
+                hash_algorithm TEXT,
+                partial_hash TEXT,
+                full_hash TEXT,
+                content_digest TEXT,
+                useless INTEGER,
+                decision TEXT,
+                updated_at REAL,
+                similarity_hash TEXT,
+                PRIMARY KEY (device, inode)
+            )
+        """)
+        # Indexes made before near-duplicate detection lack its column
+        columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(files)")}
+        if 'similarity_hash' not in columns:
+            self.connection.execute("ALTER TABLE files ADD COLUMN similarity_hash TEXT")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def lookup(self, stat_result):
+        # Returns the record for an unchanged file as a dict, or None if the file is new or was modified
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM files WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+                (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def update(self, stat_result, file_path, **fields):
+        unknown = set(fields) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown index fields: {', '.join(sorted(unknown))}")
+        fields['path'] = file_path
+        if 'useless' in fields and fields['useless'] is not None:
+            fields['useless'] = int(fields['useless'])
+
+        with self.lock:
+            if self.lookup(stat_result):
+                assignments = ', '.join(f"{name} = ?" for name in fields)
+                self.connection.execute(
+                    f"UPDATE files SET {assignments}, updated_at = ? WHERE device = ? AND inode = ?",
+                    (*fields.values(), time.time(), stat_result.st_dev, stat_result.st_ino)
+                )
+            else:
+                # New or modified file, anything cached under the old size/mtime is stale
+                names = ', '.join(fields)
+                placeholders = ', '.join('?' for _ in fields)
+                self.connection.execute(
+                    f"INSERT OR REPLACE INTO files (device, inode, size, mtime_ns, {names}, updated_at) "
+                    f"VALUES (?, ?, ?, ?, {placeholders}, ?)",
+                    (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns,
+                     *fields.values(), time.time())
+                )
+            self.wrote()
+
+    def forget(self, stat_result):
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM files WHERE device = ? AND inode = ?",
+                (stat_result.st_dev, stat_result.st_ino)
+            )
+            self.wrote()
+
+    def wrote(self):
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        with self.lock:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.connection.close()
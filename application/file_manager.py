@@ -1,12 +1,15 @@
-from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QLabel, QWidget, QApplication, QShortcut, QFileDialog, QMessageBox
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QLabel, QWidget, QApplication, QShortcut, QFileDialog, QMessageBox, QPushButton
+from PyQt5.QtCore import Qt, QTimer, QThreadPool, QEvent
 from PyQt5.QtGui import QPainter, QColor, QPen, QPixmap, QPainterPath, QKeySequence
 from bordered_widget import BorderedWidget
 from main_menu import MainMenu
 from metric_menu import MetricMenu
 from theme import Theme
 from theme_buttons import ThemeButtons
-import backend_main
+from drive_dialog import DriveDialog
+from search_dialog import SearchDialog
+from organize_worker import OrganizeWorker
+import threading
 class WALLEFileManager(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -17,6 +20,10 @@ class WALLEFileManager(QMainWindow):
         self.central_widget = BorderedWidget(self)
         self.setCentralWidget(self.central_widget)
 
+        # Organizing runs off the GUI thread, one run at a time
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+
         self.setup_ui()
         self.setup_shortcuts()
 
@@ -34,6 +41,17 @@ class WALLEFileManager(QMainWindow):
         self.main_menu = MainMenu(self)
         self.main_menu.item_clicked.connect(self.handle_menu_click)
         self.central_widget.content_layout.addWidget(self.main_menu)
+
+        # Progress of a running organization, hidden while idle
+        self.progress_label = QLabel("")
+        self.progress_label.setAlignment(Qt.AlignCenter)
+        self.progress_label.setWordWrap(True)
+        self.progress_label.hide()
+        self.central_widget.content_layout.addWidget(self.progress_label)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_organizing)
+        self.cancel_button.hide()
+        self.central_widget.content_layout.addWidget(self.cancel_button)
         
         # Add some spacing
         self.central_widget.content_layout.addSpacing(20)
@@ -44,7 +62,7 @@ class WALLEFileManager(QMainWindow):
         self.central_widget.content_layout.addWidget(self.title_label)
         
         # Metric Menu
-        self.metric_menu = MetricMenu(self)
+        self.metric_menu = MetricMenu(self, pipeline_metrics=lambda progress: self.backend().get_pipeline_metrics(progress))
         self.central_widget.content_layout.addWidget(self.metric_menu)
 
         self.central_widget.content_layout.addStretch(1)
@@ -75,20 +93,95 @@ class WALLEFileManager(QMainWindow):
 
 
     
+    def backend(self):
+        # Imported on first use, so the model client, OCR and PDF libraries don't delay the window
+        import backend_main
+        return backend_main
+
+    def preload_backend(self):
+        # Imports the backend in the background once the window is up, so the first click doesn't wait for it
+        threading.Thread(target=self.backend, name="walle-preload", daemon=True).start()
+
     def handle_menu_click(self, item_text):
         if item_text == "Organize Directory":
             self.organize_directory()
+        elif item_text == "Organize Drive":
+            self.organize_drive()
+        elif item_text == "Find Files":
+            self.find_files()
         elif item_text == "Quit":
             self.quit_application()
         else:
             print(f"Clicked: {item_text}")  # Placeholder for other menu items
 
     def organize_directory(self):
+        if self.worker:
+            self.show_popup("Already organizing")
+            return
         directory = QFileDialog.getExistingDirectory(self, "Select Directory to Organize")
         if directory:
             # Call the organize_directory function from main.py
-            backend_main.organize_directory(directory, {})  # Empty dict for default categorization
-            self.show_popup("Directory Organized")
+            self.start_organizing(lambda result: "Directory Organized",
+                                  self.backend().organize_directory, directory, {})  # Empty dict for default categorization
+
+    def organize_drive(self):
+        if self.worker:
+            self.show_popup("Already organizing")
+            return
+        dialog = DriveDialog(self)
+        if not dialog.exec_():
+            return
+        roots = dialog.selected_roots()
+        if not roots:
+            return
+        answer = QMessageBox.question(self, "Organize Drive",
+                                      f"Organize {len(roots)} location(s)? Files may be deleted, moved and renamed.")
+        if answer == QMessageBox.Yes:
+            self.start_organizing(lambda devices: "\n".join(["Drive Organized"] + [progress.report() for progress in devices]),
+                                  self.backend().organize_drive, roots, {})  # Empty dict for default categorization
+
+    def start_organizing(self, message, task, *args):
+        self.worker = OrganizeWorker(task, *args)
+        self.worker.signals.progress.connect(self.show_progress)
+        self.worker.signals.finished.connect(lambda result: self.finish_organizing(message(result)))
+        self.worker.signals.cancelled.connect(lambda: self.finish_organizing("Organizing Cancelled"))
+        self.worker.signals.failed.connect(lambda error: self.finish_organizing(f"Organizing Failed: {error}"))
+        self.metric_menu.set_progress(self.worker.progress)
+        self.fit_contents()
+        self.progress_label.setText("Starting...")
+        self.progress_label.show()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.thread_pool.start(self.worker)
+
+    def fit_contents(self):
+        # Grows the window while the organizer's metrics are shown and shrinks it back afterwards
+        self.central_widget.content_layout.activate()
+        self.resize(self.width(), self.sizeHint().height())
+
+    def show_progress(self, progress):
+        self.progress_label.setText(f"{progress['files']} files scanned, "
+                                    f"{progress['bytes_hashed'] / (1024 * 1024):.1f} MB hashed, "
+                                    f"{progress['actions']} actions")
+
+    def cancel_organizing(self):
+        if self.worker:
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.progress_label.setText("Cancelling...")
+
+    def finish_organizing(self, message):
+        self.worker = None
+        self.metric_menu.set_progress(None)
+        # Once the hidden rows have left the layout
+        QTimer.singleShot(0, self.fit_contents)
+        self.progress_label.hide()
+        self.cancel_button.hide()
+        self.show_popup(message)
+
+    def find_files(self):
+        dialog = SearchDialog(lambda query: self.backend().find_files(query), self)
+        dialog.exec_()
 
     def show_popup(self, message):
         popup = QMessageBox(self)
@@ -101,6 +194,11 @@ class WALLEFileManager(QMainWindow):
         QTimer.singleShot(3000, popup.close)
 
     def quit_application(self):
+        # Let a running organization stop after its current file rather than in the middle of a move
+        if self.worker:
+            self.worker.cancel()
+            self.thread_pool.waitForDone()
+        self.metric_menu.sampler.stop()
         QApplication.quit()
     
     def change_theme(self, theme):
@@ -113,11 +211,10 @@ class WALLEFileManager(QMainWindow):
         self.apply_theme()
 
     def apply_theme(self):
+        # Set on the window only; every child inherits it, so the tree is polished once
         stylesheet = Theme.get_stylesheet()
-        self.setStyleSheet(stylesheet)
-        self.central_widget.setStyleSheet(stylesheet)
-        self.main_menu.setStyleSheet(stylesheet)
-        self.metric_menu.setStyleSheet(stylesheet)
+        if self.styleSheet() != stylesheet:
+            self.setStyleSheet(stylesheet)
         
         if Theme.get_current_theme() == Theme.CYBERPUNK:
             self.setAttribute(Qt.WA_TranslucentBackground, True)
@@ -127,6 +224,20 @@ class WALLEFileManager(QMainWindow):
         self.central_widget.update_theme()
         self.update()
 
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.metric_menu.set_active(not self.isMinimized())
+        super().changeEvent(event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.metric_menu.set_active(not self.isMinimized())
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # Metrics are only sampled slowly while nobody can see them
+        self.metric_menu.set_active(False)
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.dragPosition = event.globalPos() - self.frameGeometry().topLeft()
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import config
+
+"""
+Persistent, content-addressed cache of model responses.
+
+Entries are keyed by a hash of the model name, the prompt version and the full request (system prompt and file
+content), so identical content sent with an identical prompt is answered from disk on every later run and for
+every duplicate path. Editing a prompt in backend_main.py changes the key, so stale answers are never returned;
+bumping `config.LLM_PROMPT_VERSION` drops every cached answer at once. The cache keeps at most `max_entries`
+entries, evicting the least recently used, and entries older than `ttl` seconds are ignored and removed.
+
+Args:
+    path (str, optional): The path to the SQLite database. Defaults to `config.LLM_CACHE_PATH`.
+    max_entries (int, optional): The maximum number of cached responses. Defaults to `config.LLM_CACHE_MAX_ENTRIES`.
+    ttl (float, optional): The maximum age of an entry in seconds. Defaults to `config.LLM_CACHE_TTL`.
+    prompt_version (int, optional): The current prompt version. Defaults to `config.LLM_PROMPT_VERSION`.
+"""
+class ResponseCache:
+    EVICT_INTERVAL = 100  # Puts between eviction passes, so the bound is approximate but cheap to keep
+
+    def __init__(self, path=None, max_entries=None, ttl=None, prompt_version=None):
+        self.path = path or config.LLM_CACHE_PATH
+        self.max_entries = max_entries or config.LLM_CACHE_MAX_ENTRIES
+        self.ttl = ttl or config.LLM_CACHE_TTL
+        self.prompt_version = config.LLM_PROMPT_VERSION if prompt_version is None else prompt_version
+
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.puts_since_eviction = 0
+        self.connection = None
+        # Used from the LLM client's event loop thread as well as from callers' threads
+        self.lock = threading.Lock()
+
+    def connect(self):
+        # Opened on first use, so importing the backend doesn't touch the disk
+        if self.connection:
+            return self.connection
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version INTEGER NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        # Answers to older prompt versions can never be hit again
+        self.connection.execute("DELETE FROM responses WHERE prompt_version != ?", (self.prompt_version,))
+        self.connection.commit()
+        return self.connection
+
+    def make_key(self, model, messages, options=None):
+        payload = json.dumps([model, self.prompt_version, messages, options or {}], sort_keys=True)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=32).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and now - row[1] <= self.ttl:
+                connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                connection.commit()
+                self.stats['hits'] += 1
+                return row[0]
+
+            if row:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                self.stats['evictions'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, model, response):
+        with self.lock:
+            connection = self.connect()
+            now = time.time()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, prompt_version, response, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, self.prompt_version, response, now, now)
+            )
+            self.puts_since_eviction += 1
+            if self.puts_since_eviction >= self.EVICT_INTERVAL:
+                self.evict(connection, now)
+            connection.commit()
+
+    def evict(self, connection, now):
+        expired = connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+        self.stats['evictions'] += expired + overflow
+        self.puts_since_eviction = 0
+
+    def clear(self):
+        with self.lock:
+            connection = self.connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+
+    def close(self):
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
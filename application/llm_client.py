@@ -0,0 +1,184 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import openai
+from openai import AsyncOpenAI
+import config
+
+"""
+Token bucket limiting how many tokens are sent to the model per minute.
+
+The bucket starts full and refills continuously. A request reserves its estimated token count before it is sent
+and the estimate is corrected once the real usage is known, so the balance may briefly go negative.
+
+Args:
+    tokens_per_minute (int): The token budget per minute. A falsy value disables the limit.
+"""
+class TokenBucket:
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount):
+        if not self.capacity:
+            return
+        # A single oversized request must still be able to go through eventually
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self.refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+
+    def adjust(self, amount):
+        if not self.capacity:
+            return
+        self.refill()
+        self.tokens -= amount
+
+"""
+Asyncio-based chat completion client shared by the whole backend.
+
+Requests run on one event loop in a background thread. At most `max_concurrency` requests are in flight at once
+and the estimated token usage is kept within `tokens_per_minute`. Rate limit (429), server (5xx) and connection
+errors are retried with jittered exponential backoff, honouring the server's Retry-After header when present.
+
+Synchronous callers (the organizer and its worker threads) use `chat` and `chat_many`; async code can await
+`complete` directly on the client's loop. Pointing `base_url` at `llm_stub_server.py` runs everything offline.
+With a `ResponseCache`, requests already answered on an earlier run are served from disk without a network call;
+the cache is read and written on the loop's default executor, so its disk I/O doesn't stall requests in flight.
+The latencies of recent successful requests and the number of requests waiting or in flight are kept for the
+Live Metrics panel.
+
+Args:
+    api_key (str, optional): The OpenAI API key. Defaults to the `OPENAI_API_KEY` environment variable.
+    base_url (str, optional): The API base URL. Defaults to the `OPENAI_BASE_URL` environment variable, or OpenAI's.
+    max_concurrency (int, optional): The maximum number of requests in flight. Defaults to `config.LLM_MAX_CONCURRENCY`.
+    tokens_per_minute (int, optional): The token budget per minute. Defaults to `config.LLM_TOKENS_PER_MINUTE`.
+    max_retries (int, optional): The number of retries per request. Defaults to `config.LLM_MAX_RETRIES`.
+    cache (ResponseCache, optional): A persistent cache of earlier responses.
+"""
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, max_concurrency=None, tokens_per_minute=None, max_retries=None, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.tokens_per_minute = config.LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.cache = cache
+
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'tokens': 0}
+        self.latencies = deque(maxlen=1000)  # seconds per successful request, including retries
+        self.queued = 0  # requests waiting for a slot or in flight
+        self.loop = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        # The loop, client, semaphore and bucket are created lazily on first use, inside the loop thread
+        with self.start_lock:
+            if self.loop:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                # Retries are handled here, so the SDK's own retry loop is disabled
+                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+                self.semaphore = asyncio.Semaphore(self.max_concurrency)
+                self.bucket = TokenBucket(self.tokens_per_minute)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="walle-llm", daemon=True).start()
+            ready.wait()
+            self.loop = loop
+
+    async def complete(self, messages, model=None, **kwargs):
+        model = model or config.LLM_MODEL
+        loop = asyncio.get_running_loop()
+        if self.cache:
+            key = self.cache.make_key(model, messages, kwargs)
+            # The cache reads and commits to SQLite, which mustn't hold up the other requests on the loop
+            cached = await loop.run_in_executor(None, self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        estimate = sum(len(message['content']) for message in messages) // 4 + config.LLM_OUTPUT_TOKEN_ESTIMATE
+
+        self.queued += 1
+        try:
+            async with self.semaphore:
+                started = time.monotonic()
+                for attempt in range(self.max_retries + 1):
+                    await self.bucket.acquire(estimate)
+                    self.stats['requests'] += 1
+                    try:
+                        response = await self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+                    except Exception as e:
+                        self.bucket.adjust(-estimate)
+                        if attempt == self.max_retries or not self.is_retryable(e):
+                            self.stats['failures'] += 1
+                            raise
+                        self.stats['retries'] += 1
+                        await asyncio.sleep(self.get_backoff(attempt, e))
+                        continue
+
+                    if response.usage:
+                        self.bucket.adjust(response.usage.total_tokens - estimate)
+                        self.stats['tokens'] += response.usage.total_tokens
+                    content = response.choices[0].message.content
+                    self.latencies.append(time.monotonic() - started)
+                    if self.cache and content is not None:
+                        await loop.run_in_executor(None, self.cache.put, key, model, content)
+                    return content
+        finally:
+            self.queued -= 1
+
+    def is_retryable(self, error):
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    def get_backoff(self, attempt, error):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter keeps many concurrent retries from hitting the server in lockstep
+        return random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def submit(self, coroutine):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def chat(self, messages, model=None, **kwargs):
+        # Blocking call, safe to use from any thread
+        return self.submit(self.complete(messages, model, **kwargs)).result()
+
+    def chat_many(self, message_lists, model=None, **kwargs):
+        # Sends all requests at once, results (or exceptions) come back in the same order
+        futures = [self.submit(self.complete(messages, model, **kwargs)) for messages in message_lists]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
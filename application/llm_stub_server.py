@@ -0,0 +1,125 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+Local OpenAI-compatible stub server for running the backend offline.
+
+Serves POST /v1/chat/completions with canned replies chosen from the system prompt, optionally adding latency
+and injecting 429/500 errors so retry and concurrency behaviour can be exercised. The server counts the requests
+it receives and the most it has handled at once, for tests. Point the backend at it with:
+
+    python llm_stub_server.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python backend_main.py
+"""
+
+# First matching keyword in the system prompt picks the reply
+CANNED_REPLIES = [
+    ("json object", json.dumps({"useless": False, "category": "Stub", "suggested_name": "stub_file", "summary": "Stub summary."})),
+    ("useless", "NO"),
+    ("filename", "stub_file"),
+    ("code reviewer", "Stub review."),
+    ("categorization scheme", "{}"),
+]
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    errors = []  # Statuses returned, in order, to the first requests
+    stats = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+            scripted = self.errors.pop(0) if self.errors else None
+        try:
+            self.reply(body, scripted)
+        finally:
+            with self.lock:
+                self.stats['in_flight'] -= 1
+
+    def reply(self, body, scripted):
+        time.sleep(self.latency)
+
+        if scripted:
+            # No Retry-After, so the client's own backoff is used
+            self.send_json(scripted, {"error": {"message": "Scripted error", "type": "server_error"}})
+            return
+
+        if random.random() < self.error_rate:
+            status = random.choice([429, 500])
+            self.send_json(status, {"error": {"message": "Injected error", "type": "server_error"}}, {"Retry-After": "0"})
+            return
+
+        messages = body.get('messages', [])
+        system_prompt = next((m['content'] for m in messages if m.get('role') == 'system'), '').lower()
+        reply = next((text for keyword, text in CANNED_REPLIES if keyword in system_prompt), "OK")
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 4
+
+        self.send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'stub'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 1, "total_tokens": prompt_tokens + 1},
+        })
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+"""
+Starts the stub server.
+
+Args:
+    host (str, optional): The interface to listen on. Defaults to 127.0.0.1.
+    port (int, optional): The port to listen on. 0 picks a free port. Defaults to 8765.
+    latency (float, optional): Seconds added to every reply. Defaults to 0.
+    error_rate (float, optional): Fraction of requests answered with a 429 or 500. Defaults to 0.
+    errors (list, optional): HTTP statuses returned, in order, to the first requests.
+
+Returns:
+    ThreadingHTTPServer: The server, not yet serving. Call `serve_forever` on it (e.g. in a thread).
+        Its `stats` hold the number of requests received and the most handled at once.
+"""
+def create_stub_server(host="127.0.0.1", port=8765, latency=0.0, error_rate=0.0, errors=None):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency, "error_rate": error_rate, "errors": list(errors or []),
+        "stats": {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}, "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.stats = handler.stats
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = create_stub_server(args.host, args.port, args.latency, args.error_rate)
+    print(f"Stub server listening on http://{args.host}:{server.server_address[1]}/v1")
+    server.serve_forever()
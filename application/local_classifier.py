@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import random
+import sqlite3
+import hashlib
+import threading
+from array import array
+import config
+
+WORD_PATTERN = re.compile(r"\w+")
+
+"""
+Turns text into hashed word unigram and bigram features.
+
+Each n-gram is hashed with CRC-32 (stable across runs, unlike `hash`) into one of `dimensions` buckets, so the
+feature space has a fixed size however much vocabulary the training data brings. Features are binary and
+scaled to unit length.
+
+Args:
+    text (str): The text to featurize.
+    dimensions (int): The number of hash buckets.
+
+Returns:
+    tuple: The bucket indices and the value of each feature.
+"""
+def extract_features(text, dimensions):
+    words = WORD_PATTERN.findall(text.lower())
+    grams = set(words)
+    grams.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    buckets = sorted({zlib.crc32(gram.encode('utf-8')) % dimensions for gram in grams})
+    return buckets, 1.0 / math.sqrt(len(buckets)) if buckets else 0.0
+
+"""
+Logistic function, guarded against overflow.
+"""
+def sigmoid(score):
+    if score < -30:
+        return 0.0
+    if score > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-score))
+
+"""
+Class probabilities of a softmax regression over hashed features.
+
+Args:
+    weights (array): The weights, one row of one weight per class for each hash bucket.
+    biases (list): The bias of each class.
+    buckets (list): The example's bucket indices.
+    value (float): The value of each of the example's features.
+
+Returns:
+    list: The probability of each class.
+"""
+def category_probabilities(weights, biases, buckets, value):
+    classes = len(biases)
+    scores = list(biases)
+    for bucket in buckets:
+        row = bucket * classes
+        for index in range(classes):
+            scores[index] += value * weights[row + index]
+    highest = max(scores)
+    exponentials = [math.exp(score - highest) for score in scores]
+    total = sum(exponentials)
+    return [exponential / total for exponential in exponentials]
+
+"""
+Local, offline tier that answers the usefulness and category questions before the language model.
+
+Two linear models over hashed n-gram features are trained from the model's own past verdicts: a logistic
+regression for usefulness and a softmax regression over the most frequent categories. Every verdict the
+language model gives is recorded as a training example. Once enough new examples have come in, the models are
+retrained on a background thread at the start of a run; the run goes on with the previous models, and the new
+ones are swapped in when training finishes. Both models and examples live in an SQLite database, so the tier
+works without any network access.
+
+A file is decided locally only when the usefulness model is at least `threshold` confident; everything else
+escalates to the language model. The category is only given when its model is as confident too. In offline
+mode (`config.OFFLINE`) there is nothing to escalate to, so a file the model isn't confident about is kept
+where it is: never deleted on a weak guess, and not moved into a guessed category. Counts of local, escalated
+and kept decisions are kept in `stats`, as well as how many locally decided files still went to the language
+model for just their name or summary.
+
+Args:
+    path (str, optional): The path to the SQLite database. Defaults to `config.LOCAL_CLASSIFIER_PATH`.
+    dimensions (int, optional): The number of feature hash buckets. Defaults to `config.LOCAL_CLASSIFIER_DIMENSIONS`.
+    threshold (float, optional): The confidence needed to decide locally. Defaults to `config.LOCAL_CLASSIFIER_CONFIDENCE`.
+"""
+class LocalClassifier:
+    def __init__(self, path=None, dimensions=None, threshold=None):
+        self.path = path or config.LOCAL_CLASSIFIER_PATH
+        self.dimensions = dimensions or config.LOCAL_CLASSIFIER_DIMENSIONS
+        self.threshold = threshold or config.LOCAL_CLASSIFIER_CONFIDENCE
+
+        self.usefulness = None  # (weights, bias) once trained
+        self.categories = []  # category names, one row of `category_weights` each
+        self.category_weights = None
+        self.category_biases = []
+        self.trained_examples = 0
+        self.training = None  # thread retraining the models, if any
+        self.stats = {'local': 0, 'escalated': 0, 'kept': 0, 'named': 0, 'recorded': 0}
+        self.connection = None
+        # Files are classified and verdicts recorded from I/O worker threads
+        self.lock = threading.RLock()
+
+    def connect(self):
+        # Opened on first use, so importing the backend doesn't touch the disk
+        if self.connection:
+            return self.connection
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS examples (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                useless INTEGER NOT NULL,
+                category TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS models (
+                name TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                weights BLOB NOT NULL
+            )
+        """)
+        self.connection.commit()
+        return self.connection
+
+    def record(self, text, useless, category=None):
+        # Stores a language model verdict as a training example
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO examples (key, text, useless, category, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, text, int(bool(useless)), category, time.time())
+            )
+            connection.commit()
+            self.stats['recorded'] += 1
+
+    def prepare(self):
+        # Loads the saved models, and starts retraining them if enough new examples came in since
+        with self.lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+            if self.training and self.training.is_alive():
+                return
+            connection = self.connect()
+            self.load()
+            count = connection.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+            if count >= config.LOCAL_CLASSIFIER_MIN_EXAMPLES and count - self.trained_examples >= config.LOCAL_CLASSIFIER_RETRAIN_INTERVAL:
+                # Training takes long in pure Python, so the run starts with the previous models meanwhile
+                self.training = threading.Thread(target=self.train, name="walle-train", daemon=True)
+                self.training.start()
+
+    def load(self):
+        rows = {name: (json.loads(metadata), weights) for name, metadata, weights in
+                self.connect().execute("SELECT name, metadata, weights FROM models")}
+        if 'usefulness' not in rows or rows['usefulness'][0]['dimensions'] != self.dimensions:
+            return
+        metadata, weights = rows['usefulness']
+        self.usefulness = (array('f', weights), metadata['bias'])
+        self.trained_examples = metadata['examples']
+        if 'category' in rows:
+            metadata, weights = rows['category']
+            self.categories = metadata['categories']
+            self.category_biases = metadata['biases']
+            self.category_weights = array('f', weights)
+
+    def train(self):
+        try:
+            self.fit()
+        except Exception as e:
+            print(f"Error training local classifier: {str(e)}")
+
+    def fit(self):
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT text, useless, category FROM examples ORDER BY created_at DESC LIMIT ?",
+                (config.LOCAL_CLASSIFIER_MAX_EXAMPLES,)
+            ).fetchall()
+            count = self.connection.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+        examples = [(extract_features(text, self.dimensions), useless, category) for text, useless, category in rows]
+        # A fixed seed keeps retraining on the same examples reproducible
+        shuffler = random.Random(0)
+
+        # Usefulness: logistic regression
+        weights = array('f', bytes(4 * self.dimensions))
+        bias = 0.0
+        for epoch in range(config.LOCAL_CLASSIFIER_EPOCHS):
+            shuffler.shuffle(examples)
+            rate = config.LOCAL_CLASSIFIER_LEARNING_RATE / (1 + epoch)
+            for (buckets, value), useless, _ in examples:
+                error = useless - sigmoid(bias + value * sum(weights[bucket] for bucket in buckets))
+                for bucket in buckets:
+                    weights[bucket] += rate * error * value
+                bias += rate * error
+
+        # Category: softmax regression over the categories with enough examples
+        counts = {}
+        for _, _, category in examples:
+            if category:
+                counts[category] = counts.get(category, 0) + 1
+        frequent = sorted(counts, key=counts.get, reverse=True)[:config.LOCAL_CLASSIFIER_MAX_CATEGORIES]
+        categories = [category for category in frequent if counts[category] >= config.LOCAL_CLASSIFIER_MIN_CATEGORY_EXAMPLES]
+        classes = len(categories)
+        category_weights = array('f', bytes(4 * self.dimensions * classes))
+        category_biases = [0.0] * classes
+        labeled = [(features, categories.index(category)) for features, _, category in examples if category in categories]
+        for epoch in range(config.LOCAL_CLASSIFIER_EPOCHS if classes > 1 else 0):
+            shuffler.shuffle(labeled)
+            rate = config.LOCAL_CLASSIFIER_LEARNING_RATE / (1 + epoch)
+            for (buckets, value), label in labeled:
+                probabilities = category_probabilities(category_weights, category_biases, buckets, value)
+                for index in range(classes):
+                    error = (index == label) - probabilities[index]
+                    if abs(error) < 1e-4:
+                        continue
+                    step = rate * error * value
+                    for bucket in buckets:
+                        category_weights[bucket * classes + index] += step
+                    category_biases[index] += rate * error
+
+        # The new models replace the old ones in one step, between two classifications
+        with self.lock:
+            self.usefulness = (weights, bias)
+            self.categories = categories
+            self.category_weights = category_weights
+            self.category_biases = category_biases
+            self.trained_examples = count
+            self.save()
+        print(f"Trained local classifier on {len(examples)} examples ({classes} categories)")
+
+    def save(self):
+        connection = self.connect()
+        weights, bias = self.usefulness
+        connection.execute(
+            "INSERT OR REPLACE INTO models (name, metadata, weights) VALUES (?, ?, ?)",
+            ('usefulness', json.dumps({'dimensions': self.dimensions, 'bias': bias, 'examples': self.trained_examples}), weights.tobytes())
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO models (name, metadata, weights) VALUES (?, ?, ?)",
+            ('category', json.dumps({'categories': self.categories, 'biases': self.category_biases}), self.category_weights.tobytes())
+        )
+        connection.commit()
+
+    def predict(self, text):
+        # Returns the usefulness verdict and category with their confidence, or None before any training
+        with self.lock:
+            usefulness, categories = self.usefulness, self.categories
+            category_weights, category_biases = self.category_weights, self.category_biases
+        if usefulness is None:
+            return None
+        buckets, value = extract_features(text, self.dimensions)
+        weights, bias = usefulness
+        probability = sigmoid(bias + value * sum(weights[bucket] for bucket in buckets))
+        prediction = {'useless': probability >= 0.5, 'useless_confidence': max(probability, 1 - probability),
+                      'category': None, 'category_confidence': 0.0}
+        if len(categories) > 1:
+            probabilities = category_probabilities(category_weights, category_biases, buckets, value)
+            best = max(range(len(probabilities)), key=probabilities.__getitem__)
+            prediction['category'] = categories[best]
+            prediction['category_confidence'] = probabilities[best]
+        return prediction
+
+    def classify(self, text):
+        # Returns a local analysis if the file can be decided here, or None if it has to go to the language model
+        prediction = self.predict(text) if text else None
+        if prediction is None or prediction['useless_confidence'] < self.threshold:
+            if config.OFFLINE:
+                # Nothing to escalate to: a weak guess must not delete or move the file
+                with self.lock:
+                    self.stats['kept'] += 1
+                return {'useless': False, 'category': None, 'suggested_name': None, 'summary': None, 'tier': 'local'}
+            with self.lock:
+                self.stats['escalated'] += 1
+            return None
+
+        with self.lock:
+            self.stats['local'] += 1
+        confident_category = prediction['category_confidence'] >= self.threshold
+        return {
+            'useless': prediction['useless'],
+            'category': prediction['category'] if confident_category else None,
+            'suggested_name': None,
+            'summary': None,
+            'tier': 'local',
+        }
+
+    def named(self):
+        # A locally decided file still needs a (smaller) model call for its name or summary
+        with self.lock:
+            self.stats['named'] += 1
+
+    def report(self):
+        if config.OFFLINE:
+            return f"local {self.stats['local']}, kept as unsure {self.stats['kept']}"
+        return (f"local {self.stats['local']} ({self.stats['named']} of them still named by the language model), "
+                f"language model {self.stats['escalated']}")
+
+    def close(self):
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
@@ -1,5 +1,6 @@
 import sys
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 from file_manager import WALLEFileManager
 from theme import Theme
 
@@ -11,6 +12,8 @@ def main():
     
     walle_manager = WALLEFileManager()
     walle_manager.show()
+    # After the first paint
+    QTimer.singleShot(0, walle_manager.preload_backend)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
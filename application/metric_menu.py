@@ -1,11 +1,38 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont
-import psutil
+from PyQt5.QtCore import Qt, QTimer, QPointF
+from PyQt5.QtGui import QFont, QPainter, QPen, QColor, QPolygonF
+from metrics_sampler import MetricsSampler
+from theme import Theme
 import time
 
+class Sparkline(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(60, 16)
+        self.values = []
+        self.maximum = None
+
+    def set_values(self, values, maximum=None):
+        self.values = values
+        self.maximum = maximum
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        # Fixed scale for percentages, otherwise scaled to the largest value shown
+        top = self.maximum or max(max(self.values), 1e-9)
+        step = (self.width() - 1) / (len(self.values) - 1)
+        height = self.height() - 2
+        line = QPolygonF([QPointF(i * step, 1 + height - min(value / top, 1.0) * height) for i, value in enumerate(self.values)])
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor(Theme.COLORS[Theme.get_current_theme()]['accent']), 1))
+        painter.drawPolyline(line)
+
 class MenuItem(QWidget):
-    def __init__(self, icon, text, shortcut, font_family, parent=None):
+    def __init__(self, icon, text, shortcut, font_family, parent=None, sparkline=False):
         super().__init__(parent)
         layout = QHBoxLayout(self)
         layout.setContentsMargins(0, 2, 0, 2)
@@ -25,13 +52,17 @@ class MenuItem(QWidget):
         layout.addWidget(icon_label)
         layout.addWidget(self.text_label)
         layout.addStretch()
+        self.sparkline = None
+        if sparkline:
+            self.sparkline = Sparkline(self)
+            layout.addWidget(self.sparkline)
         layout.addWidget(self.shortcut_label)
 
     def update_shortcut(self, new_shortcut):
         self.shortcut_label.setText(new_shortcut)
 
 class MetricMenu(QWidget):
-    def __init__(self, parent=None, font_family="Arial"):
+    def __init__(self, parent=None, font_family="Arial", pipeline_metrics=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.layout.setSpacing(5)
@@ -40,43 +71,126 @@ class MetricMenu(QWidget):
         
         # Store references to menu items for updating
         self.menu_items = {}
+
+        # Organizer metrics: a function returning them for the running scan's progress, if any
+        self.pipeline_metrics = pipeline_metrics
+        self.progress = None
+        self.last_counts = None  # (time, files, bytes hashed) of the previous update, for rates
+
+        # System metrics are sampled on a background thread; the timer only shows the latest samples
+        self.sampler = MetricsSampler()
         
         self.create_menu_items()
         self.start_update_timer()
 
     def create_menu_items(self):
         # Initial placeholders for the menu items
+        self.pipeline_items = []
         menu_options = [
             ("    🖥️", "CPU Usage", "0.0%    "),
             ("    💽", "Disk Usage", "0.0%    "),
+            ("    💾", "Disk I/O", "0.00 MB/s    "),
             ("    🗃️", "Memory Usage", "0.0%    "),
-            ("    📤", "Bytes Sent", "0.00 MB    "),
-            ("    📨", "Bytes Received", "0.00 MB    ")
+            ("    📤", "Bytes Sent", "0.00 MB/s    "),
+            ("    📨", "Bytes Received", "0.00 MB/s    ")
         ]
+        sparklines = ("CPU Usage", "Disk I/O", "Memory Usage", "Bytes Sent", "Bytes Received")
+        if self.pipeline_metrics:
+            menu_options += [
+                ("    📂", "Files Scanned", "-    "),
+                ("    🔑", "Hashed", "-    "),
+                ("    👁️", "OCR p50/p99", "-    "),
+                ("    🤖", "LLM p50/p99", "-    "),
+                ("    📥", "Queues", "-    "),
+                ("    🎯", "Cache Hits", "-    ")
+            ]
         
         for icon, text, shortcut in menu_options:
-            item = MenuItem(icon, text, shortcut, self.font_family, self)
+            item = MenuItem(icon, text, shortcut, self.font_family, self, sparkline=text in sparklines)
             self.layout.addWidget(item)
             self.menu_items[text] = item  # Store reference for updating later
 
+        # Organizer metrics are only shown while a run is going
+        if self.pipeline_metrics:
+            self.pipeline_items = [self.menu_items[text] for _, text, _ in menu_options[-6:]]
+            for item in self.pipeline_items:
+                item.hide()
+
     def start_update_timer(self):
         # Create a QTimer to update the metrics every second
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_metrics)
         self.timer.start(1000)  # 1000 milliseconds = 1 second
+        self.sampler.start()
+
+    def set_active(self, active):
+        # Nothing is shown while the window is hidden or minimized, so sample slowly and skip updates
+        self.sampler.set_active(active)
+        if active:
+            self.timer.start(1000)
+            self.update_metrics()
+        else:
+            self.timer.stop()
 
     def update_metrics(self):
-        # Gather updated system metrics
-        cpu_usage = psutil.cpu_percent(interval=0)  # interval=0 for non-blocking
-        disk_usage = psutil.disk_usage('/').percent
-        memory_usage = psutil.virtual_memory().percent
-        net_io = psutil.net_io_counters()
-        bytes_sent = net_io.bytes_sent / (1024 ** 2)  # Convert to MB
-        bytes_received = net_io.bytes_recv / (1024 ** 2)  # Convert to MB
-
-        # Update the corresponding menu items with new values
-        self.menu_items["CPU Usage"].update_shortcut(f"{cpu_usage:.1f}%    ")
-        self.menu_items["Disk Usage"].update_shortcut(f"{disk_usage:.1f}%    ")
-        self.menu_items["Memory Usage"].update_shortcut(f"{memory_usage:.1f}%    ")
-        self.menu_items["Bytes Sent"].update_shortcut(f"{bytes_sent:.2f} MB    ")
-        self.menu_items["Bytes Received"].update_shortcut(f"{bytes_received:.2f} MB    ")
\ No newline at end of file
+        # Show the latest samples; nothing here waits on the system
+        sampler = self.sampler
+        self.show_metric("CPU Usage", sampler.latest('cpu'), "{:.1f}%", sampler.values('cpu'), 100)
+        self.show_metric("Disk Usage", sampler.latest('disk_usage'), "{:.1f}%")
+        disk_io = [read + write for read, write in zip(sampler.values('disk_read'), sampler.values('disk_write'))]
+        self.show_metric("Disk I/O", disk_io[-1] / (1024 ** 2) if disk_io else None, "{:.2f} MB/s", disk_io)
+        self.show_metric("Memory Usage", sampler.latest('memory'), "{:.1f}%", sampler.values('memory'), 100)
+        self.show_metric("Bytes Sent", self.to_mb(sampler.latest('sent')), "{:.2f} MB/s", sampler.values('sent'))
+        self.show_metric("Bytes Received", self.to_mb(sampler.latest('received')), "{:.2f} MB/s", sampler.values('received'))
+
+        if self.pipeline_metrics and self.progress:
+            self.update_pipeline_metrics()
+
+    def show_metric(self, name, value, text, history=None, maximum=None):
+        item = self.menu_items[name]
+        if value is not None:
+            item.update_shortcut(text.format(value) + "    ")
+        if item.sparkline and history is not None:
+            item.sparkline.set_values(history, maximum)
+
+    def to_mb(self, value):
+        return value / (1024 ** 2) if value is not None else None
+
+    def set_progress(self, progress):
+        # The scan whose counters are shown, or None once it has finished
+        self.progress = progress
+        self.last_counts = None
+        for item in self.pipeline_items:
+            item.setVisible(progress is not None)
+
+    def update_pipeline_metrics(self):
+        metrics = self.pipeline_metrics(self.progress)
+
+        now = time.monotonic()
+        if self.last_counts:
+            seconds = max(now - self.last_counts[0], 1e-9)
+            files_rate = (metrics['files'] - self.last_counts[1]) / seconds
+            hashed_rate = (metrics['bytes_hashed'] - self.last_counts[2]) / seconds / (1024 ** 2)
+            self.menu_items["Files Scanned"].update_shortcut(f"{files_rate:.0f}/s    ")
+            self.menu_items["Hashed"].update_shortcut(f"{hashed_rate:.1f} MB/s    ")
+        self.last_counts = (now, metrics['files'], metrics['bytes_hashed'])
+
+        # Queues of the same stage on several disks are added up
+        depths = {}
+        for name, depth in metrics['queues'].items():
+            stage = name.split()[-1]
+            depths[stage] = depths.get(stage, 0) + depth
+        self.menu_items["Queues"].update_shortcut(
+            f"A{depths.get('analyzing', 0)} P{depths.get('placing', 0)} IO{depths.get('io', 0)} "
+            f"CPU{depths.get('cpu', 0)} LLM{metrics['llm_queued']}    ")
+
+        self.menu_items["OCR p50/p99"].update_shortcut(self.format_latency(metrics['ocr_latency']))
+        self.menu_items["LLM p50/p99"].update_shortcut(self.format_latency(metrics['llm_latency']))
+        hit_rates = [f"{name} {rate * 100:.0f}%" for name, rate in metrics['cache_hit_rates'].items() if rate is not None]
+        self.menu_items["Cache Hits"].update_shortcut(f"{' '.join(hit_rates) or '-'}    ")
+
+    def format_latency(self, latency):
+        p50, p99 = latency
+        if p50 is None:
+            return "-    "
+        return f"{p50 * 1000:.0f}/{p99 * 1000:.0f} ms    "
@@ -0,0 +1,122 @@
+import time
+import threading
+from array import array
+import psutil
+import config
+
+"""
+Fixed-size history of float samples, oldest overwritten first.
+
+Samples are stored in a preallocated `array` of doubles, so recording one allocates nothing and the history's
+memory use never grows.
+
+Args:
+    capacity (int): The number of samples kept.
+"""
+class RingBuffer:
+    def __init__(self, capacity):
+        self.samples = array('d', bytes(8 * capacity))
+        self.capacity = capacity
+        self.next = 0
+        self.count = 0
+
+    def append(self, value):
+        self.samples[self.next] = value
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        return self.samples[self.next - 1] if self.count else None
+
+    def values(self):
+        # The kept samples, oldest first
+        if self.count < self.capacity:
+            return self.samples[:self.count].tolist()
+        return (self.samples[self.next:] + self.samples[:self.next]).tolist()
+
+"""
+Samples system metrics on a thread of its own, so the GUI thread only reads the results.
+
+Every `config.METRICS_INTERVAL` seconds the sampler records CPU and memory use and turns the cumulative disk and
+network byte counters into rates per second. Disk usage changes slowly and is sampled only every
+`config.METRICS_DISK_USAGE_INTERVAL` seconds. Each metric keeps its last `config.METRICS_HISTORY` samples in a
+`RingBuffer`. While nothing is shown (`set_active(False)`, e.g. when the window is hidden or minimized) the
+sampler slows down to one sample every `config.METRICS_HIDDEN_INTERVAL` seconds.
+
+Metrics: cpu (%), memory (%), disk_usage (% of /), disk_read and disk_write (bytes/s), sent and received (bytes/s).
+
+Args:
+    capacity (int, optional): The number of samples kept per metric. Defaults to `config.METRICS_HISTORY`.
+"""
+class MetricsSampler:
+    METRICS = ('cpu', 'memory', 'disk_usage', 'disk_read', 'disk_write', 'sent', 'received')
+
+    def __init__(self, capacity=None):
+        capacity = capacity or config.METRICS_HISTORY
+        self.history = {name: RingBuffer(capacity) for name in self.METRICS}
+        self.active = True
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = None
+        self.counters = None  # (time, disk I/O counters, network counters) of the previous sample
+        self.disk_usage_at = None
+
+    def start(self):
+        if self.thread:
+            return
+        # The first CPU reading only starts psutil's measurement interval
+        psutil.cpu_percent(interval=None)
+        self.thread = threading.Thread(target=self.run, name="walle-metrics", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling metrics: {str(e)}")
+            self.wake.wait(config.METRICS_INTERVAL if self.active else config.METRICS_HIDDEN_INTERVAL)
+            self.wake.clear()
+
+    def sample(self):
+        now = time.monotonic()
+        values = {'cpu': psutil.cpu_percent(interval=None), 'memory': psutil.virtual_memory().percent}
+        if self.disk_usage_at is None or now - self.disk_usage_at >= config.METRICS_DISK_USAGE_INTERVAL:
+            self.disk_usage_at = now
+            values['disk_usage'] = psutil.disk_usage('/').percent
+
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        if self.counters:
+            then, last_disk, last_net = self.counters
+            seconds = max(now - then, 1e-9)
+            if disk and last_disk:
+                values['disk_read'] = (disk.read_bytes - last_disk.read_bytes) / seconds
+                values['disk_write'] = (disk.write_bytes - last_disk.write_bytes) / seconds
+            if net and last_net:
+                values['sent'] = (net.bytes_sent - last_net.bytes_sent) / seconds
+                values['received'] = (net.bytes_recv - last_net.bytes_recv) / seconds
+        self.counters = (now, disk, net)
+
+        with self.lock:
+            for name, value in values.items():
+                self.history[name].append(value)
+
+    def latest(self, name):
+        with self.lock:
+            return self.history[name].latest()
+
+    def values(self, name):
+        with self.lock:
+            return self.history[name].values()
+
+    def set_active(self, active):
+        # Sampling speeds up again right away when the metrics are shown
+        if active and not self.active:
+            self.wake.set()
+        self.active = active
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
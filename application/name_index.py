@@ -0,0 +1,57 @@
+import os
+import threading
+
+"""
+In-memory index of the file names taken in each target folder.
+
+A folder's names are read once with `os.scandir`, the first time a file is placed in it, and from then on every
+name handed out is recorded, so finding a free name never touches the disk. For each base name the index keeps
+the next numeric suffix to try, so n files all suggested the same name get `name`, `name_1`, ... `name_{n-1}` in
+O(1) each instead of probing `name_1` to `name_k` with `os.path.exists` for every one of them. Names are reserved
+under a lock, so concurrent callers can never be handed the same name.
+"""
+class NameIndex:
+    def __init__(self):
+        self.folders = {}  # folder -> names taken in it
+        self.next_suffix = {}  # (folder, stem, extension) -> next numeric suffix to try
+        self.lock = threading.Lock()
+
+    def names(self, folder):
+        if folder not in self.folders:
+            try:
+                with os.scandir(folder) as entries:
+                    self.folders[folder] = {entry.name for entry in entries}
+            except FileNotFoundError:
+                self.folders[folder] = set()
+        return self.folders[folder]
+
+    def claim(self, folder, filename):
+        # Records a name without resolving conflicts; returns False if it was already taken
+        with self.lock:
+            names = self.names(folder)
+            if filename in names:
+                return False
+            names.add(filename)
+            return True
+
+    def reserve(self, folder, stem, extension):
+        # Returns the path of the first free name out of `stem`, `stem_1`, `stem_2`, ... and marks it taken
+        with self.lock:
+            names = self.names(folder)
+            filename = stem + extension
+            if filename in names:
+                key = (folder, stem, extension)
+                counter = self.next_suffix.get(key, 1)
+                while f"{stem}_{counter}{extension}" in names:
+                    counter += 1
+                self.next_suffix[key] = counter + 1
+                filename = f"{stem}_{counter}{extension}"
+            names.add(filename)
+            return os.path.join(folder, filename)
+
+    def release(self, file_path):
+        # Frees the name of a file that was deleted or moved away
+        folder, filename = os.path.split(file_path)
+        with self.lock:
+            if folder in self.folders:
+                self.folders[folder].discard(filename)
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import zlib
+import random
+import sqlite3
+import threading
+from itertools import combinations
+from array import array
+from PIL import Image
+import config
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Modulus of the MinHash permutations: a Mersenne prime larger than any 32-bit shingle hash
+MINHASH_PRIME = (1 << 61) - 1
+
+# Formats PIL opens but can't turn into pixels on its own (stubs, or needing Ghostscript or Windows)
+UNRASTERIZED_FORMATS = {'EPS', 'WMF', 'HDF5', 'BUFR', 'GRIB', 'MPEG'}
+
+IMAGE_EXTENSIONS = None  # extensions of the formats `image_hash` can read, collected on first use
+
+# Width of the image hash segments used as bucket keys; wide enough to keep buckets small
+IMAGE_SEGMENT_BITS = 16
+
+"""
+Computes a 64-bit difference hash (dHash) of an image.
+
+The image is reduced to a 9x8 grayscale thumbnail and every bit records whether a pixel is brighter than its
+right neighbour. Re-encoding, resizing and small edits barely change these gradients, so near-identical images
+get hashes that differ in only a few bits.
+
+Args:
+    file_path (str): The path to the image.
+
+Returns:
+    int: The hash, or None if the image can't be read.
+"""
+def image_hash(file_path):
+    try:
+        with Image.open(file_path) as img:
+            # Lets JPEG decode at a fraction of its size, the thumbnail needs far less
+            img.draft('L', (64, 64))
+            pixels = list(img.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    except Exception as e:
+        print(f"Error hashing image {file_path}: {str(e)}")
+        return None
+
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+"""
+Returns whether PIL can read a file's pixels, judging by its extension.
+
+Formats PIL can only write (e.g. PDF) or only identify without extra tools are left out, so those files get a
+text signature instead.
+"""
+def is_image(file_path):
+    global IMAGE_EXTENSIONS
+    if IMAGE_EXTENSIONS is None:
+        IMAGE_EXTENSIONS = {extension for extension, image_format in Image.registered_extensions().items()
+                            if image_format in Image.OPEN and image_format not in UNRASTERIZED_FORMATS}
+    return os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS
+
+"""
+Returns the random permutations used by `minhash`, the same for every run so signatures can be stored.
+"""
+def minhash_permutations(count):
+    generator = random.Random(count)
+    return [(generator.randrange(1, MINHASH_PRIME), generator.randrange(0, MINHASH_PRIME)) for _ in range(count)]
+
+"""
+Computes the MinHash signature of a text over its word shingles.
+
+The fraction of positions at which two signatures agree estimates the Jaccard similarity of the two texts'
+sets of shingles (runs of `shingle_size` consecutive words).
+
+Args:
+    text (str): The text to sign.
+    permutations (list): The (a, b) pairs from `minhash_permutations`.
+    shingle_size (int, optional): The number of words per shingle. Defaults to `config.MINHASH_SHINGLE_SIZE`.
+
+Returns:
+    array: One 32-bit minimum per permutation, or None if the text is too short to have a single shingle.
+"""
+def minhash(text, permutations, shingle_size=None):
+    shingle_size = shingle_size or config.MINHASH_SHINGLE_SIZE
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = {zlib.crc32(' '.join(words[i:i + shingle_size]).encode('utf-8'))
+                for i in range(len(words) - shingle_size + 1)}
+    if not shingles:
+        return None
+    return array('I', (min((a * shingle + b) % MINHASH_PRIME for shingle in shingles) & 0xffffffff
+                       for a, b in permutations))
+
+"""
+Picks the number of LSH bands and rows per band for a MinHash similarity threshold.
+
+Two signatures land in the same bucket of at least one band with probability 1 - (1 - s^rows)^bands, which
+rises steeply around s = (1 / bands)^(1 / rows); the split whose steep point is closest to the threshold is used.
+
+Args:
+    permutations (int): The signature length.
+    threshold (float): The Jaccard similarity at which texts count as near-duplicates.
+
+Returns:
+    tuple: The number of bands and of rows per band.
+"""
+def lsh_bands(permutations, threshold):
+    best = None
+    for rows in range(1, permutations + 1):
+        bands = permutations // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+"""
+Index of image and text signatures that groups near-duplicate files into clusters.
+
+Signatures are strings, so they can be stored in the `FileIndex`: "image:" with a 64-bit dHash in hex, or "text:"
+with a MinHash signature. Lookups use locality-sensitive hashing, so each new file is only compared with the
+few files that share a bucket with it instead of with every file seen:
+
+- Image hashes use multi-index hashing: they are split into four 16-bit segments, and by the pigeonhole
+  principle two hashes at most `max_distance` bits apart differ in at most `max_distance // 4` bits in one of
+  them. A lookup probes every key within that many bits of each segment, so no near-duplicate is missed, while
+  16-bit keys keep the buckets small even for the clustered hashes of photo collections.
+- MinHash signatures are split into bands (see `lsh_bands`); texts at least `similarity` alike share a band with
+  high probability, and every candidate is checked against the threshold before it counts.
+
+Paths, text signatures and text buckets are kept in a private temporary SQLite database, deleted with the index.
+Only fixed-size numbers stay in memory, in compact arrays: each file's union-find parent and, for images, the
+hash and its four bucket entries. Matching files are merged into clusters with the union-find. Nothing is
+deleted: `clusters` and `save_report` report them for review.
+
+Args:
+    similarity (float, optional): The Jaccard similarity for texts. Defaults to `config.NEAR_DUPLICATE_TEXT_SIMILARITY`.
+    max_distance (int, optional): The Hamming distance for image hashes. Defaults to `config.NEAR_DUPLICATE_IMAGE_DISTANCE`.
+    permutations (int, optional): The MinHash signature length. Defaults to `config.MINHASH_PERMUTATIONS`.
+"""
+class NearDuplicateIndex:
+    COMMIT_INTERVAL = 1000  # Files added per transaction
+    QUERY_KEYS = 500  # Values per `IN` list, below SQLite's limit on parameters
+
+    def __init__(self, similarity=None, max_distance=None, permutations=None):
+        self.similarity = similarity or config.NEAR_DUPLICATE_TEXT_SIMILARITY
+        self.max_distance = config.NEAR_DUPLICATE_IMAGE_DISTANCE if max_distance is None else max_distance
+        self.permutations = minhash_permutations(permutations or config.MINHASH_PERMUTATIONS)
+        self.bands, self.rows = lsh_bands(len(self.permutations), self.similarity)
+        self.segments = [(start, start + IMAGE_SEGMENT_BITS) for start in range(0, 64, IMAGE_SEGMENT_BITS)]
+        radius = min(IMAGE_SEGMENT_BITS, self.max_distance // len(self.segments))
+        # Every value within `radius` bits of a segment, as masks to xor it with
+        self.probes = [sum(1 << bit for bit in bits) for distance in range(radius + 1)
+                       for bits in combinations(range(IMAGE_SEGMENT_BITS), distance)]
+
+        self.parents = array('q')  # item id -> parent in the union-find
+        self.image_hashes = array('Q')  # item id -> image hash, 0 for texts
+        self.image_buckets = [{} for _ in self.segments]  # per segment: its value -> array of item ids
+        self.connection = None
+        # Shared by the per-device organizers of a drive scan
+        self.lock = threading.Lock()
+
+    def connect(self):
+        # An empty path makes SQLite create a temporary file, removed when the connection closes
+        if self.connection:
+            return self.connection
+        self.connection = sqlite3.connect('', check_same_thread=False)
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, path TEXT NOT NULL, signature BLOB)")
+        self.connection.execute("CREATE TABLE buckets (key BLOB NOT NULL, item INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX buckets_key ON buckets (key)")
+        return self.connection
+
+    def signature(self, text=None, image_path=None):
+        # Returns the storable signature of an image or a text, or "" if it has none
+        if image_path is not None:
+            value = image_hash(image_path)
+            return "" if value is None else f"image:{value:016x}"
+        signature = minhash(text, self.permutations) if text else None
+        return "" if signature is None else "text:" + signature.tobytes().hex()
+
+    def add(self, file_path, signature):
+        # Indexes a file and merges it into the cluster of every near-duplicate found; returns the matches
+        if not signature:
+            return []
+        kind, _, value = signature.partition(':')
+        if kind == 'image':
+            value = int(value, 16)
+        else:
+            value = array('I', bytes.fromhex(value))
+            if len(value) != len(self.permutations):
+                # Stored with another signature length
+                return []
+        with self.lock:
+            connection = self.connect()
+            item = len(self.parents)
+            self.parents.append(item)
+            self.image_hashes.append(value if kind == 'image' else 0)
+            similar = self.insert_image(item, value) if kind == 'image' else self.insert_text(connection, item, value)
+
+            matches = []
+            for other, path in self.select(connection, "SELECT id, path FROM items WHERE id IN ({}) ORDER BY id", sorted(similar)):
+                matches.append(path)
+                self.union(item, other)
+            connection.execute("INSERT INTO items (id, path, signature) VALUES (?, ?, ?)",
+                               (item, file_path, None if kind == 'image' else value.tobytes()))
+            if (item + 1) % self.COMMIT_INTERVAL == 0:
+                connection.commit()
+            return matches
+
+    def insert_image(self, item, value):
+        # Returns the earlier images within `max_distance`, and files the image under its segments
+        candidates = set()
+        segments = [(value >> start) & ((1 << (end - start)) - 1) for start, end in self.segments]
+        for table, segment in zip(self.image_buckets, segments):
+            for mask in self.probes:
+                bucket = table.get(segment ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        for table, segment in zip(self.image_buckets, segments):
+            table.setdefault(segment, array('q')).append(item)
+        return [other for other in candidates if self.is_similar('image', value, self.image_hashes[other])]
+
+    def insert_text(self, connection, item, value):
+        # Returns the earlier texts at least `similarity` alike, and files the text under its bands
+        keys = [band.to_bytes(2, 'big') + value[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {other for other, in self.select(connection, "SELECT DISTINCT item FROM buckets WHERE key IN ({})", keys)}
+        similar = [other for other, signature in self.select(connection, "SELECT id, signature FROM items WHERE id IN ({})", list(candidates))
+                   if self.is_similar('text', value, array('I', signature))]
+        connection.executemany("INSERT INTO buckets (key, item) VALUES (?, ?)", [(key, item) for key in keys])
+        return similar
+
+    def select(self, connection, query, values):
+        # Runs a query with an `IN ({})` list over the values, in chunks below SQLite's limit on parameters
+        for start in range(0, len(values), self.QUERY_KEYS):
+            chunk = values[start:start + self.QUERY_KEYS]
+            yield from connection.execute(query.format(','.join('?' * len(chunk))), chunk)
+
+    def is_similar(self, kind, first, second):
+        if kind == 'image':
+            return bin(first ^ second).count('1') <= self.max_distance
+        agreeing = sum(1 for a, b in zip(first, second) if a == b)
+        return agreeing >= self.similarity * len(first)
+
+    def find(self, item):
+        while self.parents[item] != item:
+            self.parents[item] = self.parents[self.parents[item]]
+            item = self.parents[item]
+        return item
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parents[max(first, second)] = min(first, second)
+
+    def clusters(self):
+        # Returns the groups of two or more near-duplicate paths, in the order their first file was added
+        with self.lock:
+            if not self.connection:
+                return []
+            roots = array('q', (self.find(item) for item in range(len(self.parents))))
+            sizes = array('q', bytes(8 * len(roots)))
+            for root in roots:
+                sizes[root] += 1
+            groups = {}
+            for item, path in self.connection.execute("SELECT id, path FROM items ORDER BY id"):
+                if sizes[roots[item]] > 1:
+                    groups.setdefault(roots[item], []).append(path)
+        return list(groups.values())
+
+    def save_report(self, path=None):
+        path = path or config.NEAR_DUPLICATE_REPORT_PATH
+        clusters = self.clusters()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as file:
+                json.dump({'clusters': clusters}, file, indent=1)
+        except OSError as e:
+            print(f"Error saving near-duplicate report {path}: {str(e)}")
+        return clusters
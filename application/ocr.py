@@ -0,0 +1,127 @@
+import time
+from collections import deque
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+import pytesseract
+import config
+
+# Recent per-image OCR latencies in seconds, recorded in the process that asked for the OCR
+latencies = deque(maxlen=1000)
+
+"""
+Checks cheaply whether an image could contain any text at all.
+
+A small grayscale thumbnail is tested for contrast and edge density. Blank scans, flat backgrounds and very
+smooth images fail the check and are never sent to Tesseract. The check only rejects, it can't confirm text.
+
+Args:
+    img (PIL.Image.Image): The image to check.
+
+Returns:
+    bool: False if the image certainly has no readable text, True otherwise.
+"""
+def may_contain_text(img):
+    thumbnail = img.copy()
+    thumbnail.thumbnail((config.OCR_PRECHECK_SIZE, config.OCR_PRECHECK_SIZE))
+    thumbnail = ImageOps.grayscale(thumbnail)
+    if ImageStat.Stat(thumbnail).stddev[0] < config.OCR_MIN_CONTRAST:
+        return False
+
+    # The filter marks the outermost pixels as edges, so those are left out
+    edges = thumbnail.filter(ImageFilter.FIND_EDGES).crop((1, 1, thumbnail.width - 1, thumbnail.height - 1))
+    histogram = edges.histogram()
+    edge_pixels = sum(histogram[config.OCR_EDGE_THRESHOLD:])
+    return edge_pixels / max(1, edges.width * edges.height) >= config.OCR_MIN_EDGE_DENSITY
+
+"""
+Converts an image to grayscale and scales it down to the resolution Tesseract needs.
+
+Images with a known DPI above `config.OCR_TARGET_DPI` are scaled to that DPI, and any image whose longest side
+is still above `config.OCR_MAX_SIDE` pixels is scaled to fit. Images are never scaled up.
+
+Args:
+    img (PIL.Image.Image): The image to prepare.
+
+Returns:
+    PIL.Image.Image: The grayscale, downscaled image.
+"""
+def prepare_image(img):
+    dpi = img.info.get('dpi')
+    img = ImageOps.grayscale(ImageOps.exif_transpose(img))
+
+    scale = 1.0
+    if dpi and dpi[0] and dpi[0] > config.OCR_TARGET_DPI:
+        scale = config.OCR_TARGET_DPI / dpi[0]
+    longest_side = max(img.size) * scale
+    if longest_side > config.OCR_MAX_SIDE:
+        scale *= config.OCR_MAX_SIDE / longest_side
+
+    if scale < 1.0:
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    return img
+
+"""
+Splits an image into horizontal strips for incremental OCR.
+
+Each cut is placed on the flattest row (lowest pixel deviation) near the nominal strip boundary, so cuts fall
+between lines of text rather than through them.
+
+Args:
+    img (PIL.Image.Image): The grayscale image to split.
+    strip_height (int, optional): The nominal strip height in pixels. Defaults to `config.OCR_STRIP_HEIGHT`.
+
+Returns:
+    list: (top, bottom) pixel rows of each strip, from top to bottom.
+"""
+def get_strips(img, strip_height=None):
+    strip_height = strip_height or config.OCR_STRIP_HEIGHT
+    window = max(1, strip_height // 10)
+
+    strips = []
+    top = 0
+    while img.height - top > strip_height + window:
+        nominal = top + strip_height
+        rows = range(nominal - window, nominal + window)
+        cut = min(rows, key=lambda y: ImageStat.Stat(img.crop((0, y, img.width, y + 1))).stddev[0])
+        strips.append((top, cut))
+        top = cut
+    strips.append((top, img.height))
+    return strips
+
+"""
+Extracts text from an image as fast as possible.
+
+The image is checked for any sign of text first, then downscaled and read strip by strip from the top, stopping
+as soon as `max_chars` characters have been collected or the time budget runs out. Text read before a timeout is
+kept. Runs in a worker process when called through `WorkerPool.run_cpu`.
+
+Args:
+    image_path (str): The path to the image file.
+    max_chars (int, optional): The number of characters after which reading stops. Defaults to 1000.
+    timeout (float, optional): The time budget for the whole image in seconds. Defaults to `config.OCR_TIMEOUT`.
+
+Returns:
+    tuple: The extracted text (at most `max_chars` characters) and the time taken in seconds.
+"""
+def ocr_image(image_path, max_chars=1000, timeout=None):
+    started = time.monotonic()
+    deadline = started + (timeout or config.OCR_TIMEOUT)
+
+    text = ""
+    with Image.open(image_path) as img:
+        if may_contain_text(img):
+            img = prepare_image(img)
+            for top, bottom in get_strips(img):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    text += pytesseract.image_to_string(img.crop((0, top, img.width, bottom)), timeout=remaining)
+                except RuntimeError as e:
+                    # pytesseract kills Tesseract and raises RuntimeError when the timeout expires
+                    if 'timeout' not in str(e).lower():
+                        raise
+                    break
+                if len(text) >= max_chars:
+                    break
+
+    return text[:max_chars], time.monotonic() - started
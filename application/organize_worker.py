@@ -0,0 +1,37 @@
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from scan_progress import ScanProgress, ScanCancelled
+
+class OrganizeSignals(QObject):
+    progress = pyqtSignal(dict)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+class OrganizeWorker(QRunnable):
+    def __init__(self, task, *args, **kwargs):
+        super().__init__()
+        # Kept alive by the window until it has finished, so its signals outlive run()
+        self.setAutoDelete(False)
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = OrganizeSignals()
+        # Signals are emitted from the backend's threads and delivered on the GUI thread
+        self.progress = ScanProgress(self.signals.progress.emit)
+
+    def run(self):
+        try:
+            result = self.task(*self.args, progress=self.progress, **self.kwargs)
+        except ScanCancelled:
+            self.signals.progress.emit(self.progress.snapshot())
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            print(f"Error organizing: {str(e)}")
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.progress.emit(self.progress.snapshot())
+        self.signals.finished.emit(result)
+
+    def cancel(self):
+        self.progress.cancel()
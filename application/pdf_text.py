@@ -0,0 +1,127 @@
+import time
+import signal
+import threading
+from contextlib import contextmanager
+import psutil
+from pypdf import PdfReader
+import config
+
+"""
+Raised when a PDF exceeds its time budget in the middle of a page.
+
+Derived from BaseException so the parser's own error recovery can't swallow it.
+"""
+class PdfBudgetExceeded(BaseException):
+    pass
+
+"""
+Interrupts the enclosed block once `seconds` have passed.
+
+A single malformed page can make the PDF parser spin for a long time, so checking the clock between pages is
+not enough. Signals can only be used from the main thread (which is where process pool workers and sequential
+runs execute); elsewhere the block runs unbounded and only the between-page checks apply.
+
+Args:
+    seconds (float): The time budget for the block.
+"""
+@contextmanager
+def time_limit(seconds):
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, 'setitimer'):
+        yield
+        return
+
+    def interrupt(signum, frame):
+        raise PdfBudgetExceeded(f"PDF time budget of {seconds:.1f}s exceeded")
+
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+"""
+Checks whether a page references any font, i.e. whether it can contain extractable text at all.
+
+Fonts used directly by the page and fonts of form XObjects drawn on it are both considered. Scanned pages that
+are a single image have neither, and are skipped without running the text extractor.
+
+Args:
+    page (pypdf.PageObject): The page to check.
+
+Returns:
+    bool: True if the page uses at least one font.
+"""
+def page_has_fonts(page):
+    resources = page.get('/Resources')
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if resources.get('/Font'):
+        return True
+
+    xobjects = resources.get('/XObject')
+    if not xobjects:
+        return False
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        if xobject.get('/Subtype') == '/Form':
+            form_resources = xobject.get('/Resources')
+            if form_resources and form_resources.get_object().get('/Font'):
+                return True
+    return False
+
+"""
+Streams text out of a PDF page by page, within a time and memory budget.
+
+Pages are parsed lazily in order and extraction stops as soon as `max_chars` characters are collected. Pages
+without fonts are skipped, and a document whose first `config.PDF_PROBE_PAGES` pages are all fontless is treated
+as image-only and abandoned. Extraction also stops, keeping the text read so far, once the time budget runs out
+or the process has grown by more than the memory budget since the document was opened.
+
+Args:
+    file_path (str): The path to the PDF file.
+    max_chars (int, optional): The number of characters after which extraction stops. Defaults to 1000.
+    timeout (float, optional): The time budget in seconds. Defaults to `config.PDF_TIMEOUT`.
+    memory_budget (int, optional): The allowed growth of the process in bytes. Defaults to `config.PDF_MEMORY_BUDGET`.
+
+Returns:
+    tuple: The extracted text (at most `max_chars` characters) and the number of pages parsed.
+"""
+def extract_pdf_text(file_path, max_chars=1000, timeout=None, memory_budget=None):
+    timeout = timeout or config.PDF_TIMEOUT
+    memory_budget = memory_budget or config.PDF_MEMORY_BUDGET
+    process = psutil.Process()
+    start_rss = process.memory_info().rss
+    deadline = time.monotonic() + timeout
+
+    parts = []
+    collected = 0
+    pages_read = 0
+    fontless_pages = 0
+    try:
+        with time_limit(timeout):
+            reader = PdfReader(file_path, strict=False)
+            for page_number in range(len(reader.pages)):
+                page = reader.pages[page_number]
+                pages_read += 1
+
+                if not page_has_fonts(page):
+                    fontless_pages += 1
+                    # Nothing but images so far, most likely a scan without a text layer
+                    if fontless_pages == pages_read and pages_read >= config.PDF_PROBE_PAGES:
+                        break
+                    continue
+
+                text = page.extract_text() or ""
+                parts.append(text)
+                collected += len(text)
+                if collected >= max_chars:
+                    break
+                if time.monotonic() > deadline or process.memory_info().rss - start_rss > memory_budget:
+                    break
+    except PdfBudgetExceeded:
+        pass
+
+    return "".join(parts)[:max_chars], pages_read
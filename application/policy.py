@@ -0,0 +1,57 @@
+# Cost classes of rule predicates, cheapest first
+COST_NAME = 0  # Only the file name or path
+COST_STAT = 1  # An already available stat result
+COST_HEADER = 2  # The first block of the file
+COST_FULL_READ = 3  # Every byte of the file, e.g. hashing
+COST_OCR = 4  # Image OCR or PDF parsing
+COST_LLM = 5  # A model call
+
+"""
+A single declarative decision rule.
+
+Args:
+    name (str): A short name used in hit counts.
+    cost (int): The cost class of the predicate, one of the COST_* constants.
+    predicate (callable): Called with the subject being decided, returns True if the rule applies.
+    action (str): What to do with a subject the rule applies to, e.g. 'remove'.
+    message (str): The log message used when the rule applies.
+"""
+class Rule:
+    def __init__(self, name, cost, predicate, action, message):
+        self.name = name
+        self.cost = cost
+        self.predicate = predicate
+        self.action = action
+        self.message = message
+
+"""
+Evaluates rules in cost order and stops at the first one that applies.
+
+Rules are sorted by cost once (keeping their declared order within a cost class), so an expensive predicate
+such as a model call only runs when every cheaper rule has declined. Evaluation can be split into cost bands,
+e.g. stat-level rules when a file is listed and the rest when it is decided, and every rule keeps counts of how
+often it was evaluated and how often it applied.
+
+Args:
+    rules (list): The `Rule` objects to evaluate.
+"""
+class PolicyEngine:
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: rule.cost)
+        self.stats = {rule.name: {'evaluated': 0, 'hits': 0} for rule in self.rules}
+
+    def evaluate(self, subject, min_cost=None, max_cost=None):
+        # Returns the first applying rule within the cost band, or None
+        for rule in self.rules:
+            if min_cost is not None and rule.cost < min_cost:
+                continue
+            if max_cost is not None and rule.cost > max_cost:
+                break
+            self.stats[rule.name]['evaluated'] += 1
+            if rule.predicate(subject):
+                self.stats[rule.name]['hits'] += 1
+                return rule
+        return None
+
+    def report(self):
+        return ', '.join(f"{name} {counts['hits']}/{counts['evaluated']}" for name, counts in self.stats.items())
@@ -0,0 +1,77 @@
+import time
+import threading
+import config
+
+"""
+Raised inside a scan once it has been cancelled through its `ScanProgress`.
+"""
+class ScanCancelled(Exception):
+    pass
+
+"""
+Counters of a running scan and the flag that cancels it.
+
+The counters are updated from the organizer's threads and read from the thread showing progress. Instead of
+reporting every file, updates are batched: `on_update` is called with a snapshot at most once every
+`config.PROGRESS_REPORT_INTERVAL` seconds, so a fast scan doesn't flood the GUI with signals. The organizer
+also registers its queues, whose current depths are part of every snapshot.
+
+Cancellation is cooperative. `cancel` only sets a flag, which the organizer checks between files with `check`,
+so the file being handled is finished and nothing is left half-moved; work still queued on the worker pools is
+dropped.
+
+Args:
+    on_update (callable, optional): Called with a snapshot of the counters as they change.
+"""
+class ScanProgress:
+    def __init__(self, on_update=None):
+        self.on_update = on_update
+        self.files = 0
+        self.bytes = 0
+        self.bytes_hashed = 0
+        self.actions = 0
+        self.started = time.monotonic()
+        self.reported_at = 0.0
+        self.queues = {}  # name -> callable returning the queue's depth
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+
+    def walked(self, stat_result):
+        with self.lock:
+            self.files += 1
+            self.bytes += stat_result.st_size
+        self.changed()
+
+    def hashed(self, count):
+        with self.lock:
+            self.bytes_hashed += count
+        self.changed()
+
+    def acted(self):
+        with self.lock:
+            self.actions += 1
+        self.changed()
+
+    def watch_queue(self, name, depth):
+        self.queues[name] = depth
+
+    def changed(self):
+        now = time.monotonic()
+        if self.on_update and now - self.reported_at >= config.PROGRESS_REPORT_INTERVAL:
+            self.reported_at = now
+            self.on_update(self.snapshot())
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        # Called by the organizer between files
+        if self.cancelled.is_set():
+            raise ScanCancelled()
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {'files': self.files, 'bytes': self.bytes, 'bytes_hashed': self.bytes_hashed,
+                        'actions': self.actions, 'seconds': time.monotonic() - (self.started or time.monotonic())}
+        snapshot['queues'] = {name: depth() for name, depth in list(self.queues.items())}
+        return snapshot
@@ -0,0 +1,77 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QLabel
+from PyQt5.QtCore import Qt, QTimer, QUrl, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QDesktopServices
+
+class SearchSignals(QObject):
+    finished = pyqtSignal(str, list)
+
+class SearchWorker(QRunnable):
+    def __init__(self, search, query):
+        super().__init__()
+        # Kept alive by the dialog until it has finished, so its signals outlive run()
+        self.setAutoDelete(False)
+        self.search = search
+        self.query = query
+        self.signals = SearchSignals()
+
+    def run(self):
+        try:
+            results = self.search(self.query)
+        except Exception as e:
+            print(f"Error searching files: {str(e)}")
+            results = []
+        self.signals.finished.emit(self.query, results)
+
+class SearchDialog(QDialog):
+    def __init__(self, search, parent=None):
+        super().__init__(parent)
+        self.search = search
+        # Queries wait for the index while an organizer run writes to it, so they run off the GUI thread
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.workers = []
+        self.setWindowTitle("Find Files")
+        self.setMinimumSize(480, 360)
+        layout = QVBoxLayout(self)
+
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText("Search names and contents")
+        layout.addWidget(self.query_edit)
+
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+
+        self.result_list = QListWidget(self)
+        self.result_list.itemActivated.connect(self.open_result)
+        layout.addWidget(self.result_list)
+
+        # Searches once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.query_edit.textChanged.connect(self.search_timer.start)
+
+    def run_search(self):
+        query = self.query_edit.text().strip()
+        if not query:
+            self.result_list.clear()
+            self.status_label.setText("")
+            return
+        self.status_label.setText("Searching...")
+        worker = SearchWorker(self.search, query)
+        worker.signals.finished.connect(lambda query, results: self.show_results(worker, query, results))
+        self.workers.append(worker)
+        self.pool.start(worker)
+
+    def show_results(self, worker, query, results):
+        self.workers.remove(worker)
+        # Results for text that has been typed over since are dropped
+        if query != self.query_edit.text().strip():
+            return
+        self.result_list.clear()
+        self.result_list.addItems(results)
+        self.status_label.setText(f"{len(results)} files")
+
+    def open_result(self, item):
+        QDesktopServices.openUrl(QUrl.fromLocalFile(item.text()))
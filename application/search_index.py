@@ -0,0 +1,210 @@
+import os
+import re
+import sqlite3
+import threading
+import config
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Upper bound of every string starting with a given prefix, for prefix range scans
+PREFIX_END = "\U0010ffff"
+
+"""
+Returns the distinct three-character substrings of a lowercased name.
+"""
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+"""
+Returns the distinct lowercased words of a text that are worth indexing, in order of first appearance, so
+long texts always keep the same first `max_terms` words.
+"""
+def terms(text, max_terms=None):
+    max_terms = max_terms or config.SEARCH_MAX_TERMS
+    words = dict.fromkeys(word for word in WORD_PATTERN.findall(text.lower()) if 2 <= len(word) <= 40)
+    return list(words)[:max_terms]
+
+"""
+Persistent search index over file names and extracted content.
+
+File names are indexed by their trigrams, so any substring of three or more characters is found with a few
+B-tree lookups instead of a scan; the candidates are then checked for the full substring. Extracted text is
+indexed as an inverted index of words, and a query word matches every indexed word it is a prefix of. A file
+matches a query when each query word is found in its name or its content.
+
+The organizer keeps the index up to date as it goes: kept files are added with the text already extracted for
+them, moves and renames only change the path, and deleted files are dropped. Entries for files changed or
+removed by other programs are refreshed on the next run, and results whose file no longer exists are dropped
+when they are found. Writes are batched into transactions of `commit_interval` updates, and one index can be
+shared by several threads.
+
+Args:
+    path (str, optional): The path to the SQLite database. Defaults to `config.SEARCH_INDEX_PATH`.
+    commit_interval (int, optional): The number of writes grouped into one transaction. Defaults to `config.SEARCH_COMMIT_INTERVAL`.
+"""
+class SearchIndex:
+    def __init__(self, path=None, commit_interval=None):
+        self.path = path or config.SEARCH_INDEX_PATH
+        self.commit_interval = commit_interval or config.SEARCH_COMMIT_INTERVAL
+        self.pending_writes = 0
+        self.connection = None
+        self.lock = threading.RLock()
+
+    def connect(self):
+        # Opened on first use, so importing the backend doesn't touch the disk
+        if self.connection:
+            return self.connection
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                has_content INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Postings are keyed on the trigram or word first, so each lookup is a single range scan
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS name_trigrams (
+                trigram TEXT NOT NULL,
+                file_id INTEGER NOT NULL,
+                PRIMARY KEY (trigram, file_id)
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT NOT NULL,
+                file_id INTEGER NOT NULL,
+                PRIMARY KEY (term, file_id)
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS name_trigrams_file ON name_trigrams (file_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS terms_file ON terms (file_id)")
+        self.connection.commit()
+        return self.connection
+
+    def add(self, file_path, stat_result, content=None):
+        # Indexes a file, with its extracted text if there is any; unchanged files cost a single lookup
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT id, size, mtime_ns, has_content FROM files WHERE path = ?", (file_path,)).fetchone()
+            unchanged = row and (row[1], row[2]) == (stat_result.st_size, stat_result.st_mtime_ns)
+            if unchanged and (row[3] or content is None):
+                return
+
+            if row is None:
+                file_id = connection.execute(
+                    "INSERT INTO files (path, name, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                    (file_path, os.path.basename(file_path), stat_result.st_size, stat_result.st_mtime_ns)
+                ).lastrowid
+                self.index_name(file_id, file_path)
+            else:
+                file_id = row[0]
+                connection.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?",
+                                   (stat_result.st_size, stat_result.st_mtime_ns, file_id))
+                if not unchanged:
+                    # The words of an earlier version of the file
+                    connection.execute("DELETE FROM terms WHERE file_id = ?", (file_id,))
+                    connection.execute("UPDATE files SET has_content = 0 WHERE id = ?", (file_id,))
+
+            if content:
+                connection.executemany("INSERT OR IGNORE INTO terms (term, file_id) VALUES (?, ?)",
+                                       ((term, file_id) for term in terms(content)))
+                connection.execute("UPDATE files SET has_content = 1 WHERE id = ?", (file_id,))
+            self.wrote()
+
+    def index_name(self, file_id, file_path):
+        self.connection.execute("DELETE FROM name_trigrams WHERE file_id = ?", (file_id,))
+        self.connection.executemany("INSERT OR IGNORE INTO name_trigrams (trigram, file_id) VALUES (?, ?)",
+                                    ((trigram, file_id) for trigram in trigrams(os.path.basename(file_path))))
+
+    def move(self, old_path, new_path):
+        # Follows a moved or renamed file; its content is the same, only the name trigrams can change
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT id, name FROM files WHERE path = ?", (old_path,)).fetchone()
+            if row is None:
+                return
+            self.forget(new_path)
+            connection.execute("UPDATE files SET path = ?, name = ? WHERE id = ?",
+                               (new_path, os.path.basename(new_path), row[0]))
+            if row[1] != os.path.basename(new_path):
+                self.index_name(row[0], new_path)
+            self.wrote()
+
+    def forget(self, file_path):
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT id FROM files WHERE path = ?", (file_path,)).fetchone()
+            if row is None:
+                return
+            connection.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            connection.execute("DELETE FROM name_trigrams WHERE file_id = ?", (row[0],))
+            connection.execute("DELETE FROM terms WHERE file_id = ?", (row[0],))
+            self.wrote()
+
+    def search(self, query, limit=None):
+        # Returns the paths of up to `limit` existing files matching every word of the query
+        limit = limit or config.SEARCH_MAX_RESULTS
+        words = [word for word in query.lower().split() if word]
+        if not words:
+            return []
+
+        conditions = []
+        parameters = []
+        for word in words:
+            word_trigrams = sorted(trigrams(word))
+            if word_trigrams:
+                name_match = (f"(id IN (SELECT file_id FROM name_trigrams WHERE trigram IN ({', '.join('?' for _ in word_trigrams)}) "
+                              f"GROUP BY file_id HAVING COUNT(*) = ?) AND instr(lower(name), ?) > 0)")
+                parameters.extend(word_trigrams + [len(word_trigrams), word])
+            else:
+                # Too short for a trigram: only a scan can find it in names
+                name_match = "instr(lower(name), ?) > 0"
+                parameters.append(word)
+            if len(word) >= 3:
+                content_match = "id IN (SELECT file_id FROM terms WHERE term >= ? AND term < ?)"
+                parameters.extend([word, word + PREFIX_END])
+            else:
+                content_match = "id IN (SELECT file_id FROM terms WHERE term = ?)"
+                parameters.append(word)
+            conditions.append(f"({name_match} OR {content_match})")
+
+        with self.lock:
+            # Files that vanished since they were indexed are dropped as they turn up, and the query run again
+            while True:
+                rows = self.connect().execute(
+                    f"SELECT path FROM files WHERE {' AND '.join(conditions)} LIMIT ?", (*parameters, limit)
+                ).fetchall()
+                stale = [path for path, in rows if not os.path.exists(path)]
+                for path in stale:
+                    self.forget(path)
+                if not stale:
+                    break
+            self.commit()
+        return [path for path, in rows]
+
+    def wrote(self):
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        with self.lock:
+            if self.connection:
+                self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            if self.connection:
+                self.connection.close()
+                self.connection = None
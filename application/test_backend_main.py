@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from datetime import datetime, timedelta
+from unittest import mock
+import config
+import backend_main
+from content_cache import ContentCache
+
+"""
+Tests `organize_directory` end to end, offline and with a persistent file index.
+
+Run from the application directory with:
+
+    python -m unittest test_backend_main
+"""
+class OrganizeDirectoryTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.index_path = os.path.join(self.data_dir, "index.sqlite3")
+
+        # No model calls and no state outside the temporary directories
+        for patcher in [
+            mock.patch.object(config, 'OFFLINE', True),
+            mock.patch.object(config, 'NEAR_DUPLICATES', False),
+            mock.patch.object(backend_main, 'content_cache', ContentCache(os.path.join(self.data_dir, "content.sqlite3"))),
+            mock.patch.object(backend_main, 'classifier', None),
+            mock.patch.object(backend_main, 'search_index', None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_file(self, name, content, age_days=0):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'w') as file:
+            file.write(content)
+        modified = (datetime.now() - timedelta(days=age_days)).timestamp()
+        os.utime(file_path, (modified, modified))
+        return file_path
+
+    def organize(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            backend_main.organize_directory(self.directory, {}, index_path=self.index_path)
+        return output.getvalue()
+
+    def list_files(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.directory)
+                      for root, _, names in os.walk(self.directory) for name in names)
+
+    def test_organized_file_is_kept_on_rerun(self):
+        self.write_file("notes.txt", "meeting notes")
+        self.organize()
+        organized = self.list_files()
+
+        output = self.organize()
+
+        self.assertEqual(self.list_files(), organized)
+        self.assertIn("old 0/1", output)
+
+    def test_organized_file_that_ages_out_is_removed_on_rerun(self):
+        # Not old yet on the first run, old a few days later
+        self.write_file("notes.txt", "meeting notes", age_days=363)
+        self.organize()
+        self.assertEqual(len(self.list_files()), 1)
+
+        class Later(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.now(tz) + timedelta(days=5)
+
+        with mock.patch.object(backend_main, 'datetime', Later):
+            output = self.organize()
+
+        self.assertEqual(self.list_files(), [])
+        self.assertIn("Removed old file", output)
+        self.assertIn("old 1/1", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import unittest
+from unittest import mock
+import openai
+import config
+from llm_client import LLMClient
+from llm_cache import ResponseCache
+from llm_stub_server import create_stub_server
+
+"""
+Tests `LLMClient` against a local `llm_stub_server`: retries with backoff on 429/5xx, the
+response cache and the concurrency cap.
+
+Run from the application directory with:
+
+    python -m unittest test_llm_client
+"""
+class LLMClientTest(unittest.TestCase):
+    def start_server(self, **kwargs):
+        server = create_stub_server(port=0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def make_client(self, server, **kwargs):
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        client = LLMClient(api_key="stub", base_url=base_url, tokens_per_minute=0, **kwargs)
+        self.addCleanup(lambda: client.loop and client.loop.call_soon_threadsafe(client.loop.stop))
+        return client
+
+    def setUp(self):
+        # Keeps the backoff between retries short
+        patcher = mock.patch.object(config, 'LLM_BACKOFF_BASE', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_rate_limit_and_server_errors(self):
+        server = self.start_server(errors=[429, 500, 503])
+        client = self.make_client(server, max_retries=3)
+
+        reply = client.chat([{"role": "system", "content": "Answer useless"}, {"role": "user", "content": "a.txt"}])
+
+        self.assertEqual(reply, "NO")
+        self.assertEqual(server.stats['requests'], 4)
+        self.assertEqual(client.stats['retries'], 3)
+        self.assertEqual(client.stats['failures'], 0)
+
+    def test_gives_up_after_max_retries(self):
+        server = self.start_server(errors=[500] * 5)
+        client = self.make_client(server, max_retries=2)
+
+        with self.assertRaises(openai.InternalServerError):
+            client.chat([{"role": "user", "content": "a.txt"}])
+
+        self.assertEqual(server.stats['requests'], 3)
+        self.assertEqual(client.stats['failures'], 1)
+
+    def test_client_errors_are_not_retried(self):
+        server = self.start_server(errors=[400])
+        client = self.make_client(server, max_retries=3)
+
+        with self.assertRaises(openai.BadRequestError):
+            client.chat([{"role": "user", "content": "a.txt"}])
+
+        self.assertEqual(server.stats['requests'], 1)
+        self.assertEqual(client.stats['retries'], 0)
+
+    def test_backoff_honours_retry_after(self):
+        client = LLMClient(api_key="stub")
+        error = mock.Mock(response=mock.Mock(headers={'retry-after': '1.5'}))
+        self.assertEqual(client.get_backoff(0, error), 1.5)
+
+        error = mock.Mock(response=mock.Mock(headers={}))
+        for attempt in range(10):
+            backoff = client.get_backoff(attempt, error)
+            self.assertGreaterEqual(backoff, 0)
+            self.assertLessEqual(backoff, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def test_cached_responses_skip_the_server(self):
+        server = self.start_server()
+        client = self.make_client(server, cache=ResponseCache(':memory:'))
+        messages = [{"role": "system", "content": "Suggest a filename"}, {"role": "user", "content": "a.txt"}]
+
+        self.assertEqual(client.chat(messages), "stub_file")
+        self.assertEqual(client.chat(messages), "stub_file")
+
+        self.assertEqual(server.stats['requests'], 1)
+        self.assertEqual(client.cache.stats['hits'], 1)
+
+    def test_concurrency_cap(self):
+        server = self.start_server(latency=0.1)
+        client = self.make_client(server, max_concurrency=3)
+
+        replies = client.chat_many([[{"role": "user", "content": f"file {i}"}] for i in range(12)])
+
+        self.assertEqual(replies, ["OK"] * 12)
+        self.assertEqual(server.stats['requests'], 12)
+        self.assertEqual(server.stats['max_in_flight'], 3)
+        self.assertEqual(client.queued, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import math
+import random
+import unittest
+from unittest import mock
+import config
+from local_classifier import LocalClassifier, extract_features
+
+"""
+Tests `LocalClassifier` on a small deterministic set of synthetic verdicts: confident files are decided locally,
+unsure ones escalate, and offline unsure files are kept.
+
+Run from the application directory with:
+
+    python -m unittest test_local_classifier
+"""
+JUNK_WORDS = "setup installer wizard click next install casino prize winner".split()
+FINANCE_WORDS = "invoice payment tax total amount due receipt balance account".split()
+
+def make_text(words, generator):
+    return " ".join(generator.choice(words) for _ in range(30))
+
+class LocalClassifierTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in [
+            mock.patch.object(config, 'OFFLINE', False),
+            mock.patch.object(config, 'LOCAL_CLASSIFIER_MIN_EXAMPLES', 20),
+            mock.patch.object(config, 'LOCAL_CLASSIFIER_RETRAIN_INTERVAL', 20),
+            mock.patch.object(config, 'LOCAL_CLASSIFIER_EPOCHS', 20),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Twenty examples don't make a model 90% sure, a lower threshold keeps the test small
+        self.classifier = LocalClassifier(':memory:', dimensions=1024, threshold=0.75)
+        self.addCleanup(self.classifier.close)
+        generator = random.Random(0)
+        for _ in range(10):
+            self.classifier.record(make_text(JUNK_WORDS, generator), True, 'Junk')
+            self.classifier.record(make_text(FINANCE_WORDS, generator), False, 'Finance')
+
+    def train(self):
+        # Training runs in the background; waits for it so the new models are in place
+        self.classifier.prepare()
+        self.classifier.training.join()
+
+    def test_features_are_stable_and_unit_length(self):
+        buckets, value = extract_features("Invoice total due, invoice total", 1024)
+
+        self.assertEqual((buckets, value), extract_features("invoice TOTAL due invoice total", 1024))
+        # 3 words and 3 distinct bigrams
+        self.assertEqual(len(buckets), 6)
+        self.assertAlmostEqual(value * value * len(buckets), 1.0)
+        self.assertEqual(extract_features("", 1024), ([], 0.0))
+
+    def test_untrained_classifier_escalates(self):
+        self.assertIsNone(self.classifier.predict("invoice"))
+        self.assertIsNone(self.classifier.classify("invoice"))
+        self.assertEqual(self.classifier.stats['escalated'], 1)
+
+    def test_confident_files_are_decided_locally(self):
+        self.train()
+
+        junk = self.classifier.classify("installer setup wizard click next install")
+        finance = self.classifier.classify("invoice payment tax total amount due")
+
+        self.assertEqual((junk['useless'], junk['category'], junk['tier']), (True, 'Junk', 'local'))
+        self.assertEqual((finance['useless'], finance['category']), (False, 'Finance'))
+        self.assertEqual(self.classifier.stats['local'], 2)
+
+    def test_unsure_files_escalate(self):
+        self.train()
+        prediction = self.classifier.predict("weather forecast rain sunshine")
+        self.assertLess(prediction['useless_confidence'], self.classifier.threshold)
+
+        self.assertIsNone(self.classifier.classify("weather forecast rain sunshine"))
+        self.assertEqual(self.classifier.stats['escalated'], 1)
+
+    def test_offline_unsure_files_are_kept(self):
+        self.train()
+
+        with mock.patch.object(config, 'OFFLINE', True):
+            analysis = self.classifier.classify("weather forecast rain sunshine")
+            report = self.classifier.report()
+
+        self.assertFalse(analysis['useless'])
+        self.assertIsNone(analysis['category'])
+        self.assertEqual(self.classifier.stats['kept'], 1)
+        self.assertIn("kept as unsure 1", report)
+
+    def test_models_are_saved_and_reloaded(self):
+        self.train()
+        expected = self.classifier.predict("invoice payment tax")
+
+        # A second classifier on the same database loads the trained models instead of retraining
+        reloaded = LocalClassifier(':memory:', dimensions=1024, threshold=0.75)
+        reloaded.connection = self.classifier.connection
+        reloaded.prepare()
+
+        self.assertIsNone(reloaded.training)
+        prediction = reloaded.predict("invoice payment tax")
+        self.assertEqual(prediction['category'], expected['category'])
+        self.assertTrue(math.isclose(prediction['useless_confidence'], expected['useless_confidence'], rel_tol=1e-6))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from PIL import Image, ImageFilter
+from near_duplicates import NearDuplicateIndex, is_image
+
+"""
+Tests `NearDuplicateIndex`: near-duplicate images and texts cluster, distinct ones don't.
+
+Run from the application directory with:
+
+    python -m unittest test_near_duplicates
+"""
+class NearDuplicateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def save_image(self, name, image, **options):
+        file_path = os.path.join(self.directory, name)
+        image.save(file_path, **options)
+        return file_path
+
+    def make_picture(self, seed):
+        # Random blocks, scaled up smoothly so the picture has gradients to hash
+        generator = random.Random(seed)
+        small = Image.new('L', (8, 8))
+        small.putdata([generator.randrange(256) for _ in range(64)])
+        return small.resize((256, 256), Image.BICUBIC).convert('RGB')
+
+    def test_similar_images_cluster(self):
+        index = NearDuplicateIndex()
+        picture = self.make_picture(1)
+        original = self.save_image("original.png", picture)
+        recompressed = self.save_image("recompressed.jpg", picture, quality=40)
+        resized = self.save_image("resized.png", picture.resize((180, 180)).filter(ImageFilter.GaussianBlur(1)))
+        other = self.save_image("other.png", self.make_picture(2))
+
+        for file_path in (original, recompressed, resized, other):
+            index.add(file_path, index.signature(image_path=file_path))
+
+        self.assertEqual(index.clusters(), [[original, recompressed, resized]])
+
+    def test_image_distance_is_exact(self):
+        # Every hash within max_distance bits is found, none further away
+        index = NearDuplicateIndex(max_distance=6)
+        generator = random.Random(0)
+        for seed in range(200):
+            index.add(f"noise{seed}", f"image:{generator.getrandbits(64):016x}")
+        base = generator.getrandbits(64)
+        index.add("base", f"image:{base:016x}")
+
+        near = base
+        for bit in generator.sample(range(64), 6):
+            near ^= 1 << bit
+        far = base
+        for bit in generator.sample(range(64), 7):
+            far ^= 1 << bit
+
+        self.assertEqual(index.add("far", f"image:{far:016x}"), [])
+        self.assertEqual(index.add("near", f"image:{near:016x}"), ["base"])
+
+    def test_similar_texts_cluster(self):
+        index = NearDuplicateIndex()
+        generator = random.Random(0)
+        vocabulary = [f"word{i}" for i in range(2000)]
+        text = " ".join(generator.choice(vocabulary) for _ in range(400))
+        edited = text.replace(text.split()[200], "changed", 1)
+        other = " ".join(generator.choice(vocabulary) for _ in range(400))
+
+        for name, content in (("text.txt", text), ("edited.txt", edited), ("other.txt", other)):
+            index.add(name, index.signature(text=content))
+
+        self.assertEqual(index.clusters(), [["text.txt", "edited.txt"]])
+
+    def test_images_and_texts_never_cluster_together(self):
+        index = NearDuplicateIndex()
+        picture = self.save_image("picture.png", self.make_picture(3))
+        index.add(picture, index.signature(image_path=picture))
+        index.add("notes.txt", index.signature(text="some words that make a few shingles to sign"))
+
+        self.assertEqual(index.clusters(), [])
+
+    def test_is_image_only_for_readable_formats(self):
+        self.assertTrue(is_image("photo.JPG"))
+        self.assertTrue(is_image("scan.tiff"))
+        # PIL can write PDFs but not read them, and needs Ghostscript for PostScript
+        self.assertFalse(is_image("report.pdf"))
+        self.assertFalse(is_image("figure.eps"))
+        self.assertFalse(is_image("notes.txt"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import config
+from search_index import SearchIndex, terms, trigrams
+
+"""
+Tests `SearchIndex`: name substrings through trigrams, content words through prefixes, and the bounded,
+deterministic list of words indexed per file.
+
+Run from the application directory with:
+
+    python -m unittest test_search_index
+"""
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.index = SearchIndex(os.path.join(self.directory, "search.sqlite3"))
+        self.addCleanup(self.index.close)
+
+    def add_file(self, name, content=None):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'w') as file:
+            file.write(content or "")
+        self.index.add(file_path, os.stat(file_path), content)
+        return file_path
+
+    def test_terms_keep_the_first_words_in_order(self):
+        text = "Zeta alpha zeta Beta a " + " ".join(f"word{i}" for i in range(100))
+
+        self.assertEqual(terms(text, max_terms=4), ["zeta", "alpha", "beta", "word0"])
+        self.assertEqual(terms(text, max_terms=4), terms(text, max_terms=4))
+        self.assertEqual(trigrams("Tax"), {"tax"})
+
+    def test_names_match_by_substring(self):
+        report = self.add_file("Quarterly_Report.pdf")
+        self.add_file("holiday.jpg")
+
+        self.assertEqual(self.index.search("report"), [report])
+        self.assertEqual(self.index.search("TERLY"), [report])
+        # Shorter than a trigram, found by a scan of the names
+        self.assertEqual(self.index.search("qu"), [report])
+        self.assertEqual(self.index.search("invoice"), [])
+
+    def test_content_matches_by_word_prefix(self):
+        invoice = self.add_file("scan1.txt", "Invoice for consulting services, payment due in thirty days")
+        self.add_file("scan2.txt", "Shopping list: apples, bread and milk")
+
+        self.assertEqual(self.index.search("consult"), [invoice])
+        self.assertEqual(self.index.search("invoice payment"), [invoice])
+        # Every word must match, in the name or the content
+        self.assertEqual(self.index.search("scan1 payment"), [invoice])
+        self.assertEqual(self.index.search("invoice milk"), [])
+
+    def test_truncated_content_indexes_the_first_words(self):
+        words = [f"word{i:03d}" for i in range(50)]
+        file_path = os.path.join(self.directory, "long.txt")
+        with open(file_path, 'w') as file:
+            file.write(" ".join(words))
+
+        index = SearchIndex(os.path.join(self.directory, "small.sqlite3"))
+        self.addCleanup(index.close)
+        with mock.patch.object(config, 'SEARCH_MAX_TERMS', 10):
+            index.add(file_path, os.stat(file_path), " ".join(words))
+
+        self.assertEqual(index.search("word009"), [file_path])
+        self.assertEqual(index.search("word010"), [])
+
+    def test_moved_and_deleted_files(self):
+        old_path = self.add_file("draft.txt", "budget plan")
+        new_path = os.path.join(self.directory, "final.txt")
+        os.rename(old_path, new_path)
+        self.index.move(old_path, new_path)
+
+        self.assertEqual(self.index.search("budget"), [new_path])
+        self.assertEqual(self.index.search("draft"), [])
+        self.assertEqual(self.index.search("final"), [new_path])
+
+        # Files removed behind the index's back are dropped when they turn up
+        os.remove(new_path)
+        self.assertEqual(self.index.search("budget"), [])
+
+if __name__ == "__main__":
+    unittest.main()
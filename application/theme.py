@@ -1,6 +1,8 @@
 import os
-from PyQt5.QtGui import QFontDatabase, QFont
+from collections import OrderedDict
+from PyQt5.QtGui import QFontDatabase, QFont, QPixmap
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt
 
 class Theme:
     # Theme names
@@ -15,6 +17,15 @@ class Theme:
     # Default fonts
     TITLE_FONT = "Arial"
     MENU_FONT = "Segoe UI"
+    CYBERPUNK_TITLE_FONT = "Arial"
+    CYBERPUNK_MENU_FONT = "Courier"
+    loaded_fonts = set()
+
+    # Stylesheets built once per theme, colors and fonts
+    stylesheets = {}
+    # Background images decoded once and scaled once per size, least recently used first
+    backgrounds = OrderedDict()
+    BACKGROUND_CACHE_SIZE = 8
 
     # Color schemes
     COLORS = {
@@ -40,45 +51,37 @@ class Theme:
 
     @classmethod
     def initialize(cls):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Load cyberpunk fonts
-        cyberpunk_title_font_path = os.path.join(current_dir, "ForceBattle.otf")
-        cyberpunk_title_font_id = QFontDatabase.addApplicationFont(cyberpunk_title_font_path)
-        if cyberpunk_title_font_id != -1:
-            cls.CYBERPUNK_TITLE_FONT = QFontDatabase.applicationFontFamilies(cyberpunk_title_font_id)[0]
-        else:
-            cls.CYBERPUNK_TITLE_FONT = "Arial"
+        # Only the fonts of the theme shown first; the others are registered when their theme is chosen
+        cls.load_fonts(cls.current_theme)
 
-        cyberpunk_menu_font_path = os.path.join(current_dir, "PrimaSansMonoBT-Roman.otf")
-        cyberpunk_menu_font_id = QFontDatabase.addApplicationFont(cyberpunk_menu_font_path)
-        if cyberpunk_menu_font_id != -1:
-            cls.CYBERPUNK_MENU_FONT = QFontDatabase.applicationFontFamilies(cyberpunk_menu_font_id)[0]
-        else:
-            cls.CYBERPUNK_MENU_FONT = "Courier"
-
-        # Load custom font for light and dark modes
-        normal_title_font_path = os.path.join(current_dir, "LemonMilkMedium.otf")  # Replace with your actual font file name
-        normal_title_font_id = QFontDatabase.addApplicationFont(normal_title_font_path)
-        if normal_title_font_id != -1:
-            cls.NORMAL_TITLE_FONT = QFontDatabase.applicationFontFamilies(normal_title_font_id)[0]
-            cls.TITLE_FONT = cls.NORMAL_TITLE_FONT
-        else:
-            cls.CYBERPUNK_TITLE_FONT = "Arial"
-            
-        # Load custom font for light and dark modes
-        normal_menu_font_path = os.path.join(current_dir, "LemonMilkLight.otf")  # Replace with your actual font file name
-        normal_menu_font_id = QFontDatabase.addApplicationFont(normal_menu_font_path)
-        if normal_menu_font_id != -1:
-            cls.NORMAL_MENU_FONT = QFontDatabase.applicationFontFamilies(normal_menu_font_id)[0]
-            cls.MENU_FONT = cls.NORMAL_MENU_FONT
+    @classmethod
+    def load_fonts(cls, theme):
+        family = 'cyberpunk' if theme == cls.CYBERPUNK else 'normal'
+        if family in cls.loaded_fonts:
+            return
+        cls.loaded_fonts.add(family)
+
+        if family == 'cyberpunk':
+            # Load cyberpunk fonts
+            cls.CYBERPUNK_TITLE_FONT = cls.register_font("ForceBattle.otf", "Arial")
+            cls.CYBERPUNK_MENU_FONT = cls.register_font("PrimaSansMonoBT-Roman.otf", "Courier")
         else:
-            cls.CYBERPUNK_MENU_FONT = "Courier"
+            # Load custom font for light and dark modes
+            cls.TITLE_FONT = cls.register_font("LemonMilkMedium.otf", cls.TITLE_FONT)
+            cls.MENU_FONT = cls.register_font("LemonMilkLight.otf", cls.MENU_FONT)
 
+    @classmethod
+    def register_font(cls, file_name, fallback):
+        font_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+        font_id = QFontDatabase.addApplicationFont(font_path)
+        if font_id == -1:
+            return fallback
+        return QFontDatabase.applicationFontFamilies(font_id)[0]
 
     @classmethod
     def get_stylesheet(cls):
         colors = cls.COLORS[cls.current_theme]
+        cls.load_fonts(cls.current_theme)
         
         if cls.current_theme == cls.CYBERPUNK:
             title_font = cls.CYBERPUNK_TITLE_FONT
@@ -86,8 +89,11 @@ class Theme:
         else:
             title_font = cls.TITLE_FONT
             menu_font = cls.MENU_FONT
-        
-        return f"""
+
+        key = (cls.current_theme, colors['background'], colors['text'], colors['accent'], colors['border'], title_font, menu_font)
+        if key in cls.stylesheets:
+            return cls.stylesheets[key]
+        cls.stylesheets[key] = f"""
             QWidget {{
                 background-color: {colors['background']};
                 color: {colors['text']};
@@ -118,6 +124,7 @@ class Theme:
                 border: 2px solid {colors['accent']};
             }}
         """
+        return cls.stylesheets[key]
 
     @classmethod
     def set_theme(cls, theme_name):
@@ -138,6 +145,45 @@ class Theme:
     def get_current_background(cls):
         return cls.current_background
 
+    @classmethod
+    def get_background(cls, width, height, ratio=1.0):
+        # The current background scaled to a widget's size, or None if there is none
+        if not cls.current_background:
+            return None
+        key = (cls.current_background, width, height, ratio)
+        if key in cls.backgrounds:
+            cls.backgrounds.move_to_end(key)
+            return cls.backgrounds[key]
+
+        original = cls.load_background(cls.current_background)
+        if original is None:
+            return None
+        pixmap = original.scaled(round(width * ratio), round(height * ratio), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(ratio)
+        cls.remember_background(key, pixmap)
+        return pixmap
+
+    @classmethod
+    def load_background(cls, name):
+        key = (name, None, None, None)
+        if key in cls.backgrounds:
+            cls.backgrounds.move_to_end(key)
+        else:
+            image_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+            pixmap = QPixmap(image_path)
+            if pixmap.isNull():
+                print(f"Error: Background image could not be loaded: {image_path}")
+            # Missing images are remembered too, so they aren't looked for on every repaint
+            cls.remember_background(key, pixmap)
+        pixmap = cls.backgrounds[key]
+        return None if pixmap.isNull() else pixmap
+
+    @classmethod
+    def remember_background(cls, key, pixmap):
+        cls.backgrounds[key] = pixmap
+        while len(cls.backgrounds) > cls.BACKGROUND_CACHE_SIZE:
+            cls.backgrounds.popitem(last=False)
+
     @classmethod
     def get_current_theme(cls):
         return cls.current_theme
\ No newline at end of file
@@ -0,0 +1,160 @@
+import os
+import threading
+
+"""
+Keeps count of the entries left in each folder of a tree and removes folders as they become empty.
+
+The walk records how many entries (files, folders and hidden entries alike) each folder holds when it is read.
+The organizer reports every file that leaves a folder and every entry that arrives in one, so a folder is
+removed the moment its count drops to zero, and its parent is checked in turn. Emptiness never needs a second
+walk or an `os.listdir` per folder. The root itself is never removed. While inactive (when only planning)
+counts are kept but nothing is removed.
+
+Args:
+    root (str): The root of the tree.
+    remaining (dict, optional): Counts recorded earlier, e.g. by a saved plan.
+    active (bool, optional): Whether empty folders are removed. Defaults to True.
+"""
+class FolderPruner:
+    def __init__(self, root, remaining=None, active=True):
+        self.root = os.path.normpath(root)
+        self.remaining = remaining if remaining is not None else {}  # folder -> entries still in it
+        self.active = active
+        self.removed = 0
+        # Folders are tracked by the walk, which may run in its own thread
+        self.lock = threading.Lock()
+
+    def track(self, folder, entries):
+        with self.lock:
+            self.remaining[folder] = entries
+            self.prune(folder)
+
+    def arrived(self, folder):
+        with self.lock:
+            if folder in self.remaining:
+                self.remaining[folder] += 1
+
+    def left(self, folder):
+        with self.lock:
+            if folder in self.remaining:
+                self.remaining[folder] -= 1
+                self.prune(folder)
+
+    def prune(self, folder):
+        # Removes the folder if nothing is left in it, then does the same for its parent
+        while self.active and self.remaining.get(folder) == 0 and os.path.normpath(folder) != self.root:
+            del self.remaining[folder]
+            try:
+                os.rmdir(folder)
+            except OSError as e:
+                print(f"Error deleting folder {folder}: {str(e)}")
+                return
+            self.removed += 1
+            print(f"Deleted empty folder: {folder}")
+
+            folder = os.path.dirname(folder)
+            if folder not in self.remaining:
+                return
+            self.remaining[folder] -= 1
+
+    def prune_all(self):
+        # Removes every folder already known to be empty, e.g. when applying a saved plan
+        with self.lock:
+            for folder in [folder for folder, entries in self.remaining.items() if entries == 0]:
+                self.prune(folder)
+
+"""
+Reads a directory tree with `os.scandir` and yields the directory entries of its files.
+
+Directories are read one at a time and depth first, in the same order as a top-down `os.walk`: the files of a
+directory are yielded before its subdirectories are entered. Nothing but the current directory's entries and
+the pending subdirectories is held in memory. The file/directory distinction comes from the directory entry
+itself, so reading the tree costs no `stat` calls.
+
+Hidden files and directories are skipped, as are the directories in `excluded`. The set is checked when a
+directory is about to be entered, so directories added to it during the walk (e.g. category folders created by
+the organizer) are never entered. Directories that can't be read are logged and skipped. With a `device`, the
+walk stays on that file system and doesn't enter the mount points of others.
+
+Args:
+    directory (str): The path to the directory to read.
+    excluded (set, optional): Paths of directories that must not be entered.
+    pruner (FolderPruner, optional): Is told how many entries each directory holds.
+    device (int, optional): The `st_dev` of the file system to stay on.
+
+Yields:
+    os.DirEntry: The entry of each file.
+"""
+def scan_tree(directory, excluded=None, pruner=None, device=None):
+    excluded = excluded if excluded is not None else set()
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        if current in excluded:
+            continue
+
+        try:
+            with os.scandir(current) as iterator:
+                entries = list(iterator)
+        except OSError as e:
+            print(f"Error reading directory {current}: {str(e)}")
+            continue
+        if pruner:
+            pruner.track(current, len(entries))
+
+        subdirectories = []
+        for entry in entries:
+            # Ignore hidden files and directories
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if device is None or entry.stat(follow_symlinks=False).st_dev == device:
+                        subdirectories.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+            except OSError as e:
+                print(f"Error reading {entry.path}: {str(e)}")
+
+        # Reversed, so the first subdirectory is entered first
+        pending.extend(reversed(subdirectories))
+
+"""
+Walks a directory tree and yields its files one at a time, each with a single `stat`.
+
+See `scan_tree` for the order and what is skipped. The stat result is yielded with the file for every later
+stage to reuse, so memory stays flat however many files the tree has and no stage needs to stat again.
+
+Args:
+    directory (str): The path to the directory to walk.
+    excluded (set, optional): Paths of directories that must not be entered.
+    pruner (FolderPruner, optional): Is told how many entries each directory holds.
+    device (int, optional): The `st_dev` of the file system to stay on.
+
+Yields:
+    tuple: The file path, file name and stat result of each file.
+"""
+def walk_files(directory, excluded=None, pruner=None, device=None):
+    for entry in scan_tree(directory, excluded, pruner, device):
+        try:
+            yield entry.path, entry.name, entry.stat()
+        except OSError as e:
+            print(f"Error reading {entry.path}: {str(e)}")
+
+"""
+Removes every empty folder in a tree in a single pass.
+
+Each folder is read once; a folder holding nothing but folders that turn out empty is removed as soon as the
+last of them is. Hidden folders are neither entered nor removed, and the root is kept.
+
+Args:
+    directory (str): The path to the directory to tidy.
+
+Returns:
+    int: The number of folders removed.
+"""
+def prune_empty_folders(directory):
+    pruner = FolderPruner(directory)
+    for _ in scan_tree(directory, pruner=pruner):
+        pass
+    return pruner.removed
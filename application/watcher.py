@@ -0,0 +1,226 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import config
+from tree_walker import walk_files
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+EVENT_HEADER = struct.Struct("iIII")
+
+"""
+Minimal binding to Linux inotify through libc, so no extra package is needed.
+
+Raises:
+    OSError: If inotify is not available, e.g. on other systems or when the watch limit is reached.
+"""
+class Inotify:
+    def __init__(self):
+        library = ctypes.util.find_library('c')
+        if not library:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not supported on this system")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read_events(self):
+        # Returns every queued (watch descriptor, mask, name) without blocking
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+"""
+Reports the files of a directory tree that were created or changed, once they stopped changing.
+
+On Linux changes come from inotify: every folder of the tree is watched, and the thread sleeps in `select` until
+something happens, so an idle watcher uses no CPU at all. Elsewhere, or when inotify can't be used, the tree is
+walked every `config.WATCH_POLL_INTERVAL` seconds and compared with the previous walk.
+
+A file is only reported once it has been left alone for `config.WATCH_SETTLE_SECONDS`, so files still being
+downloaded or copied are not organized half-written. Names ending in one of `config.WATCH_PARTIAL_SUFFIXES`, as
+browsers use while downloading, are never reported; the final name is, when the download is renamed to it.
+Hidden files and folders are ignored, as in a full walk.
+
+Args:
+    directory (str): The directory to watch.
+    polling (bool, optional): Whether to poll even where inotify is available. Defaults to False.
+"""
+class DirectoryWatcher:
+    def __init__(self, directory, polling=False):
+        self.directory = directory
+        self.pending = {}  # path -> time it was last seen changing
+        self.folders = {}  # watch descriptor -> folder
+        self.snapshot = {}  # path -> (size, mtime_ns), when polling
+        self.stopped = False
+        # Written to by `stop` to wake a sleeping `wait` from another thread
+        self.wake_read, self.wake_write = os.pipe()
+
+        self.inotify = None
+        if not polling:
+            try:
+                self.inotify = Inotify()
+                self.watch_tree(directory)
+            except OSError as e:
+                print(f"Watching {directory} by polling: {str(e)}")
+                if self.inotify:
+                    self.inotify.close()
+                self.inotify = None
+        if self.inotify is None:
+            self.snapshot = self.scan()
+            self.polled_at = time.monotonic()
+
+    def watch_tree(self, folder, new=False):
+        # Watches a folder and every folder below it; the files of a `new` folder, e.g. one moved in, count as changed
+        pending = [folder]
+        while pending:
+            current = pending.pop()
+            try:
+                self.folders[self.inotify.add_watch(current)] = current
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif new:
+                            self.changed(entry.path)
+            except OSError as e:
+                if e.errno in (errno.ENOSPC, errno.EMFILE):
+                    # Out of inotify watches, e.g. fs.inotify.max_user_watches
+                    raise
+                print(f"Error watching {current}: {str(e)}")
+
+    def scan(self):
+        return {path: (stat_result.st_size, stat_result.st_mtime_ns) for path, _, stat_result in walk_files(self.directory)}
+
+    def changed(self, path):
+        name = os.path.basename(path)
+        if not name.startswith('.') and not name.endswith(config.WATCH_PARTIAL_SUFFIXES):
+            self.pending[path] = time.monotonic()
+
+    def handle_events(self):
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, so everything in the tree may have changed
+                print(f"Too many changes in {self.directory}, checking the whole tree")
+                for path, _, _ in walk_files(self.directory):
+                    self.changed(path)
+                continue
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.folders[wd]
+                continue
+
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.'):
+                    self.watch_tree(path, new=True)
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+                self.changed(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.pending.pop(path, None)
+
+    def poll(self):
+        self.polled_at = time.monotonic()
+        snapshot = self.scan()
+        for path, signature in snapshot.items():
+            if self.snapshot.get(path) != signature:
+                self.changed(path)
+        for path in set(self.pending) - set(snapshot):
+            del self.pending[path]
+        self.snapshot = snapshot
+
+    def settled(self):
+        # Takes the pending files that haven't changed for the settle time and still exist
+        now = time.monotonic()
+        files = []
+        for path, changed_at in list(self.pending.items()):
+            if now - changed_at < config.WATCH_SETTLE_SECONDS:
+                continue
+            del self.pending[path]
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            # Still being written by a program that doesn't close the file in between
+            if time.time() - stat_result.st_mtime < config.WATCH_SETTLE_SECONDS:
+                self.pending[path] = now
+                continue
+            files.append((path, os.path.basename(path), stat_result))
+        return files
+
+    def wait(self):
+        # Blocks until files have settled or `stop` is called; returns the settled files, or None once stopped
+        while not self.stopped:
+            files = self.settled()
+            if files:
+                return files
+
+            if self.pending:
+                timeout = max(0.0, min(self.pending.values()) + config.WATCH_SETTLE_SECONDS - time.monotonic())
+            else:
+                timeout = None
+            if self.inotify is None:
+                next_poll = max(0.0, self.polled_at + config.WATCH_POLL_INTERVAL - time.monotonic())
+                timeout = next_poll if timeout is None else min(timeout, next_poll)
+
+            sources = [self.wake_read] + ([self.inotify.fd] if self.inotify else [])
+            ready, _, _ = select.select(sources, [], [], timeout)
+            if self.inotify and self.inotify.fd in ready:
+                self.handle_events()
+            elif self.inotify is None and time.monotonic() - self.polled_at >= config.WATCH_POLL_INTERVAL:
+                self.poll()
+        return None
+
+    def stop(self):
+        self.stopped = True
+        os.write(self.wake_write, b'\0')
+
+    def close(self):
+        if self.inotify:
+            self.inotify.close()
+        os.close(self.wake_read)
+        os.close(self.wake_write)
@@ -0,0 +1,161 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+import config
+
+"""
+Runs submitted work immediately in the calling thread.
+
+Used in place of real executors when parallel mode is off, so the organizer has a single code path.
+"""
+class InlineExecutor:
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+"""
+Future-like wrapper that runs its work only when the result is first asked for.
+
+Used for speculative work that should not be done at all in sequential mode unless it turns out to be needed.
+
+Args:
+    fn (callable): The work to run.
+    *args, **kwargs: Arguments passed to `fn`.
+"""
+class DeferredResult:
+    def __init__(self, fn, *args, **kwargs):
+        self.call = (fn, args, kwargs)
+        self.future = None
+
+    def result(self):
+        if self.future is None:
+            fn, args, kwargs = self.call
+            self.future = InlineExecutor().submit(fn, *args, **kwargs)
+        return self.future.result()
+
+    def done(self):
+        return self.future is not None
+
+"""
+Thread and process pools shared by one organizer run.
+
+I/O-bound work (hashing, file reads, network calls) goes to a thread pool and CPU-bound work (OCR, PDF parsing)
+goes to a process pool. When parallel mode is off both are replaced by an `InlineExecutor` and the lookahead
+drops to one file, which reproduces the sequential behaviour exactly. `stream` decouples a producer such as the
+tree walker from its consumer through a bounded queue, so a slow stage holds back the one feeding it. The number
+of tasks submitted and not yet finished on each pool is kept in `backlog`.
+
+Args:
+    parallel (bool, optional): Whether to use real worker pools. Defaults to `config.PARALLEL`.
+    io_workers (int, optional): The number of I/O threads. Defaults to `config.IO_WORKERS`.
+    cpu_workers (int, optional): The number of CPU processes. Defaults to `config.CPU_WORKERS`.
+    cpu_pool (WorkerPool, optional): A pool whose CPU processes are shared instead of starting new ones, e.g. by
+        the per-device pools of a drive scan. It stays open when this pool is closed.
+"""
+class WorkerPool:
+    def __init__(self, parallel=None, io_workers=None, cpu_workers=None, cpu_pool=None):
+        self.parallel = config.PARALLEL if parallel is None else parallel
+        self.owns_cpu_executor = cpu_pool is None
+        self.backlog = {'io': 0, 'cpu': 0}
+        self.backlog_lock = threading.Lock()
+
+        if self.parallel:
+            self.io_executor = ThreadPoolExecutor(max_workers=io_workers or config.IO_WORKERS, thread_name_prefix="walle-io")
+            self.cpu_executor = cpu_pool.cpu_executor if cpu_pool else ProcessPoolExecutor(max_workers=cpu_workers or config.CPU_WORKERS)
+            # Never more files ahead than there are threads to work on them, e.g. on a spinning disk
+            self.lookahead = min(config.PARALLEL_LOOKAHEAD, 4 * (io_workers or config.IO_WORKERS))
+        else:
+            self.io_executor = InlineExecutor()
+            self.cpu_executor = self.io_executor
+            self.lookahead = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Don't start queued work if the run is being aborted
+        self.close(cancel=exc_type is not None)
+
+    def submit_io(self, fn, *args, **kwargs):
+        return self.track('io', self.io_executor.submit(fn, *args, **kwargs))
+
+    def prefetch_io(self, fn, *args, **kwargs):
+        # Starts speculative I/O-bound work early in parallel mode, and only on demand in sequential mode
+        if self.parallel:
+            return self.submit_io(fn, *args, **kwargs)
+        return DeferredResult(fn, *args, **kwargs)
+
+    def submit_cpu(self, fn, *args, **kwargs):
+        return self.track('cpu', self.cpu_executor.submit(fn, *args, **kwargs))
+
+    def track(self, kind, future):
+        # Counted until the work finishes; inline work is already done here
+        if not future.done():
+            with self.backlog_lock:
+                self.backlog[kind] += 1
+            future.add_done_callback(lambda _: self.untrack(kind))
+        return future
+
+    def untrack(self, kind):
+        with self.backlog_lock:
+            self.backlog[kind] -= 1
+
+    def run_cpu(self, fn, *args, **kwargs):
+        # Runs CPU-bound work on the process pool and waits for the result
+        return self.submit_cpu(fn, *args, **kwargs).result()
+
+    def stream(self, iterable, maxsize=None):
+        # In parallel mode a producer thread runs ahead of the consumer by at most `maxsize` items
+        if not self.parallel:
+            yield from iterable
+            return
+
+        items = queue.Queue(maxsize=maxsize or self.lookahead)
+        stop = threading.Event()
+        end = object()
+        errors = []
+
+        def put(item):
+            # Gives up once the consumer has stopped, so the thread can't block forever on a full queue
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for item in iterable:
+                    if not put(item):
+                        return
+            except Exception as e:
+                errors.append(e)
+            put(end)
+
+        producer = threading.Thread(target=produce, name="walle-stream", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = items.get()
+                if item is end:
+                    break
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            producer.join()
+
+    def close(self, cancel=False):
+        self.io_executor.shutdown(wait=True, cancel_futures=cancel)
+        if self.owns_cpu_executor:
+            self.cpu_executor.shutdown(wait=True, cancel_futures=cancel)